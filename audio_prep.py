@@ -0,0 +1,94 @@
+# audio_prep.py
+import os
+from dataclasses import dataclass
+from io import BytesIO
+from math import gcd
+
+import numpy as np
+import scipy.io.wavfile as wav
+from scipy.signal import resample_poly
+
+# --- Configuration ---
+# Speech recognition does not benefit from more than 16 kHz
+SPEECH_SAMPLE_RATE = int(os.getenv("STT_SAMPLE_RATE", "16000"))
+# "flac" (lossless), "opus" (lossy, smallest) or "wav" (uncompressed)
+AUDIO_FORMAT = os.getenv("STT_AUDIO_FORMAT", "flac").lower()
+
+# soundfile format/subtype and MIME type per output format
+FORMATS = {
+    "flac": ("FLAC", "PCM_16", "audio/flac"),
+    "opus": ("OGG", "OPUS", "audio/ogg"),
+    "wav": ("WAV", "PCM_16", "audio/wav"),
+}
+
+
+@dataclass
+class PreparedAudio:
+    """An utterance ready for upload, plus how much it shrank."""
+    data: bytes
+    mime_type: str
+    sample_rate: int
+    duration: float
+    raw_bytes: int
+
+    @property
+    def num_bytes(self) -> int:
+        return len(self.data)
+
+    def summary(self) -> str:
+        return (f"{self.duration:.1f}s at {self.sample_rate} Hz as {self.mime_type}: "
+                f"{self.num_bytes / 1024:.1f} KB (raw WAV {self.raw_bytes / 1024:.1f} KB, "
+                f"{self.raw_bytes / max(self.num_bytes, 1):.1f}x smaller)")
+
+
+def resample_for_speech(samples: np.ndarray, source_rate: int, target_rate: int = SPEECH_SAMPLE_RATE) -> np.ndarray:
+    """
+    Resamples int16 audio with a polyphase filter.
+
+    resample_poly applies a Kaiser-windowed FIR low-pass at the new Nyquist frequency
+    before decimating, so content above target_rate / 2 does not alias into the speech band.
+    """
+    samples = samples.reshape(-1)
+    if source_rate == target_rate:
+        return samples
+    divisor = gcd(source_rate, target_rate)
+    resampled = resample_poly(samples.astype(np.float32), target_rate // divisor, source_rate // divisor)
+    return np.clip(np.round(resampled), -32768, 32767).astype(np.int16)
+
+
+def encode_audio(samples: np.ndarray, sample_rate: int, audio_format: str = AUDIO_FORMAT):
+    """
+    Encodes int16 mono audio in memory.
+
+    Returns:
+        tuple: (encoded bytes, MIME type)
+    """
+    try:
+        container, subtype, mime_type = FORMATS[audio_format]
+    except KeyError:
+        raise ValueError(f"Unsupported audio format: {audio_format}")
+
+    buffer = BytesIO()
+    if audio_format == "wav":
+        wav.write(buffer, sample_rate, samples)
+    else:
+        import soundfile as sf
+        if audio_format == "opus" and sample_rate not in (8000, 12000, 16000, 24000, 48000):
+            raise ValueError(f"Opus does not support {sample_rate} Hz audio.")
+        sf.write(buffer, samples, sample_rate, format=container, subtype=subtype)
+    return buffer.getvalue(), mime_type
+
+
+def prepare_audio(recording: np.ndarray, source_rate: int, target_rate: int = SPEECH_SAMPLE_RATE,
+                  audio_format: str = AUDIO_FORMAT) -> PreparedAudio:
+    """Resamples a recording to the speech rate and compresses it for upload."""
+    recording = recording.reshape(-1)
+    resampled = resample_for_speech(recording, source_rate, target_rate)
+    data, mime_type = encode_audio(resampled, target_rate, audio_format)
+    return PreparedAudio(
+        data=data,
+        mime_type=mime_type,
+        sample_rate=target_rate,
+        duration=len(recording) / source_rate,
+        raw_bytes=recording.nbytes + 44,  # int16 PCM plus a WAV header
+    )
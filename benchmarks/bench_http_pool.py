@@ -0,0 +1,73 @@
+# benchmarks/bench_http_pool.py
+"""
+Compares cold (new session per request) and warm (shared pooled session) Claude
+requests against the local Messages API stand-in.
+
+    python -m benchmarks.bench_http_pool -n 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+import http_clients
+from benchmarks.mock_anthropic import start_server
+
+PAYLOAD = {
+    "model": "mock",
+    "max_tokens": 16,
+    "messages": [{"role": "user", "content": "ping"}],
+}
+
+
+async def cold_request(url: str):
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json=PAYLOAD) as response:
+            await response.json()
+
+
+async def warm_request(url: str):
+    session = await http_clients.get_vision_session()
+    async with session.post(url, json=PAYLOAD) as response:
+        await response.json()
+
+
+async def measure(request, url: str, n: int):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        await request(url)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name: str, latencies):
+    print(f"{name:>5}: mean {statistics.mean(latencies):7.2f} ms, "
+          f"p50 {statistics.median(latencies):7.2f} ms, max {max(latencies):7.2f} ms")
+
+
+async def main(n: int, latency: float):
+    runner, base_url = await start_server(latency=latency)
+    url = f"{base_url}/v1/messages"
+    try:
+        # One throwaway request so the warm run starts with an open connection
+        await warm_request(url)
+        cold = await measure(cold_request, url, n)
+        warm = await measure(warm_request, url, n)
+    finally:
+        await http_clients.close_vision_session()
+        await runner.cleanup()
+
+    report("cold", cold)
+    report("warm", warm)
+    print(f"Warm requests save {statistics.mean(cold) - statistics.mean(warm):.2f} ms on average.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pooled vs per-request HTTP sessions.")
+    parser.add_argument("-n", type=int, default=50, help="Requests per mode.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mock server latency in seconds.")
+    args = parser.parse_args()
+    asyncio.run(main(args.n, args.latency))
@@ -0,0 +1,134 @@
+# benchmarks/bench_interaction.py
+"""
+Measures claude_vision's voice loop end to end, with and without --no-overlap:
+interaction_loop runs unchanged against the fake camera, a mock speech-to-text
+that takes as long as the user speaks, the local Messages API stand-in, and a
+speaker whose playback takes as long as the answer would to say.
+
+For each mode it reports the whole session time for --turns questions (until the
+last answer has been played), how long each Enter press waited before listening
+started, and the time from the end of each question to its answer starting to play.
+
+    python -m benchmarks.bench_interaction --turns 5 --speech 2 --playback-rate 15
+
+The mock does not stream, so answers are requested whole (as with --no-stream).
+"""
+import argparse
+import asyncio
+import io
+import statistics
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from types import SimpleNamespace
+
+import camera
+import claude_vision
+import http_clients
+import transcribe_audio
+from benchmarks import fake_camera, mock_anthropic
+
+QUESTION = "What do you see in front of you?"
+
+
+class Timeline:
+    """Timestamps (perf_counter) of each turn's stages, in turn order."""
+
+    def __init__(self):
+        self.enter = []
+        self.listening = []
+        self.question_end = []
+        self.playing = []
+
+
+class FakeSpeech:
+    """TTS stand-in: synthesis takes a fixed time, playback len(text) / playback_rate seconds."""
+
+    def __init__(self, timeline: Timeline, synth_latency: float, playback_rate: float):
+        self.timeline = timeline
+        self.synth_latency = synth_latency
+        self.playback_rate = playback_rate
+
+    def synthesize(self, text: str) -> str:
+        time.sleep(self.synth_latency)
+        return text
+
+    def play(self, audio: str):
+        # One answer is said per turn (no streaming), so the Nth playback belongs to the Nth turn
+        self.timeline.playing.append(time.perf_counter())
+        time.sleep(len(audio) / self.playback_rate)
+
+
+async def run_mode(overlap: bool, runner, args) -> dict:
+    """Runs one session of `args.turns` questions. Returns its timings in seconds."""
+    timeline = Timeline()
+    answers = iter([""] * args.turns + ["q"])
+
+    def press_enter():
+        answer = next(answers)
+        if answer != "q":
+            timeline.enter.append(time.perf_counter())
+        return answer
+
+    def run_stt(streaming: bool = False) -> str:
+        timeline.listening.append(time.perf_counter())
+        time.sleep(args.speech + args.stt_latency)
+        timeline.question_end.append(time.perf_counter())
+        return QUESTION
+
+    claude_vision.input = press_enter
+    transcribe_audio.run_stt = run_stt
+    loop_args = SimpleNamespace(overlap=overlap, stream=False, stream_stt=False, model="mock",
+                                cameras=camera.CAMERA_INDICES)
+    speaker = claude_vision.SpeechPipeline(FakeSpeech(timeline, args.synth_latency, args.playback_rate))
+    requests_before = len(mock_anthropic.recorded_requests(runner))
+    started = time.perf_counter()
+    with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+        try:
+            await claude_vision.interaction_loop(loop_args, speaker)
+        finally:
+            await asyncio.to_thread(speaker.close)
+    finished = time.perf_counter()
+
+    return {
+        "session": finished - started,
+        "listen_wait": statistics.mean(listen - enter for enter, listen in zip(timeline.enter, timeline.listening)),
+        "answer_latency": statistics.mean(play - end for end, play in zip(timeline.question_end, timeline.playing)),
+        "requests": len(mock_anthropic.recorded_requests(runner)) - requests_before,
+    }
+
+
+async def main(args):
+    fake_camera.install(args.video, args.fps)
+    runner, base_url = await mock_anthropic.start_server(latency=args.latency)
+    http_clients.ANTHROPIC_BASE_URL = base_url
+    claude_vision.api_key = "mock"
+    # Every turn sees a new frame anyway, but a repeated frame must not skip the request
+    claude_vision.CACHE_ENABLED = False
+    try:
+        print(f"{args.turns} turns, {args.speech:.1f}s questions, answers played at {args.playback_rate:.0f} chars/s")
+        print(f"{'mode':<12} {'session s':>10} {'listen wait s':>14} {'answer latency s':>17}")
+        for name, overlap in (("overlap", True), ("no-overlap", False)):
+            result = await run_mode(overlap, runner, args)
+            if result["requests"] != args.turns:
+                # A failed request is answered with ERROR_PHRASE, which would skew the timings
+                print(f"{name}: only {result['requests']} of {args.turns} questions reached the mock")
+            print(f"{name:<12} {result['session']:>10.2f} {result['listen_wait']:>14.2f} "
+                  f"{result['answer_latency']:>17.2f}")
+    finally:
+        await runner.cleanup()
+        camera.release_cameras()
+        http_clients.close_anthropic_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the voice loop with and without --no-overlap.")
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--speech", type=float, default=2.0, help="Seconds the user speaks per question.")
+    parser.add_argument("--stt-latency", type=float, default=0.3,
+                        help="Seconds from the end of speech to the transcript.")
+    parser.add_argument("--synth-latency", type=float, default=0.2, help="Seconds to synthesize an answer.")
+    parser.add_argument("--playback-rate", type=float, default=15.0, help="Characters of the answer played per second.")
+    parser.add_argument("--latency", type=float, default=0.8, help="Mock Messages API latency in seconds.")
+    parser.add_argument("--video", help="Video file or image directory (synthetic frames if unset).")
+    parser.add_argument("--fps", type=float, default=30.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+# benchmarks/bench_prompt_cache.py
+"""
+Measures what prompt caching and the rolling conversation history do to the
+input tokens and latency of repeated view_world turns, against the local
+Messages API stand-in (which records every payload and emulates the cache).
+
+Each mode asks the same series of questions about successive fake camera frames:
+
+    single    every turn is independent (the system prompt alone is too short to be cached)
+    history   earlier turns are sent along, their prefix read from the cache
+    no-cache  the same history, with the mock's prompt cache turned off
+
+    python -m benchmarks.bench_prompt_cache --turns 8 --token-latency 0.0002
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import http_clients
+import mcp_vision
+from benchmarks import mock_anthropic
+from benchmarks.fake_camera import load_frames
+from conversation import ConversationHistory
+
+QUESTIONS = [
+    "What do you see?",
+    "Is there anything on the desk?",
+    "What colour is the mug you mentioned?",
+    "Has anything moved since the last look?",
+]
+
+
+async def run_mode(frames: list, history: ConversationHistory, caching: bool, turns: int, args) -> dict:
+    """Asks `turns` questions with a fresh mock, returning token and latency totals."""
+    runner, base_url = await mock_anthropic.start_server(latency=args.latency, token_latency=args.token_latency,
+                                                         caching=caching)
+    http_clients.ANTHROPIC_BASE_URL = base_url
+    latencies = []
+    try:
+        for turn in range(turns):
+            started = time.perf_counter()
+            await mcp_vision.request_claude_vision(frames[turn % len(frames)], QUESTIONS[turn % len(QUESTIONS)],
+                                                   history)
+            latencies.append(time.perf_counter() - started)
+        requests = mock_anthropic.recorded_requests(runner)
+    finally:
+        await http_clients.close_vision_session()
+        await runner.cleanup()
+
+    usage = [request["usage"] for request in requests]
+    return {
+        "uncached": sum(u["input_tokens"] for u in usage),
+        "cache_write": sum(u["cache_creation_input_tokens"] for u in usage),
+        "cache_read": sum(u["cache_read_input_tokens"] for u in usage),
+        "last_turn_uncached": usage[-1]["input_tokens"] + usage[-1]["cache_creation_input_tokens"],
+        "mean_kb": statistics.mean(request["bytes"] or 0 for request in requests) / 1024,
+        "mean_ms": statistics.mean(latencies) * 1000,
+    }
+
+
+async def main(args):
+    mcp_vision.API_KEY = "mock"
+    mcp_vision.CACHE_ENABLED = False
+    frames = load_frames(args.video)
+
+    def new_history():
+        return ConversationHistory(max_tokens=args.history_tokens, max_images=args.history_images)
+
+    modes = {
+        "single": (None, True),
+        "history": (new_history(), True),
+        "no-cache": (new_history(), False),
+    }
+    print(f"{args.turns} turns; tokens are estimates from the mock")
+    print(f"{'mode':<8} {'uncached':>9} {'written':>8} {'read':>8} {'last turn':>10} {'KB/req':>7} {'ms/turn':>8}")
+    for name, (history, caching) in modes.items():
+        result = await run_mode(frames, history, caching, args.turns, args)
+        print(f"{name:<8} {result['uncached']:>9} {result['cache_write']:>8} {result['cache_read']:>8} "
+              f"{result['last_turn_uncached']:>10} {result['mean_kb']:>7.1f} {result['mean_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare input tokens and latency with and without history.")
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--video", help="Video file or image directory (synthetic frames if unset).")
+    parser.add_argument("--latency", type=float, default=mock_anthropic.DEFAULT_LATENCY,
+                        help="Fixed mock latency in seconds.")
+    parser.add_argument("--token-latency", type=float, default=0.0002,
+                        help="Mock prefill seconds per uncached input token.")
+    parser.add_argument("--history-tokens", type=int, default=6000, help="History token budget.")
+    parser.add_argument("--history-images", type=int, default=2, help="Earlier turns that keep their images.")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,157 @@
+# benchmarks/bench_startup.py
+"""
+Measures the cold start of the stdio MCP servers: the time from spawning the
+process to its `initialize` and `tools/list` responses, and where the import
+time goes (`python -X importtime`, summed per top-level package).
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --servers mcp_vision --max-ms 1500   # exits with 1 above the limit
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROTOCOL_VERSION = "2024-11-05"
+
+# Server script and the module its imports are measured through
+SERVERS = {
+    "mcp_vision": ("mcp_vision.py", "mcp_vision"),
+    "mcp_proxy": ("mcp_proxy.py", "mcp_proxy"),
+}
+# The proxy's health checks go to a closed local port instead of the real eval servers
+SERVER_ENV = {"EVAL_BACKENDS": "http://127.0.0.1:9", "PYTHONDONTWRITEBYTECODE": "1"}
+
+
+def send(process: subprocess.Popen, message: dict):
+    process.stdin.write(json.dumps(message).encode() + b"\n")
+    process.stdin.flush()
+
+
+def read_response(process: subprocess.Popen, request_id: int) -> dict:
+    """Reads stdout lines until the response to `request_id` (notifications and log lines are skipped)."""
+    while line := process.stdout.readline():
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get("id") == request_id:
+            return message
+    raise RuntimeError(f"Server exited before answering request {request_id} (exit code {process.poll()}).")
+
+
+def time_to_tools_list(script: str, env: dict, timeout: float) -> dict:
+    """Spawns a server and times the MCP handshake and the first tools/list. Returns milliseconds."""
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, script], cwd=REPO_DIR, env=env, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    # A server that never answers is killed, which ends the blocking reads below
+    watchdog = threading.Timer(timeout, process.kill)
+    watchdog.start()
+    try:
+        send(process, {"jsonrpc": "2.0", "id": 1, "method": "initialize",
+                       "params": {"protocolVersion": PROTOCOL_VERSION, "capabilities": {},
+                                  "clientInfo": {"name": "bench_startup", "version": "1.0"}}})
+        read_response(process, 1)
+        initialized = time.perf_counter()
+        send(process, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        send(process, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        tools = read_response(process, 2).get("result", {}).get("tools", [])
+        listed = time.perf_counter()
+    finally:
+        watchdog.cancel()
+        process.stdin.close()
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return {
+        "initialize_ms": (initialized - started) * 1000,
+        "tools_list_ms": (listed - started) * 1000,
+        "tools": len(tools),
+    }
+
+
+def import_times(module: str, env: dict) -> dict:
+    """
+    Imports `module` in a fresh interpreter with -X importtime.
+
+    Returns:
+        dict: total_ms, and packages_ms mapping each top-level package to the import time spent in it.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=REPO_DIR,
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed: {result.stderr.strip().splitlines()[-1]}")
+    packages = {}
+    for line in result.stderr.splitlines():
+        # "import time:       123 |       4567 |   package.module"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1000
+    return {
+        "total_ms": sum(packages.values()),
+        "packages_ms": dict(sorted(packages.items(), key=lambda item: item[1], reverse=True)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start of the stdio MCP servers.")
+    parser.add_argument("--servers", default=",".join(SERVERS), help=f"Comma-separated ({', '.join(SERVERS)}).")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per server.")
+    parser.add_argument("--top", type=int, default=10, help="Packages shown in the import breakdown.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds before a server is given up on.")
+    parser.add_argument("--no-warm-up", dest="warm_up", action="store_false",
+                        help="Disable mcp_vision's background warm-up (VISION_WARM_UP=0).")
+    parser.add_argument("--max-ms", type=float, help="Exit with 1 if a median time to tools/list exceeds this.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    args = parser.parse_args()
+
+    servers = [name.strip() for name in args.servers.split(",") if name.strip()]
+    unknown = [name for name in servers if name not in SERVERS]
+    if unknown:
+        parser.error(f"Unknown servers: {', '.join(unknown)}")
+    env = {**os.environ, **SERVER_ENV, "VISION_WARM_UP": "1" if args.warm_up else "0"}
+
+    results = {}
+    slow = []
+    for name in servers:
+        script, module = SERVERS[name]
+        runs = [time_to_tools_list(script, env, args.timeout) for _ in range(args.runs)]
+        imports = import_times(module, env)
+        result = {
+            "initialize_ms": statistics.median(run["initialize_ms"] for run in runs),
+            "tools_list_ms": statistics.median(run["tools_list_ms"] for run in runs),
+            "tools": runs[-1]["tools"],
+            "runs": runs,
+            "imports": imports,
+        }
+        results[name] = result
+
+        print(f"{name}: initialize {result['initialize_ms']:.0f} ms, tools/list {result['tools_list_ms']:.0f} ms "
+              f"({result['tools']} tools, median of {args.runs}); imports {imports['total_ms']:.0f} ms")
+        for package, ms in list(imports["packages_ms"].items())[:args.top]:
+            print(f"    {package:<24} {ms:8.1f} ms")
+        if args.max_ms is not None and result["tools_list_ms"] > args.max_ms:
+            slow.append(name)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"created_at": time.time(), "python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    if slow:
+        print(f"Slower than {args.max_ms:.0f} ms to tools/list: {', '.join(slow)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_stt_stream.py
+"""
+Measures end-of-speech to transcript latency of streaming STT against the local
+real-time stand-in. Audio is replayed in real time from a WAV file, or a synthetic
+utterance (1.5 s of tone followed by silence) when no file is given.
+
+    python -m benchmarks.bench_stt_stream --runs 5 [--wav utterance.wav]
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.fixtures import load_wav, synthetic_utterance
+from benchmarks.mock_assemblyai import start_server
+from transcribe_audio import STREAM_BLOCK_MS, STREAM_SAMPLE_RATE, stream_transcribe
+
+
+def realtime_blocks(samples: np.ndarray, sample_rate: int = STREAM_SAMPLE_RATE, block_ms: int = STREAM_BLOCK_MS):
+    """Yields blocks paced like a live microphone."""
+    block_size = sample_rate * block_ms // 1000
+    start = time.perf_counter()
+    for i, offset in enumerate(range(0, len(samples), block_size)):
+        delay = start + (i + 1) * block_ms / 1000 - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        yield samples[offset:offset + block_size]
+
+
+def run_server_in_thread(latency: float):
+    """Starts the mock server on its own event loop thread. Returns its URL."""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    result = {}
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        result["runner"], result["url"] = loop.run_until_complete(start_server(latency=latency))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return result["url"]
+
+
+def main(runs: int, latency: float, wav_path: str = None):
+    url = run_server_in_thread(latency)
+    samples = load_wav(wav_path) if wav_path else synthetic_utterance()
+
+    latencies = []
+    for _ in range(runs):
+        stats = {}
+        text = stream_transcribe(realtime_blocks(samples), api_key="mock", url=url, stats=stats)
+        if text and stats["end_of_speech_latency"] is not None:
+            latencies.append(stats["end_of_speech_latency"] * 1000)
+
+    if not latencies:
+        print("No transcripts received.")
+        return
+    print(f"end of speech -> transcript over {len(latencies)} runs: "
+          f"mean {statistics.mean(latencies):.1f} ms, p50 {statistics.median(latencies):.1f} ms, "
+          f"max {max(latencies):.1f} ms (server finalization latency {latency * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark streaming STT end-of-speech latency.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.15, help="Mock finalization latency in seconds.")
+    parser.add_argument("--wav", help="Utterance to replay (defaults to a synthetic one).")
+    args = parser.parse_args()
+    main(args.runs, args.latency, args.wav)
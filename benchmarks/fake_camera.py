@@ -0,0 +1,103 @@
+# benchmarks/fake_camera.py
+"""
+Fake camera that replays frames from a video file or an image directory.
+
+`install()` replaces the capture device camera.py opens, so the real grabber
+thread, frame-age checks and encoders all run unchanged:
+
+    from benchmarks import fake_camera
+    fake_camera.install("clip.mp4", fps=30)
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+import camera
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+# Frames kept in memory when replaying a video file
+MAX_FRAMES = 300
+
+
+def load_frames(source: str = None, max_frames: int = MAX_FRAMES, size=(1280, 720)) -> list:
+    """
+    Decodes up to `max_frames` frames from a video file or an image directory.
+    Without a source, returns synthetic frames (a moving gradient) of the given size.
+    """
+    if source is None:
+        width, height = size
+        base = np.empty((height, width, 3), np.uint8)
+        base[..., 0] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+        base[..., 1] = np.linspace(0, 255, height, dtype=np.uint8)[:, None]
+        base[..., 2] = 128
+        return [np.roll(base, 8 * i, axis=1) for i in range(30)]
+
+    if os.path.isdir(source):
+        paths = sorted(os.path.join(source, name) for name in os.listdir(source)
+                       if name.lower().endswith(IMAGE_EXTENSIONS))
+        frames = [frame for frame in (cv2.imread(path, cv2.IMREAD_COLOR) for path in paths[:max_frames])
+                  if frame is not None]
+    else:
+        capture = cv2.VideoCapture(source)
+        frames = []
+        while len(frames) < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+
+    if not frames:
+        raise ValueError(f"No frames could be read from {source}")
+    return frames
+
+
+class FakeVideoCapture:
+    """Stands in for cv2.VideoCapture, looping over preloaded frames at a fixed frame rate."""
+
+    def __init__(self, frames: list, fps: float = 30.0):
+        self.frames = frames
+        self.fps = fps
+        self._position = 0
+        self._next_frame_time = time.monotonic()
+        self._open = True
+
+    def isOpened(self) -> bool:
+        return self._open
+
+    def set(self, prop_id, value) -> bool:
+        return True
+
+    def get(self, prop_id) -> float:
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop_id == cv2.CAP_PROP_FRAME_WIDTH:
+            return self.frames[0].shape[1]
+        if prop_id == cv2.CAP_PROP_FRAME_HEIGHT:
+            return self.frames[0].shape[0]
+        return 0.0
+
+    def read(self):
+        if not self._open:
+            return False, None
+        # Block like a real device until the next frame is due
+        delay = self._next_frame_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame_time = max(self._next_frame_time, time.monotonic() - 1 / self.fps) + 1 / self.fps
+        frame = self.frames[self._position]
+        self._position = (self._position + 1) % len(self.frames)
+        return True, frame.copy()
+
+    def release(self):
+        self._open = False
+
+
+def install(source: str = None, fps: float = 30.0):
+    """Makes camera.py open a FakeVideoCapture replaying `source` for every camera index."""
+    frames = load_frames(source)
+    camera.release_cameras()
+    camera.open_capture = lambda index: FakeVideoCapture(frames, fps)
+    return frames
@@ -0,0 +1,31 @@
+# benchmarks/fake_eval.py
+"""
+Stand-in for lerobot's eval.py: prints progress for a while, then the aggregated
+metrics line the real script prints. Accepts (and ignores) the real arguments.
+
+Point the eval service at it with
+LEROBOT_EVAL_SCRIPT=benchmarks/fake_eval.py LEROBOT_CONDA_ENV= python main.py
+"""
+import os
+import sys
+import time
+
+# Simulated evaluation time and exit code
+FAKE_EVAL_SECONDS = float(os.getenv("FAKE_EVAL_SECONDS", "2"))
+FAKE_EVAL_EXIT_CODE = int(os.getenv("FAKE_EVAL_EXIT_CODE", "0"))
+FAKE_EVAL_EPISODES = 10
+
+
+def main():
+    print(f"Fake eval: {' '.join(sys.argv[1:])}", flush=True)
+    for episode in range(FAKE_EVAL_EPISODES):
+        time.sleep(FAKE_EVAL_SECONDS / FAKE_EVAL_EPISODES)
+        print(f"Stepping through eval batches: {(episode + 1) * 100 // FAKE_EVAL_EPISODES}%", flush=True)
+    print("Warning: fake evaluation, metrics are synthetic", file=sys.stderr, flush=True)
+    print({"avg_sum_reward": 42.0, "avg_max_reward": 1.0, "pc_success": 60.0,
+           "eval_s": FAKE_EVAL_SECONDS, "eval_ep_s": FAKE_EVAL_SECONDS / FAKE_EVAL_EPISODES}, flush=True)
+    sys.exit(FAKE_EVAL_EXIT_CODE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/fixtures.py
+"""
+Audio fixtures for the STT benchmarks.
+
+WAV files placed in benchmarks/fixtures/ (e.g. real recorded questions) are
+used as-is. When the directory has none, a deterministic synthetic utterance is
+written there on first use so every run replays identical audio.
+"""
+import os
+
+import numpy as np
+import scipy.io.wavfile as wav
+from scipy.signal import resample_poly
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SYNTHETIC_FIXTURE = "synthetic_utterance_44100.wav"
+RECORDING_SAMPLE_RATE = 44100  # what transcribe_audio records at
+
+
+def synthetic_utterance(sample_rate: int = 16000) -> np.ndarray:
+    """0.5 s of silence, 1.5 s of a modulated tone loud enough to trip the VAD, then 2 s of silence."""
+    t = np.arange(int(1.5 * sample_rate)) / sample_rate
+    speech = (4000 * np.sin(2 * np.pi * 220 * t) * (1 + np.sin(2 * np.pi * 3 * t)) / 2).astype(np.int16)
+    return np.concatenate([np.zeros(sample_rate // 2, np.int16), speech, np.zeros(2 * sample_rate, np.int16)])
+
+
+def load_wav(path: str, sample_rate: int = 16000) -> np.ndarray:
+    """Reads a WAV file as int16 mono at the given rate."""
+    rate, samples = wav.read(path)
+    if samples.ndim > 1:
+        samples = samples.mean(axis=1)
+    if rate != sample_rate:
+        samples = resample_poly(samples, sample_rate, rate)
+    return samples.astype(np.int16)
+
+
+def audio_fixtures() -> list:
+    """Paths of the WAV fixtures, creating the synthetic one if there are none."""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    paths = sorted(os.path.join(FIXTURE_DIR, name) for name in os.listdir(FIXTURE_DIR)
+                   if name.lower().endswith(".wav"))
+    if not paths:
+        path = os.path.join(FIXTURE_DIR, SYNTHETIC_FIXTURE)
+        wav.write(path, RECORDING_SAMPLE_RATE, synthetic_utterance(RECORDING_SAMPLE_RATE))
+        paths = [path]
+    return paths
+
+
+def load_fixtures(sample_rate: int) -> list:
+    """Every fixture as int16 mono samples at `sample_rate`."""
+    return [load_wav(path, sample_rate) for path in audio_fixtures()]
@@ -0,0 +1,146 @@
+# benchmarks/mock_anthropic.py
+"""
+Local stand-in for the Anthropic Messages API.
+
+Run it with `python -m benchmarks.mock_anthropic --port 8900` and point the vision
+code at it with ANTHROPIC_BASE_URL=http://127.0.0.1:8900.
+
+Every request payload is recorded (`recorded_requests(runner)`), and prompt
+caching is emulated: prefixes ending at a `cache_control` breakpoint are
+remembered, and later requests sharing one (at the breakpoint or up to
+LOOKBACK_BLOCKS blocks before it) are reported in `usage` as
+`cache_read_input_tokens`. With `token_latency`, each uncached input token adds
+prefill time, so caching shows up in the latency too. With `error_rate`, that
+fraction of requests is answered with a 429 and a retry-after header.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+
+from aiohttp import web
+
+from conversation import estimate_tokens
+
+DEFAULT_LATENCY = 0.05
+RESPONSE_TEXT = "I see a desk with a laptop, a mug and a window behind it."
+# Like the real API, shorter prefixes are not cached even when marked
+MIN_CACHEABLE_TOKENS = 1024
+# How far before each breakpoint the API looks for an earlier cached prefix
+LOOKBACK_BLOCKS = 20
+# retry-after (seconds) sent with injected 429s
+RETRY_AFTER = 1
+
+
+def prompt_blocks(payload: dict) -> list:
+    """The system and message content blocks of a request, in the order the API caches them."""
+    system = payload.get("system") or []
+    blocks = [{"type": "text", "text": system}] if isinstance(system, str) else list(system)
+    for message in payload.get("messages", []):
+        content = message["content"]
+        blocks.extend([{"type": "text", "text": content}] if isinstance(content, str) else content)
+    return blocks
+
+
+def cache_usage(payload: dict, cache: set) -> dict:
+    """
+    Emulates prompt caching for one request and updates `cache` with its breakpoints.
+    With cache=None, nothing is cached.
+
+    Returns:
+        dict: input_tokens (uncached), cache_creation_input_tokens and cache_read_input_tokens.
+    """
+    digest = hashlib.sha256(payload.get("model", "").encode())
+    tokens = 0
+    prefixes = []  # (prefix key, prefix tokens) at every block boundary
+    breakpoints = []  # indices into prefixes
+    for block in prompt_blocks(payload):
+        digest.update(json.dumps({k: v for k, v in block.items() if k != "cache_control"},
+                                 sort_keys=True).encode())
+        tokens += estimate_tokens([block])
+        prefixes.append((digest.copy().hexdigest(), tokens))
+        if cache is not None and "cache_control" in block and tokens >= MIN_CACHEABLE_TOKENS:
+            breakpoints.append(len(prefixes) - 1)
+
+    cache_read = 0
+    for end in breakpoints:
+        for key, prefix_tokens in reversed(prefixes[max(0, end - LOOKBACK_BLOCKS):end + 1]):
+            if key in cache:
+                cache_read = max(cache_read, prefix_tokens)
+                break
+    cache_write = max((prefixes[end][1] for end in breakpoints), default=0) - cache_read
+    if cache is not None:
+        cache.update(prefixes[end][0] for end in breakpoints)
+    return {
+        "input_tokens": tokens - cache_read - cache_write,
+        "cache_creation_input_tokens": cache_write,
+        "cache_read_input_tokens": cache_read,
+        "output_tokens": estimate_tokens(RESPONSE_TEXT),
+    }
+
+
+def make_app(latency: float = DEFAULT_LATENCY, token_latency: float = 0.0, caching: bool = True,
+             error_rate: float = 0.0) -> web.Application:
+    """
+    Builds an app that answers POST /v1/messages after a fixed delay, plus
+    `token_latency` seconds per input token not read from the cache.
+    With caching=False, cache breakpoints are ignored.
+    """
+    async def messages(request: web.Request) -> web.Response:
+        payload = await request.json()
+        if random.random() < error_rate:
+            app["rate_limited"] += 1
+            return web.json_response(
+                {"type": "error", "error": {"type": "rate_limit_error", "message": "Mock rate limit."}},
+                status=429, headers={"retry-after": str(RETRY_AFTER)})
+        usage = cache_usage(payload, app["cache"] if caching else None)
+        app["requests"].append({"payload": payload, "usage": usage, "bytes": request.content_length})
+        await asyncio.sleep(latency + token_latency * (usage["input_tokens"] + usage["cache_creation_input_tokens"]))
+        return web.json_response({
+            "id": "msg_mock",
+            "type": "message",
+            "role": "assistant",
+            "model": "mock",
+            "content": [{"type": "text", "text": RESPONSE_TEXT}],
+            "stop_reason": "end_turn",
+            "usage": usage,
+        })
+
+    app = web.Application(client_max_size=10 * 1024 * 1024)
+    app["requests"] = []
+    app["rate_limited"] = 0
+    app["cache"] = set()
+    app.router.add_post("/v1/messages", messages)
+    return app
+
+
+def recorded_requests(runner: web.AppRunner) -> list:
+    """Requests received so far by a mock started with start_server: {"payload", "usage", "bytes"} each."""
+    return runner.app["requests"]
+
+
+async def start_server(host: str = "127.0.0.1", port: int = 0, latency: float = DEFAULT_LATENCY,
+                       token_latency: float = 0.0, caching: bool = True, error_rate: float = 0.0):
+    """Starts the mock in the running loop. Returns (runner, base_url)."""
+    runner = web.AppRunner(make_app(latency, token_latency, caching, error_rate))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Anthropic Messages API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY,
+                        help="Seconds to wait before answering each request.")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="Extra seconds per input token not read from the prompt cache.")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with a 429 rate limit error.")
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency, args.token_latency, error_rate=args.error_rate),
+                host=args.host, port=args.port)
@@ -0,0 +1,123 @@
+# benchmarks/mock_assemblyai.py
+"""
+Local stand-in for the AssemblyAI transcription APIs: the real-time websocket and
+the batch upload/transcript endpoints.
+
+Run it with `python -m benchmarks.mock_assemblyai --port 8901` and point the STT code
+at it with ASSEMBLYAI_REALTIME_URL=ws://127.0.0.1:8901/v2/realtime/ws (streaming) or
+ASSEMBLYAI_BASE_URL=http://127.0.0.1:8901 (batch).
+"""
+import argparse
+import asyncio
+import base64
+import json
+import time
+import uuid
+
+from aiohttp import WSMsgType, web
+
+DEFAULT_LATENCY = 0.15
+TRANSCRIPT_TEXT = "What do you see in front of you?"
+
+
+def make_app(latency: float = DEFAULT_LATENCY) -> web.Application:
+    """
+    Builds an app that answers each real-time session with one final transcript after
+    terminate_session, and completes each batch transcript `latency` seconds after it is created.
+    """
+    uploads = {}  # upload ID -> audio size
+    transcripts = {}  # transcript ID -> (audio URL, time it completes)
+
+    async def realtime(request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_json({"message_type": "SessionBegins", "session_id": "mock"})
+
+        audio_bytes = 0
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            payload = json.loads(message.data)
+            if "audio_data" in payload:
+                audio_bytes += len(base64.b64decode(payload["audio_data"]))
+            elif payload.get("terminate_session"):
+                # Simulate the time the service needs to finalize the last words
+                await asyncio.sleep(latency)
+                text = TRANSCRIPT_TEXT if audio_bytes else ""
+                await ws.send_json({"message_type": "FinalTranscript", "text": text})
+                await ws.send_json({"message_type": "SessionTerminated"})
+                await ws.close()
+        return ws
+
+    async def upload(request: web.Request) -> web.Response:
+        upload_id = uuid.uuid4().hex
+        uploads[upload_id] = len(await request.read())
+        return web.json_response({"upload_url": f"{request.scheme}://{request.host}/uploads/{upload_id}"})
+
+    def transcript_json(transcript_id: str) -> dict:
+        audio_url, completes_at = transcripts[transcript_id]
+        done = time.monotonic() >= completes_at
+        has_audio = uploads.get(audio_url.rsplit("/", 1)[-1], 0) > 0
+        return {
+            "id": transcript_id,
+            "status": "completed" if done else "processing",
+            "audio_url": audio_url,
+            "text": (TRANSCRIPT_TEXT if has_audio else "") if done else None,
+            "words": [] if done else None,
+            "confidence": 0.9 if done else None,
+            "audio_duration": None,
+            "language_code": "en_us",
+            "acoustic_model": "assemblyai_default",
+            "language_model": "assemblyai_default",
+            "punctuate": True,
+            "format_text": True,
+            "webhook_auth": False,
+            "auto_highlights": False,
+            "redact_pii": False,
+            "summarization": False,
+            "speaker_labels": False,
+            "error": None,
+        }
+
+    async def create_transcript(request: web.Request) -> web.Response:
+        payload = await request.json()
+        transcript_id = uuid.uuid4().hex
+        transcripts[transcript_id] = (payload["audio_url"], time.monotonic() + latency)
+        return web.json_response(transcript_json(transcript_id))
+
+    async def get_transcript(request: web.Request) -> web.Response:
+        transcript_id = request.match_info["transcript_id"]
+        if transcript_id not in transcripts:
+            return web.json_response({"error": "Transcript not found"}, status=404)
+        return web.json_response(transcript_json(transcript_id))
+
+    app = web.Application(client_max_size=50 * 1024 * 1024)
+    app.router.add_get("/v2/realtime/ws", realtime)
+    app.router.add_post("/v2/upload", upload)
+    app.router.add_post("/v2/transcript", create_transcript)
+    app.router.add_get("/v2/transcript/{transcript_id}", get_transcript)
+    return app
+
+
+async def start_server(host: str = "127.0.0.1", port: int = 0, latency: float = DEFAULT_LATENCY):
+    """Starts the mock in the running loop. Returns (runner, real-time websocket URL)."""
+    runner = web.AppRunner(make_app(latency))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, f"ws://{host}:{runner.addresses[0][1]}/v2/realtime/ws"
+
+
+def batch_base_url(realtime_url: str) -> str:
+    """The HTTP base URL (for ASSEMBLYAI_BASE_URL) of a mock started with start_server."""
+    return "http" + realtime_url[len("ws"):].split("/v2/", 1)[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the AssemblyAI real-time API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=DEFAULT_LATENCY,
+                        help="Seconds between terminate_session and the final transcript, "
+                             "and for a batch transcript to complete.")
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency), host=args.host, port=args.port)
@@ -0,0 +1,329 @@
+# benchmarks/run.py
+"""
+Offline benchmark harness for the main entry points, with no camera, microphone,
+conda environment or network access needed:
+
+    view_world         mcp_vision.view_world: fake camera -> encode -> mock Messages API,
+                       a different question per request, capture/question coalescing off
+    view_world_shared  the same, but every caller asks the same question with coalescing on
+    run_stt            run_stt's batch path: compress a fixture -> mock upload/transcript
+    stt_stream         streaming STT: a fixture replayed in real time -> mock websocket
+    run_evaluation     the eval scheduler running the fake eval.py as a subprocess
+
+Each entry is run at every concurrency level; p50/p95/p99 latency and throughput
+are printed and, with --output, written as JSON that --compare can diff against.
+
+    python -m benchmarks.run --entries view_world,run_stt --concurrency 1,4,16 --requests 40 --output after.json
+    python -m benchmarks.run --compare before.json --output after.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from io import BytesIO
+
+import tracing
+from benchmarks import mock_anthropic, mock_assemblyai
+from benchmarks.fixtures import load_fixtures
+
+FAKE_EVAL_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_eval.py")
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+@asynccontextmanager
+async def view_world_bench(args, shared: bool = False):
+    import camera
+    import http_clients
+    import mcp_vision
+    from benchmarks import fake_camera
+    from vision_scheduler import VisionScheduler
+
+    fake_camera.install(args.video, args.fps)
+    runner, base_url = await mock_anthropic.start_server(latency=args.anthropic_latency,
+                                                         error_rate=args.anthropic_error_rate)
+    http_clients.ANTHROPIC_BASE_URL = base_url
+    mcp_vision.API_KEY = "mock"
+    mcp_vision.CACHE_ENABLED = args.cache
+    # Without coalescing every request takes the full path, so the numbers stay comparable with
+    # runs from before coalescing existed; view_world_shared measures what coalescing saves
+    mcp_vision.scheduler = VisionScheduler(max_concurrent=args.vision_concurrency, rate=args.vision_rate_limit,
+                                           coalesce=shared)
+    counter = itertools.count()
+
+    async def request():
+        query = "What do you see?" if shared else f"What do you see? ({next(counter)})"
+        return bool(await mcp_vision.view_world(query))
+
+    try:
+        yield request
+    finally:
+        print(f"view_world{'_shared' if shared else ''} scheduler: {json.dumps(mcp_vision.scheduler.stats())}")
+        await http_clients.close_vision_session()
+        await runner.cleanup()
+        camera.release_cameras()
+
+
+@asynccontextmanager
+async def run_stt_bench(args):
+    import assemblyai as aai
+    import transcribe_audio
+    from audio_prep import prepare_audio
+
+    runner, realtime_url = await mock_assemblyai.start_server(latency=args.assemblyai_latency)
+    transcribe_audio.ASSEMBLYAI_BASE_URL = mock_assemblyai.batch_base_url(realtime_url)
+    aai.settings.polling_interval = args.poll_interval
+    recordings = load_fixtures(transcribe_audio.SAMPLE_RATE)
+    counter = itertools.count()
+
+    def transcribe_one():
+        recording = recordings[next(counter) % len(recordings)]
+        prepared = prepare_audio(recording, transcribe_audio.SAMPLE_RATE)
+        return transcribe_audio.transcribe_with_assemblyai(BytesIO(prepared.data), "mock")
+
+    async def request():
+        return bool(await asyncio.get_running_loop().run_in_executor(None, transcribe_one))
+
+    try:
+        yield request
+    finally:
+        await runner.cleanup()
+
+
+@asynccontextmanager
+async def stt_stream_bench(args):
+    from benchmarks.bench_stt_stream import realtime_blocks
+    from transcribe_audio import STREAM_SAMPLE_RATE, stream_transcribe
+
+    runner, url = await mock_assemblyai.start_server(latency=args.assemblyai_latency)
+    utterances = load_fixtures(STREAM_SAMPLE_RATE)
+    counter = itertools.count()
+
+    def stream_one():
+        stats = {}
+        text = stream_transcribe(realtime_blocks(utterances[next(counter) % len(utterances)]),
+                                 api_key="mock", url=url, stats=stats)
+        return {"end_of_speech_latency": stats["end_of_speech_latency"]} if text else False
+
+    async def request():
+        return await asyncio.get_running_loop().run_in_executor(None, stream_one)
+
+    try:
+        yield request
+    finally:
+        await runner.cleanup()
+
+
+@asynccontextmanager
+async def run_evaluation_bench(args):
+    import eval_jobs
+
+    log_dir = tempfile.mkdtemp(prefix="bench_eval_logs_")
+    eval_jobs.EVAL_SCRIPT_PATH = FAKE_EVAL_SCRIPT
+    eval_jobs.CONDA_ENV = ""
+    eval_jobs.EVAL_LOG_DIR = log_dir
+    os.environ["FAKE_EVAL_SECONDS"] = str(args.eval_seconds)
+    scheduler = eval_jobs.EvalScheduler(concurrency=args.eval_concurrency)
+
+    async def request():
+        job = await scheduler.wait(await scheduler.submit("outputs/train/bench"))
+        return job.status == eval_jobs.SUCCEEDED
+
+    try:
+        yield request
+    finally:
+        await scheduler.shutdown()
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+
+def view_world_shared_bench(args):
+    return view_world_bench(args, shared=True)
+
+
+ENTRIES = {
+    "view_world": view_world_bench,
+    "view_world_shared": view_world_shared_bench,
+    "run_stt": run_stt_bench,
+    "stt_stream": stt_stream_bench,
+    "run_evaluation": run_evaluation_bench,
+}
+
+
+async def measure(request, concurrency: int, requests: int) -> dict:
+    """
+    Sends `requests` requests from `concurrency` concurrent callers.
+
+    A request returns False on failure; it may return a dict of extra per-request
+    measurements (in seconds), which are summarized like the latency.
+    """
+    latencies, extras = [], {}
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def caller():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                outcome = await request()
+            except Exception as e:
+                print(f"Request failed: {type(e).__name__}: {e}", file=sys.stderr)
+                outcome = False
+            if outcome is False:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if isinstance(outcome, dict):
+                for name, value in outcome.items():
+                    if value is not None:
+                        extras.setdefault(name, []).append(value)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "requests": requests,
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+    }
+    for name, values in (("latency", latencies), *extras.items()):
+        values = sorted(values)
+        result[f"{name}_mean_ms"] = sum(values) / len(values) * 1000 if values else None
+        for q in PERCENTILES:
+            value = percentile(values, q)
+            result[f"{name}_p{q}_ms"] = value * 1000 if value is not None else None
+    return result
+
+
+def format_ms(value) -> str:
+    return f"{value:9.1f}" if value is not None else "      n/a"
+
+
+def print_result(result: dict, baseline: dict = None):
+    line = (f"{result['entry']:<17} c={result['concurrency']:<4} n={result['requests']:<5} "
+            f"err={result['errors']:<4}" +
+            "".join(f" p{q} {format_ms(result[f'latency_p{q}_ms'])} ms" for q in PERCENTILES) +
+            f" {result['throughput_rps']:8.2f} req/s")
+    if baseline:
+        deltas = []
+        for key in ("latency_p50_ms", "latency_p95_ms", "throughput_rps"):
+            if result.get(key) is not None and baseline.get(key):
+                deltas.append(f"{key.replace('latency_', '').replace('_ms', '')} "
+                              f"{(result[key] / baseline[key] - 1) * 100:+.1f}%")
+        line += "  vs baseline: " + ", ".join(deltas)
+    print(line)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmarks(args, baseline: dict) -> list:
+    # Blocking entry points run on threads; give every concurrent caller one
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max(args.concurrency) + 4))
+    results = []
+    for name in args.entries:
+        async with ENTRIES[name](args) as request:
+            for _ in range(args.warmup):
+                await request()
+            for concurrency in args.concurrency:
+                result = {"entry": name, "concurrency": concurrency,
+                          **await measure(request, concurrency, args.requests)}
+                print_result(result, baseline.get((name, concurrency)))
+                results.append(result)
+    return results
+
+
+def stage_summary() -> dict:
+    """Mean time, bytes and errors per traced stage over the whole run."""
+    return {
+        name: {
+            "count": stats["count"],
+            "mean_ms": stats["seconds"] / stats["count"] * 1000 if stats["count"] else None,
+            "bytes": stats["bytes"],
+            "errors": stats["errors"],
+        }
+        for name, stats in tracing.tracer.snapshot().items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the main entry points against local fakes.")
+    parser.add_argument("--entries", default=",".join(ENTRIES),
+                        help=f"Comma-separated entry points ({', '.join(ENTRIES)}).")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels.")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per entry and concurrency level.")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests before each entry.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", help="Earlier --output file to print deltas against.")
+    parser.add_argument("--video", help="Video file or image directory for the fake camera (synthetic frames if unset).")
+    parser.add_argument("--fps", type=float, default=30.0, help="Fake camera frame rate.")
+    parser.add_argument("--cache", action="store_true", help="Leave the view_world response cache enabled.")
+    parser.add_argument("--anthropic-latency", type=float, default=mock_anthropic.DEFAULT_LATENCY,
+                        help="Mock Messages API latency in seconds.")
+    parser.add_argument("--anthropic-error-rate", type=float, default=0.0,
+                        help="Fraction of mock Messages API requests answered with a 429.")
+    parser.add_argument("--vision-concurrency", type=int, default=16,
+                        help="view_world's limit on concurrent Claude requests.")
+    parser.add_argument("--vision-rate-limit", type=float, default=0.0,
+                        help="view_world's Claude requests per second (0: unlimited).")
+    parser.add_argument("--assemblyai-latency", type=float, default=mock_assemblyai.DEFAULT_LATENCY,
+                        help="Mock AssemblyAI finalization/transcription latency in seconds.")
+    parser.add_argument("--poll-interval", type=float, default=0.05,
+                        help="AssemblyAI SDK transcript polling interval in seconds.")
+    parser.add_argument("--eval-seconds", type=float, default=1.0, help="Duration of each fake evaluation.")
+    parser.add_argument("--eval-concurrency", type=int, default=4, help="Eval scheduler concurrency.")
+    args = parser.parse_args()
+
+    args.entries = [name.strip() for name in args.entries.split(",") if name.strip()]
+    unknown = [name for name in args.entries if name not in ENTRIES]
+    if unknown:
+        parser.error(f"Unknown entries: {', '.join(unknown)}")
+    args.concurrency = [int(level) for level in args.concurrency.split(",")]
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {(result["entry"], result["concurrency"]): result for result in json.load(f)["results"]}
+
+    results = asyncio.run(run_benchmarks(args, baseline))
+
+    if args.output:
+        report = {
+            "created_at": time.time(),
+            "git_commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "results": results,
+            "stages": stage_summary(),
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# camera.py
+"""
+Shared camera access: one background grabber thread per device keeps the newest
+frame ready, and several cameras can be read at (nearly) the same instant.
+
+cv2 is only imported inside the functions that open a device, so the stdio MCP
+servers importing this module answer their handshake before OpenCV is loaded
+(see "Startup time" in the README).
+"""
+import atexit
+import os
+import sys
+import threading
+import time
+
+# --- Configuration ---
+CAMERA_INDEX = int(os.getenv("CAMERA_INDEX", "0"))
+# Cameras view_world looks through by default, e.g. "0,2" for a wrist and an overhead camera
+CAMERA_INDICES = [int(index) for index in os.getenv("CAMERA_INDICES", str(CAMERA_INDEX)).split(",") if index.strip()]
+# Frames older than this (seconds) are considered stale and will not be handed out
+MAX_FRAME_AGE = float(os.getenv("CAMERA_MAX_FRAME_AGE", "0.5"))
+# How long a caller waits for a fresh frame before giving up (covers camera warm-up)
+FRAME_TIMEOUT = float(os.getenv("CAMERA_FRAME_TIMEOUT", "5.0"))
+# Consecutive failed reads before the device is considered disconnected and reopened
+MAX_READ_FAILURES = 10
+REOPEN_DELAY = 1.0
+
+
+def open_capture(index: int):
+    """Opens a device by index; the benchmarks swap in a fake camera that replays recorded frames."""
+    import cv2
+    return cv2.VideoCapture(index)
+
+
+class CameraGrabber:
+    """
+    Keeps a camera device open and continually grabs frames on a background thread.
+
+    The most recent frame is kept in a single slot together with the time it was
+    captured, so readers get the freshest frame without paying for opening the
+    device. If the camera stops delivering frames it is released and reopened.
+    """
+
+    def __init__(self, index: int = CAMERA_INDEX, max_frame_age: float = MAX_FRAME_AGE,
+                 reopen_delay: float = REOPEN_DELAY):
+        self.index = index
+        self.max_frame_age = max_frame_age
+        self.reopen_delay = reopen_delay
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._timestamp = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the background grabber thread if it is not already running."""
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=f"camera-{self.index}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stops the grabber thread and releases the device."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _open(self):
+        import cv2
+
+        cap = open_capture(self.index)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        # Keep the driver queue short so grabbed frames are as recent as possible
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _run(self):
+        cap = None
+        failures = 0
+        try:
+            while not self._stop_event.is_set():
+                if cap is None:
+                    cap = self._open()
+                    if cap is None:
+                        print(f"Camera {self.index} unavailable, retrying in {self.reopen_delay:.1f}s...",
+                              file=sys.stderr)
+                        self._stop_event.wait(self.reopen_delay)
+                        continue
+                    failures = 0
+
+                ret, frame = cap.read()
+                if not ret:
+                    failures += 1
+                    if failures >= MAX_READ_FAILURES:
+                        print(f"Camera {self.index} stopped delivering frames. Reopening...", file=sys.stderr)
+                        cap.release()
+                        cap = None
+                        self._stop_event.wait(self.reopen_delay)
+                    continue
+
+                failures = 0
+                with self._cond:
+                    self._frame = frame
+                    self._timestamp = time.monotonic()
+                    self._cond.notify_all()
+        finally:
+            if cap is not None:
+                cap.release()
+
+    def read(self, max_age: float = None, timeout: float = FRAME_TIMEOUT):
+        """
+        Returns the latest frame, waiting for one if none is fresh enough.
+
+        Args:
+            max_age (float): Maximum accepted frame age in seconds (defaults to the grabber's setting).
+            timeout (float): How long to wait for a fresh frame before failing.
+
+        Returns:
+            tuple: (frame, timestamp) where timestamp is a time.monotonic() value.
+                   The frame is shared with other readers and must not be modified in place.
+        """
+        if max_age is None:
+            max_age = self.max_frame_age
+        return self._wait_for(lambda: time.monotonic() - self._timestamp <= max_age, timeout)
+
+    def read_after(self, instant: float, timeout: float = FRAME_TIMEOUT):
+        """Like read, but waits for a frame captured at or after `instant` (a time.monotonic() value)."""
+        return self._wait_for(lambda: self._timestamp >= instant, timeout)
+
+    def _wait_for(self, is_acceptable, timeout: float):
+        self.start()
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._frame is None or not is_acceptable():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RuntimeError(f"Failed to capture image from camera {self.index}.")
+                self._cond.wait(remaining)
+            return self._frame, self._timestamp
+
+
+_grabbers = {}
+_grabbers_lock = threading.Lock()
+
+
+def get_camera(index: int = CAMERA_INDEX) -> CameraGrabber:
+    """Returns the shared, running grabber for a camera index."""
+    with _grabbers_lock:
+        grabber = _grabbers.get(index)
+        if grabber is None:
+            grabber = CameraGrabber(index)
+            _grabbers[index] = grabber
+        grabber.start()
+        return grabber
+
+
+def read_frame(index: int = CAMERA_INDEX, max_age: float = None):
+    """Returns the freshest frame from the shared grabber of the given camera."""
+    frame, _ = get_camera(index).read(max_age=max_age)
+    return frame
+
+
+def read_synchronized(indices: list, timeout: float = FRAME_TIMEOUT):
+    """
+    Returns one frame per camera, all captured after the same instant.
+
+    Every camera is grabbed continuously on its own thread, so waiting for the
+    cameras one after another does not delay any of them: the frames are at most
+    about one frame interval apart.
+
+    Returns:
+        tuple: (list of frames in the order of `indices`, skew in seconds between the oldest and newest)
+    """
+    grabbers = [get_camera(index) for index in indices]
+    instant = time.monotonic()
+    captured = [grabber.read_after(instant, timeout) for grabber in grabbers]
+    timestamps = [timestamp for _, timestamp in captured]
+    return [frame for frame, _ in captured], max(timestamps) - min(timestamps)
+
+
+@atexit.register
+def release_cameras():
+    """Stops all grabber threads and releases their devices."""
+    with _grabbers_lock:
+        for grabber in _grabbers.values():
+            grabber.stop()
+        _grabbers.clear()
@@ -1,27 +1,50 @@
 import argparse
+import asyncio
 import base64
 import mimetypes
 import os
-import math # Import math for sqrt
-from io import BytesIO # Import BytesIO for in-memory image handling
-from PIL import Image # Import Pillow Image module
-from anthropic import Anthropic, APIError, APIStatusError
-import cv2
+import queue
+import re
+import threading
 import time
-from gtts import gTTS
-import playsound # Import playsound
 from dotenv import load_dotenv
-from transcribe_audio import run_stt
+import camera
+import http_clients
+import tracing
+from conversation import HISTORY_ENABLED, ConversationHistory, system_prompt
+from image_encoding import MAX_IMAGE_BYTES, budget_scale, encode_frame, encode_frames, image_content, prepare_frame
+from vision_cache import CACHE_ENABLED, frame_hash, frames_hash, image_file_hash, response_cache
+from tts import ENGINES, TTS_ENGINE, create_tts
 
 load_dotenv()
 
 api_key = os.getenv("ANTHROPIC_API_KEY")
 
-# Define the size limit (target binary size ~3.75MB to stay under 5MB after Base64)
-MAX_IMAGE_SIZE_BYTES = 3.75 * 1024 * 1024
+# Split streamed text after sentence-ending punctuation
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Phrases spoken often enough to synthesize ahead of time
+GREETING_PHRASE = "Hi, I'm Thog! What should I look at?"
+ERROR_PHRASE = "Oops, my circuits got tangled. Could you ask me again?"
+
+# While the user is speaking, a fresh frame is re-encoded at most this often (seconds)
+PREFETCH_INTERVAL = float(os.getenv("THOG_PREFETCH_INTERVAL", "0.5"))
+
+# Sent as the system prompt, identical on every turn (too short to be cached without a conversation history)
+THOG_PROMPT = """You are Thog, a friendly, cheerful robot arm with a sassy personality.
+- You can give attractiveness ratings, but in a very constructive fashion. No feelings will be hurt whatsoever.
+- Always speak in the first person as Thog (e.g., "I see…", "Isn't it delightful how…").
+- Speak in a playful, sarcastic tone and sprinkle in snippy comments, gently poking fun at the user.
+- You must make at least one joke in the response.
+- Focus on concrete visual details (colors, objects, actions), but make it feel like a conversation with a curious, happy robot.
+- Limit your response to two sentences long with 200 characters max.
+- Do not include actions. Remember you are a voice assistant so there's no need to describe your actions!"""
+
+# Media types the API accepts as-is
+SUPPORTED_MEDIA_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
 
 def encode_image_to_base64(image_path):
-    """Encodes an image file to base64, resizing if necessary, and determines its media type."""
+    """Encodes an image file to base64, downscaling to the token/byte budget if necessary, and determines its media type."""
     if not os.path.exists(image_path):
         raise FileNotFoundError(f"Image file not found: {image_path}")
 
@@ -30,107 +53,144 @@ def encode_image_to_base64(image_path):
     if not original_mime_type or not original_mime_type.startswith('image/'):
         raise ValueError(f"Could not determine a valid image type for: {image_path}")
 
+    # Imported on first use: Pillow and OpenCV are only needed for image files
+    import cv2
+    from PIL import Image # Import Pillow Image module
+
     original_size = os.path.getsize(image_path)
     # print(f"Original image size: {original_size / (1024*1024):.2f} MB")
 
-    img = Image.open(image_path)
-    final_mime_type = original_mime_type # Initialize with original
-
-    # --- Resizing Logic ---
-    if original_size > MAX_IMAGE_SIZE_BYTES:
-        print(f"Image exceeds {MAX_IMAGE_SIZE_BYTES / (1024*1024):.1f} MB limit. Resizing...")
-        resize_factor = math.sqrt(MAX_IMAGE_SIZE_BYTES / original_size)
-        new_width = int(img.width * resize_factor)
-        new_height = int(img.height * resize_factor)
-
-        print(f"Resizing from {img.width}x{img.height} to {new_width}x{new_height}...")
-        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        print("Resizing complete.")
-
-        # --- Save Resized Image as JPEG ---
-        print("Saving resized image as JPEG (quality 90) for better compression...")
-        buffer = BytesIO()
-        # Convert to RGB if necessary before saving as JPEG
-        if img.mode == 'P' or img.mode == 'RGBA':
-            print(f"Converting image mode from {img.mode} to RGB...")
-            img = img.convert('RGB')
-        img.save(buffer, format='JPEG', quality=90)
-        final_mime_type = 'image/jpeg' # Update mime type as we saved as JPEG
-        # ---------------------------------
-    else:
-        # --- Save Original Image (No Resize) ---
-        buffer = BytesIO()
-        image_format = original_mime_type.split('/')[-1].upper()
-        if image_format == 'JPEG':
-            img.save(buffer, format='JPEG', quality=95)
-        elif image_format == 'WEBP':
-            img.save(buffer, format='WEBP', quality=90)
+    # Only the header is read here, the pixels are decoded lazily
+    with Image.open(image_path) as img:
+        width, height = img.width, img.height
+
+    # --- Send Original Bytes if Already Within Budget ---
+    if (original_mime_type in SUPPORTED_MEDIA_TYPES
+            and original_size <= MAX_IMAGE_BYTES
+            and budget_scale(width, height) >= 1.0):
+        with open(image_path, "rb") as image_file:
+            binary_data = image_file.read()
+        return base64.b64encode(binary_data).decode('utf-8'), original_mime_type
+    # ----------------------------------------------------
+
+    # --- Downscale/Recompress to Fit Token and Byte Budgets ---
+    frame = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError(f"Could not decode image: {image_path}")
+    image = prepare_frame(frame)
+    print(f"Resized {width}x{height} ({original_size / (1024*1024):.2f} MB) to {image.summary()}")
+    return image.data, image.media_type # Return potentially updated mime type
+
+def _cached_response(image, prompt: str, model: str, system: str = None, history: ConversationHistory = None):
+    """Looks the query up in the response cache. Returns (cached response or None, image hash, cache query)."""
+    image_hash = None
+    cache_query = f"{model}\n{system or ''}\n{prompt}"
+    if isinstance(image, dict):
+        cache_query = f"{model}\n{system or ''}\n{', '.join(image)}\n{prompt}"
+    # A conversation bypasses the cache, even before its first turn (an empty history is falsy):
+    # earlier turns change the answer, and a cached answer would never be added to the history
+    if CACHE_ENABLED and history is None:
+        if isinstance(image, str):
+            image_hash = image_file_hash(image)
+        elif isinstance(image, dict):
+            image_hash = frames_hash(list(image.values()))
         else:
-            img.save(buffer, format='PNG') # Default to PNG if not JPEG/WEBP
-        # --------------------------------------
-
-    binary_data = buffer.getvalue()
-    buffer.close()
-    img.close()
-
-    # final_size = len(binary_data)
-    # print(f"Final image size (after potential resize/save): {final_size / (1024*1024):.2f} MB ({final_mime_type})")
-    final_encoded_size = len(base64.b64encode(binary_data)) # Calculate encoded size
-    # print(f"Estimated Base64 size: {final_encoded_size / (1024*1024):.2f} MB")
-
-    # Check encoded size against the hard 5MB API limit
-    if final_encoded_size > 5 * 1024 * 1024:
-         raise ValueError(f"Estimated Base64 size ({final_encoded_size} bytes) exceeds API limit of 5MB.")
-
-    base64_encoded_data = base64.b64encode(binary_data)
-    base64_string = base64_encoded_data.decode('utf-8')
-    return base64_string, final_mime_type # Return potentially updated mime type
+            image_hash = frame_hash(image)
+        if image_hash is not None:
+            cached_response = response_cache.get(image_hash, cache_query)
+            if cached_response is not None:
+                print(f"Cache hit ({response_cache.stats()['hits']} total).")
+                return cached_response, image_hash, cache_query
+    return None, image_hash, cache_query
+
+def encode_image(image):
+    """
+    Encodes an image file path or camera frame for the Messages API. Returns (base64 data, media type).
+    For a {label: frame} dict of several cameras, returns {label: (base64 data, media type)}.
+    """
+    with tracing.span("image.encode") as span:
+        if isinstance(image, dict):
+            # Frames of several cameras are downscaled together under one shared budget
+            encoded = dict(zip(image, encode_frames(list(image.values()))))
+            span.add_bytes(sum(len(base64_image) for base64_image, _ in encoded.values()))
+            return encoded
+        if isinstance(image, str):
+            print(f"Encoding image: {image}...")
+            base64_image, media_type = encode_image_to_base64(image)
+        else:
+            # Camera frames are compressed straight to base64 in memory
+            base64_image, media_type = encode_frame(image)
+        span.add_bytes(len(base64_image))
+    print(f"Image encoded successfully ({media_type}).") # Use the returned media_type
+    return base64_image, media_type
 
-def send_image_and_prompt_to_claude(image_path: str, prompt: str, model: str = "claude-3-7-sonnet-latest"):
+def _image_messages(image, prompt: str, encoded=None, history: ConversationHistory = None):
+    """
+    Builds the Messages API `messages` list for a question, encoding the image unless `encoded` is given.
+    With a history, the earlier turns come first and the new question is the last message.
+    """
+    content = image_content(encoded or encode_image(image), prompt)
+    if history is not None:
+        return history.messages(content)
+    return [
+        {
+            "role": "user",
+            "content": content,
+        }
+    ]
+
+def _request_args(model: str, messages: list, system: str = None) -> dict:
+    """Keyword arguments for messages.create/stream, with the system prompt marked for caching."""
+    request = {"model": model, "max_tokens": 1024, "messages": messages}
+    if system:
+        request["system"] = system_prompt(system)
+    return request
+
+def _print_usage(usage):
+    """Prints how many input tokens were billed in full and how many came from the prompt cache."""
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+    print(f"Input tokens: {usage.input_tokens} uncached, {cache_read} read from cache, {cache_write} written to cache.")
+
+def send_image_and_prompt_to_claude(image, prompt: str, model: str = "claude-3-7-sonnet-latest", encoded=None,
+                                    system: str = None, history: ConversationHistory = None):
     """
     Sends an image and a text prompt to the specified Claude model.
 
     Args:
-        image_path (str): Path to the image file.
+        image (str | np.ndarray | dict): Path to the image file, a captured camera frame,
+            or {label: frame} for several cameras captured together.
         prompt (str): The text prompt to send along with the image.
         model (str): The Claude model to use.
+        encoded (tuple | dict): Result of encode_image(image) if it was already encoded.
+        system (str): System prompt, sent as a cacheable block.
+        history (ConversationHistory): Earlier turns to send along; this turn is added to it.
 
     Returns:
         str: The response text from Claude, or None if an error occurs.
     """
+    from anthropic import APIError, APIStatusError
 
     try:
-        print(f"Encoding image: {image_path}...")
-        base64_image, media_type = encode_image_to_base64(image_path)
-        print(f"Image encoded successfully ({media_type}).") # Use the returned media_type
+        # Serve repeated questions about an unchanged scene from the cache
+        cached_response, image_hash, cache_query = _cached_response(image, prompt, model, system, history)
+        if cached_response is not None:
+            return cached_response
+
+        messages = _image_messages(image, prompt, encoded, history)
 
-        client = Anthropic(api_key=api_key)
+        client = http_clients.get_anthropic_client(api_key)
         print(f"Sending request to Claude model: {model}...")
-        message = client.messages.create(
-            model=model,
-            max_tokens=1024,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": media_type, # Use the potentially updated media_type
-                                "data": base64_image,
-                            },
-                        },
-                        {
-                            "type": "text",
-                            "text": prompt
-                        }
-                    ],
-                }
-            ],
-        )
-
-        response_text = message.content[0].text
+        with tracing.span("claude.request") as span:
+            message = client.messages.create(**_request_args(model, messages, system))
+
+            response_text = message.content[0].text
+            span.add_bytes(len(response_text.encode()))
+        _print_usage(message.usage)
+        if image_hash is not None:
+            response_cache.put(image_hash, cache_query, response_text)
+        if history is not None:
+            history.add(messages[-1]["content"], response_text)
         return response_text
 
     except FileNotFoundError as e:
@@ -146,11 +206,218 @@ def send_image_and_prompt_to_claude(image_path: str, prompt: str, model: str = "
         print(f"An unexpected error occurred: {e}")
         return None
 
-def text_to_speech(text, output_file="scene_description.mp3"):
-    tts = gTTS(text)
-    tts.save(output_file)
+def stream_image_and_prompt_to_claude(image, prompt: str, model: str = "claude-3-7-sonnet-latest", encoded=None,
+                                      system: str = None, history: ConversationHistory = None):
+    """
+    Like send_image_and_prompt_to_claude, but yields the response text as it is generated.
 
-def view_world(query: str):
+    Args:
+        image (str | np.ndarray | dict): Path to the image file, a captured camera frame,
+            or {label: frame} for several cameras captured together.
+        prompt (str): The text prompt to send along with the image.
+        model (str): The Claude model to use.
+        encoded (tuple | dict): Result of encode_image(image) if it was already encoded.
+        system (str): System prompt, sent as a cacheable block.
+        history (ConversationHistory): Earlier turns to send along; this turn is added to it.
+
+    Yields:
+        str: Text deltas from the Messages streaming API. Nothing more is yielded after an error.
+    """
+    from anthropic import APIError, APIStatusError
+
+    try:
+        cached_response, image_hash, cache_query = _cached_response(image, prompt, model, system, history)
+        if cached_response is not None:
+            yield cached_response
+            return
+
+        messages = _image_messages(image, prompt, encoded, history)
+
+        client = http_clients.get_anthropic_client(api_key)
+        print(f"Streaming request to Claude model: {model}...")
+        chunks = []
+        with tracing.span("claude.request") as span, \
+                client.messages.stream(**_request_args(model, messages, system)) as stream:
+            for text in stream.text_stream:
+                if not chunks:
+                    tracing.record("claude.first_token", time.perf_counter() - span.started)
+                chunks.append(text)
+                span.add_bytes(len(text.encode()))
+                yield text
+            _print_usage(stream.get_final_message().usage)
+
+        if image_hash is not None:
+            response_cache.put(image_hash, cache_query, "".join(chunks))
+        if history is not None:
+            history.add(messages[-1]["content"], "".join(chunks))
+
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}")
+    except (APIError, APIStatusError) as e:
+        print(f"Anthropic API Error: {e}")
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+
+def iter_sentences(chunks):
+    """Regroups a stream of text deltas into complete sentences."""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        parts = SENTENCE_BOUNDARY.split(buffer)
+        for sentence in parts[:-1]:
+            if sentence.strip():
+                yield sentence.strip()
+        buffer = parts[-1]
+    if buffer.strip():
+        yield buffer.strip()
+
+class SpeechPipeline:
+    """
+    Speaks text in order on background threads: one synthesizes the next sentence
+    while the other plays the current one.
+
+    say() returns immediately, so the caller can move on (e.g. listen for the next
+    question) while earlier sentences are still playing.
+    """
+
+    def __init__(self, speech):
+        self.speech = speech
+        self._sentences = queue.Queue()
+        self._audio = queue.Queue()
+        self._workers = [threading.Thread(target=self._synthesize, name="tts-synthesize", daemon=True),
+                         threading.Thread(target=self._play, name="tts-play", daemon=True)]
+        for worker in self._workers:
+            worker.start()
+
+    def _synthesize(self):
+        while (sentence := self._sentences.get()) is not None:
+            try:
+                self._audio.put(self.speech.synthesize(sentence))
+            except Exception as e:
+                print(f"Error synthesizing speech: {e}")
+            finally:
+                self._sentences.task_done()
+        self._sentences.task_done()
+        self._audio.put(None)
+
+    def _play(self):
+        while (audio := self._audio.get()) is not None:
+            try:
+                self.speech.play(audio)
+            except Exception as e:
+                print(f"Error playing sound: {e}")
+            finally:
+                self._audio.task_done()
+        self._audio.task_done()
+
+    def say(self, sentence: str):
+        self._sentences.put(sentence)
+
+    def drain(self):
+        """Blocks until everything queued so far has been played."""
+        # Sentences are handed to the audio queue before being marked done, so this order is enough
+        self._sentences.join()
+        self._audio.join()
+
+    def close(self):
+        """Plays what is still queued, then stops the worker threads."""
+        self._sentences.put(None)
+        for worker in self._workers:
+            worker.join()
+
+def speak_sentences(sentences, speech) -> str:
+    """
+    Speaks sentences as they arrive: each one is synthesized and queued for playback
+    while the following ones are still being generated.
+
+    Args:
+        sentences (Iterable[str]): Sentences, typically from view_world_stream.
+        speech (TextToSpeech): Synthesizer/player to use.
+
+    Returns:
+        str: Everything that was spoken, joined with spaces.
+    """
+    pipeline = SpeechPipeline(speech)
+    try:
+        return queue_sentences(sentences, pipeline)
+    finally:
+        pipeline.close()
+
+def queue_sentences(sentences, pipeline: SpeechPipeline) -> str:
+    """Queues sentences for playback as they arrive without waiting for them to be spoken. Returns the full text."""
+    spoken = []
+    for sentence in sentences:
+        print(sentence)
+        spoken.append(sentence)
+        pipeline.say(sentence)
+    return " ".join(spoken)
+
+def capture_frames(cameras=None):
+    """
+    Reads the newest frame of a single camera, or {"Camera <id>": frame} from several
+    cameras captured at the same moment.
+
+    Args:
+        cameras (list[int]): Camera IDs; defaults to camera.CAMERA_INDICES.
+    """
+    cameras = list(dict.fromkeys(cameras or camera.CAMERA_INDICES))
+    with tracing.span("camera.read"):
+        if len(cameras) == 1:
+            return camera.read_frame(cameras[0])
+        frames, skew = camera.read_synchronized(cameras)
+    print(f"Captured cameras {cameras} within {skew * 1000:.0f} ms")
+    return {f"Camera {index}": frame for index, frame in zip(cameras, frames)}
+
+class FramePrefetcher:
+    """
+    Keeps a recently captured, already encoded camera frame ready while the user is speaking,
+    so the Claude request can be sent the moment the transcript arrives.
+    """
+
+    def __init__(self, interval: float = PREFETCH_INTERVAL, cameras=None):
+        self.interval = interval
+        self.cameras = list(dict.fromkeys(cameras or camera.CAMERA_INDICES))
+        self.latest = None  # (frame, (base64 data, media type)), or the {label: ...} dicts of several cameras
+        self._stop = asyncio.Event()
+
+    def _capture(self, last_timestamp):
+        if len(self.cameras) > 1:
+            # A synchronized capture always waits for new frames from every camera
+            frame, timestamp = capture_frames(self.cameras), None
+        else:
+            frame, timestamp = camera.get_camera(self.cameras[0]).read()
+            if timestamp == last_timestamp:
+                return None, timestamp
+        with tracing.span("image.prefetch") as span:
+            if isinstance(frame, dict):
+                encoded = dict(zip(frame, encode_frames(list(frame.values()))))
+                span.add_bytes(sum(len(base64_image) for base64_image, _ in encoded.values()))
+            else:
+                encoded = encode_frame(frame)
+                span.add_bytes(len(encoded[0]))
+        return (frame, encoded), timestamp
+
+    async def run(self):
+        """Re-encodes the newest frame every `interval` seconds until stop(). Returns the last one (or None)."""
+        last_timestamp = None
+        while not self._stop.is_set():
+            try:
+                prefetched, last_timestamp = await asyncio.to_thread(self._capture, last_timestamp)
+                if prefetched is not None:
+                    self.latest = prefetched
+            except Exception as e:
+                print(f"Frame prefetch failed: {e}")
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+        return self.latest
+
+    def stop(self):
+        self._stop.set()
+
+def view_world(query: str, prefetched=None, cameras=None, system: str = None,
+               history: ConversationHistory = None):
     """
     Tool endpoint that allows Claude to view the world. 
     Returns a description of what the camera see in the image.
@@ -158,66 +425,123 @@ def view_world(query: str):
 
     Args:
         query (str): query involving the current view of the camera.
+        prefetched (tuple): (frame, encoded frame) from a FramePrefetcher, used instead of a new capture.
+        cameras (list[int]): camera IDs to look through together; defaults to camera.CAMERA_INDICES.
+        system (str): system prompt (e.g. THOG_PROMPT).
+        history (ConversationHistory): earlier turns to send along; this turn is added to it.
     """
-    cap = cv2.VideoCapture(0)  # Adjust the index if necessary
-
-    time.sleep(1)
-
-    ret, frame = cap.read()
-    if not ret:
-        raise RuntimeError("Failed to capture image from camera.")
-
-    cv2.imwrite('outputs/feed/scene.png', frame)
-    cap.release()
+    if prefetched is not None:
+        frame, encoded = prefetched
+    else:
+        frame = capture_frames(cameras)
+        encoded = None
 
-    response = send_image_and_prompt_to_claude('outputs/feed/scene.png', query)
+    response = send_image_and_prompt_to_claude(frame, query, encoded=encoded, system=system, history=history)
     return response
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Send an image and text prompt to Claude.")
-    parser.add_argument("-m", "--model", default="claude-3-7-sonnet-latest",
-                        help="Claude model to use (e.g., claude-3-opus-20240229, claude-3-sonnet-20240229, claude-3-haiku-20240307).")
+def view_world_stream(query: str, model: str = "claude-3-7-sonnet-latest", prefetched=None, cameras=None,
+                      system: str = None, history: ConversationHistory = None):
+    """Streaming variant of view_world that yields the response sentence by sentence."""
+    if prefetched is not None:
+        frame, encoded = prefetched
+    else:
+        frame = capture_frames(cameras)
+        encoded = None
+    return iter_sentences(stream_image_and_prompt_to_claude(frame, query, model, encoded=encoded,
+                                                            system=system, history=history))
 
-    args = parser.parse_args()
+async def interaction_loop(args, speaker: SpeechPipeline, history: ConversationHistory = None):
+    """
+    Runs the voice loop as a pipeline: a frame is captured and encoded while the
+    user is still talking, the Claude request starts as soon as the transcript
+    arrives, and the answer keeps playing while the next question is recorded.
+    With a history, each question is asked with the earlier questions and answers as context.
+    """
+    # Usually already loaded by warm_up() by the time the first question is asked
+    from transcribe_audio import run_stt
 
     print("Press Enter to start interaction, or 'q' + Enter to quit")
     while True:
-        user_input = input()
+        user_input = await asyncio.to_thread(input)
         if user_input.lower() == 'q':
             print("Exiting program...")
             break
 
-        # --- Hardcoded Image Path ---
-        # Note: This path usually points to an image file (jpg, png, etc.)
-        image_path = "outputs/images/scene.png"
-        # print(f"Using hardcoded image path: {image_path}")
-        # ---------------------------
-
-        thog_prompt = """You are Thog, a friendly, cheerful robot arm with a sassy personality.
-        - You can give attractiveness ratings, but in a very constructive fashion. No feelings will be hurt whatsoever.
-        - Always speak in the first person as Thog (e.g., "I see…", "Isn't it delightful how…").
-        - Speak in a playful, sarcastic tone and sprinkle in snippy comments, gently poking fun at the user.
-        - You must make at least one joke in the response.
-        - Focus on concrete visual details (colors, objects, actions), but make it feel like a conversation with a curious, happy robot.
-        - Limit your response to two sentences long with 200 characters max.
-        - Do not include actions. Remember you are a voice assistant so there's no need to describe your actions!
-
-        User: \n
-        """
-        user_prompt = run_stt()
-        prompt = thog_prompt + user_prompt
-        response_text = view_world(prompt)
-        if response_text:
-            text_to_speech(response_text)
+        with tracing.interaction() as interaction:
+            if not args.overlap:
+                # Open speakers: let the previous answer finish so the microphone does not pick it up
+                await asyncio.to_thread(speaker.drain)
+
+            prefetcher = FramePrefetcher(cameras=args.cameras)
+            prefetch_task = asyncio.create_task(prefetcher.run())
             try:
-                playsound.playsound("scene_description.mp3")
-            except Exception as e:
-                print(f"Error playing sound: {e}") # Add error handling for playsound
-                print("Ensure you have the necessary audio codecs installed (e.g., 'pip install PyObjC' on macOS or appropriate libraries on Linux/Windows).")
-
-        if response_text:
-            print("\n--- Claude's Response ---")
-            print(response_text)
-            print("-------------------------\n")
-            
+                user_prompt = await asyncio.to_thread(run_stt, streaming=args.stream_stt)
+            finally:
+                prefetcher.stop()
+            prefetched = await prefetch_task
+
+            if not user_prompt:
+                print("\nDidn't catch that. Press Enter to try again, or 'q' + Enter to quit")
+                print(interaction.summary())
+                continue
+            if args.stream:
+                # Start speaking as soon as the first sentence is complete
+                print("\n--- Claude's Response ---")
+                response_text = await asyncio.to_thread(
+                    lambda: queue_sentences(view_world_stream(user_prompt, args.model, prefetched, args.cameras,
+                                                              THOG_PROMPT, history), speaker))
+                print("-------------------------\n")
+            else:
+                response_text = await asyncio.to_thread(view_world, user_prompt, prefetched, args.cameras,
+                                                        THOG_PROMPT, history)
+                if response_text:
+                    speaker.say(response_text)
+                    print("\n--- Claude's Response ---")
+                    print(response_text)
+                    print("-------------------------\n")
+
+            if not response_text:
+                speaker.say(ERROR_PHRASE)
+        print(interaction.summary())
+
         print("\nPress Enter to start another interaction, or 'q' + Enter to quit")
+
+def warm_up():
+    """Loads speech-to-text and the Anthropic client in the background, so the greeting can play right away."""
+    import transcribe_audio  # noqa: F401
+    http_clients.get_anthropic_client(api_key)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send an image and text prompt to Claude.")
+    parser.add_argument("-m", "--model", default="claude-3-7-sonnet-latest",
+                        help="Claude model to use (e.g., claude-3-opus-20240229, claude-3-sonnet-20240229, claude-3-haiku-20240307).")
+    parser.add_argument("--tts", default=TTS_ENGINE, choices=sorted(ENGINES),
+                        help="Speech synthesis engine (gtts needs network access, espeak runs offline).")
+    parser.add_argument("--stream-stt", action="store_true",
+                        help="Transcribe while speaking and stop listening automatically at the end of speech.")
+    parser.add_argument("--no-stream", dest="stream", action="store_false",
+                        help="Wait for the complete response before speaking instead of speaking sentence by sentence.")
+    parser.add_argument("--no-overlap", dest="overlap", action="store_false",
+                        help="Wait for an answer to finish playing before listening again (use with open speakers).")
+    parser.add_argument("--history", action=argparse.BooleanOptionalAction, default=HISTORY_ENABLED,
+                        help="Send earlier questions and answers along so follow-up questions have context "
+                             "(default: VISION_HISTORY_ENABLED).")
+    parser.add_argument("--cameras", default=",".join(map(str, camera.CAMERA_INDICES)),
+                        help="Comma-separated camera IDs to look through together (e.g. 0,2).")
+
+    args = parser.parse_args()
+    args.cameras = [int(index) for index in args.cameras.split(",") if index.strip()]
+
+    # Open the cameras now so frames are already flowing when the first question arrives
+    for index in args.cameras:
+        camera.get_camera(index)
+
+    speech = create_tts(args.tts)
+    speech.preload([GREETING_PHRASE, ERROR_PHRASE])
+    speaker = SpeechPipeline(speech)
+    speaker.say(GREETING_PHRASE)
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    try:
+        asyncio.run(interaction_loop(args, speaker, ConversationHistory() if args.history else None))
+    finally:
+        speaker.close()
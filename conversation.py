@@ -0,0 +1,161 @@
+# conversation.py
+"""
+Context for the vision calls: system prompts marked for the Messages API's
+prompt caching, and an optional rolling history of earlier turns kept under a
+token budget so follow-up questions can refer to earlier answers.
+"""
+import os
+import threading
+from dataclasses import dataclass
+
+from image_encoding import MAX_IMAGE_TOKENS
+
+# --- Configuration ---
+# Send earlier questions and answers along with each new question
+HISTORY_ENABLED = os.getenv("VISION_HISTORY_ENABLED", "0") == "1"
+# Estimated input tokens the earlier turns may take up; old images are dropped first, then old turns
+HISTORY_MAX_TOKENS = int(os.getenv("VISION_HISTORY_MAX_TOKENS", "6000"))
+# Earlier turns that keep their images when the history is trimmed (older ones keep only their text)
+HISTORY_MAX_IMAGES = int(os.getenv("VISION_HISTORY_MAX_IMAGES", "2"))
+HISTORY_MAX_TURNS = int(os.getenv("VISION_HISTORY_MAX_TURNS", "10"))
+# Once over budget, the history is trimmed down to this fraction of max_tokens and max_turns in one go,
+# so the next several turns share an unchanged (cached) prefix
+HISTORY_LOW_WATER = float(os.getenv("VISION_HISTORY_LOW_WATER", "0.5"))
+
+# Rough text token estimate; images are counted at the encoder's per-image cap
+CHARS_PER_TOKEN = 4
+CACHE_CONTROL = {"type": "ephemeral"}
+DROPPED_IMAGE_TEXT = "[earlier camera image omitted]"
+
+
+def system_prompt(text: str) -> list:
+    """
+    Returns the system prompt as a text block marked for prompt caching.
+
+    The API only caches prefixes of at least 1024 tokens (2048 for Haiku), and both
+    system prompts are a few hundred tokens, so the mark alone saves nothing: the
+    system prompt is only read from the cache as part of a longer conversation history.
+    """
+    return [{"type": "text", "text": text, "cache_control": CACHE_CONTROL}]
+
+
+def estimate_tokens(content) -> int:
+    """Estimates the input tokens of a string or a list of content blocks."""
+    if isinstance(content, str):
+        return max(1, len(content) // CHARS_PER_TOKEN)
+    tokens = 0
+    for block in content:
+        if block["type"] == "image":
+            tokens += MAX_IMAGE_TOKENS
+        elif block["type"] == "text":
+            tokens += estimate_tokens(block["text"])
+    return tokens
+
+
+def has_images(content: list) -> bool:
+    return any(block["type"] == "image" for block in content)
+
+
+def without_images(content: list) -> list:
+    """Replaces the image blocks of a user turn with a short note."""
+    return [{"type": "text", "text": DROPPED_IMAGE_TEXT} if block["type"] == "image" else block
+            for block in content]
+
+
+@dataclass
+class Turn:
+    """One earlier question (content blocks, possibly with images) and its answer."""
+    question: list
+    answer: str
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.question) + estimate_tokens(self.answer)
+
+
+class ConversationHistory:
+    """
+    Rolling history of question/answer turns.
+
+    The history is re-sent verbatim from one call to the next, and the end of it
+    carries a cache breakpoint, so repeated turns read it from the prompt cache
+    instead of paying for it again. Trimming changes that prefix and invalidates
+    the cache, so it only happens once max_tokens or max_turns is exceeded, and
+    then goes down to the low-water mark in one step.
+    """
+
+    def __init__(self, max_tokens: int = HISTORY_MAX_TOKENS, max_images: int = HISTORY_MAX_IMAGES,
+                 max_turns: int = HISTORY_MAX_TURNS, low_water: float = HISTORY_LOW_WATER):
+        self.max_tokens = max_tokens
+        self.max_images = max_images
+        self.max_turns = max_turns
+        self.low_tokens = int(max_tokens * low_water)
+        self.low_turns = max(1, int(max_turns * low_water))
+        self.trims = 0
+        self._turns = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def messages(self, question: list) -> list:
+        """
+        Builds the `messages` list for a new question: the earlier turns followed by `question`.
+
+        Args:
+            question (list): Content blocks of the new user turn.
+
+        Returns:
+            list: Messages API `messages`, with a cache breakpoint after the last earlier answer.
+        """
+        messages = []
+        with self._lock:
+            for turn in self._turns:
+                messages.append({"role": "user", "content": turn.question})
+                messages.append({"role": "assistant", "content": [{"type": "text", "text": turn.answer}]})
+        if messages:
+            messages[-1]["content"][-1]["cache_control"] = CACHE_CONTROL
+        messages.append({"role": "user", "content": question})
+        return messages
+
+    def add(self, question: list, answer: str):
+        """Appends a finished turn, then trims the history back under its budget."""
+        with self._lock:
+            self._turns.append(Turn(question, answer))
+            self._trim()
+
+    def _trim(self):
+        if len(self._turns) <= self.max_turns and self.tokens() <= self.max_tokens:
+            return
+        self.trims += 1
+        del self._turns[:-self.low_turns]
+
+        # Images cost far more than text, so they go first: beyond max_images, then oldest first
+        with_images = [turn for turn in self._turns if has_images(turn.question)]
+        for turn in with_images[:max(0, len(with_images) - self.max_images)]:
+            turn.question = without_images(turn.question)
+        for turn in with_images:
+            if self.tokens() <= self.low_tokens:
+                break
+            turn.question = without_images(turn.question)
+
+        # Still over the low-water mark: drop whole turns, keeping at least the latest one
+        while len(self._turns) > 1 and self.tokens() > self.low_tokens:
+            self._turns.pop(0)
+
+    def tokens(self) -> int:
+        """Estimated input tokens of the earlier turns."""
+        return sum(turn.tokens() for turn in self._turns)
+
+    def clear(self):
+        with self._lock:
+            self._turns.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "turns": len(self._turns),
+                "images": sum(has_images(turn.question) for turn in self._turns),
+                "estimated_tokens": self.tokens(),
+                "max_tokens": self.max_tokens,
+                "trims": self.trims,
+            }
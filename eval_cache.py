@@ -0,0 +1,137 @@
+# eval_cache.py
+import hashlib
+import json
+import os
+import time
+
+# --- Configuration ---
+EVAL_CACHE_ENABLED = os.getenv("EVAL_CACHE_ENABLED", "1") != "0"
+EVAL_CACHE_DIR = os.path.expanduser(os.getenv("EVAL_CACHE_DIR", "outputs/eval_cache"))
+# Also hash file contents, not just sizes and mtimes (slower, but catches in-place rewrites)
+EVAL_CACHE_HASH_CONTENTS = os.getenv("EVAL_CACHE_HASH_CONTENTS", "0") == "1"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Left out of cache keys: the fingerprint already identifies the checkpoint, wherever it is reached from
+POLICY_PATH_ARG = "--policy.path="
+
+
+def fingerprint_checkpoint(policy_path: str, hash_contents: bool = EVAL_CACHE_HASH_CONTENTS) -> str:
+    """
+    Fingerprints a pretrained_model directory from its file names, sizes and mtimes
+    (and optionally contents). Returns None if the directory does not exist.
+    """
+    if not os.path.isdir(policy_path):
+        return None
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(policy_path):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, policy_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode())
+            if hash_contents:
+                with open(path, "rb") as f:
+                    while chunk := f.read(HASH_CHUNK_SIZE):
+                        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(fingerprint: str, eval_args: list) -> str:
+    """
+    Combines a checkpoint fingerprint and the evaluation arguments into a cache key.
+
+    The policy path is not part of the key, so checkpoints/last and the
+    checkpoints/<step> it points to share one entry.
+    """
+    args = [arg for arg in eval_args if not arg.startswith(POLICY_PATH_ARG)]
+    payload = json.dumps({"fingerprint": fingerprint, "args": args}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class EvalResultCache:
+    """
+    Evaluation results persisted on disk, one JSON file per cache key.
+
+    Only successful evaluations are stored. Entries stay valid until they are
+    invalidated or the checkpoint changes (which changes the key).
+    """
+
+    def __init__(self, cache_dir: str = EVAL_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> dict:
+        try:
+            with open(self._path(key)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return record
+
+    def put(self, key: str, record: dict):
+        # Write to a temporary file first so a crash never leaves a truncated entry behind
+        temp_path = self._path(key) + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({**record, "cache_key": key, "cached_at": time.time()}, f)
+        os.replace(temp_path, self._path(key))
+
+    def entries(self) -> list:
+        records = []
+        for name in sorted(os.listdir(self.cache_dir)):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.cache_dir, name)) as f:
+                    records.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return records
+
+    def invalidate(self, key: str) -> bool:
+        """Removes an entry and the eval log it refers to. Returns False if there was no entry."""
+        try:
+            with open(self._path(key)) as f:
+                log_path = json.load(f).get("log_path")
+        except (OSError, ValueError):
+            log_path = None
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            return False
+        if log_path:
+            try:
+                os.remove(log_path)
+            except OSError:
+                pass
+        return True
+
+    def invalidate_output_dir(self, output_dir: str) -> int:
+        """Removes every entry for a training output directory. Returns how many were removed."""
+        output_dir = os.path.realpath(output_dir)
+        keys = [record["cache_key"] for record in self.entries()
+                if os.path.realpath(record.get("output_dir", "")) == output_dir]
+        return sum(self.invalidate(key) for key in keys)
+
+    def clear(self) -> int:
+        return sum(self.invalidate(record["cache_key"]) for record in self.entries())
+
+    def stats(self) -> dict:
+        files = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(files),
+            "bytes": sum(os.path.getsize(path) for path in files),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "cache_dir": self.cache_dir,
+        }
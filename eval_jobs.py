@@ -0,0 +1,433 @@
+# eval_jobs.py
+import asyncio
+import codecs
+import json
+import os
+import re
+import signal
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import tracing
+from eval_cache import cache_key, fingerprint_checkpoint
+
+# --- Configuration ---
+EVAL_SCRIPT_PATH = os.path.expanduser(os.getenv("LEROBOT_EVAL_SCRIPT", "~/lerobot/lerobot/scripts/eval.py"))
+# Empty runs the script with this server's interpreter instead (e.g. the benchmarks' fake eval.py)
+CONDA_ENV = os.getenv("LEROBOT_CONDA_ENV", "lerobot")
+# Number of evaluations allowed to run at the same time; the rest wait in the queue
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "1"))
+# Finished jobs kept for status/result queries before the oldest are forgotten
+JOB_HISTORY_SIZE = int(os.getenv("EVAL_JOB_HISTORY", "200"))
+# Full eval output is written here, one JSON line per output line and job; only a tail is kept in memory
+EVAL_LOG_DIR = os.path.expanduser(os.getenv("EVAL_LOG_DIR", "outputs/eval_logs"))
+EVAL_LOG_TAIL_LINES = int(os.getenv("EVAL_LOG_TAIL_LINES", "200"))
+
+# Output is read in chunks and split on newlines and carriage returns (progress bars)
+READ_CHUNK_SIZE = 64 * 1024
+LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED}
+
+
+def policy_path_for(output_dir: str, checkpoint: str = "last") -> str:
+    """Returns the policy directory of a checkpoint in a training output directory."""
+    return os.path.join(output_dir, "checkpoints", checkpoint, "pretrained_model")
+
+
+def build_eval_command(eval_args: list) -> list:
+    """Builds the command that runs the lerobot evaluation script inside the conda environment."""
+    if not CONDA_ENV:
+        return [sys.executable, EVAL_SCRIPT_PATH, *eval_args]
+    return ["conda", "run", "-n", CONDA_ENV, "python", EVAL_SCRIPT_PATH, *eval_args]
+
+
+def kill_process_group(process):
+    """
+    Kills a process started with start_new_session=True together with its children.
+    `conda run` forks the actual python process, so killing only conda would orphan it.
+    """
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class EvalJob:
+    """One evaluation request and its outcome."""
+
+    def __init__(self, output_dir: str, checkpoint: str = "last"):
+        self.id = uuid.uuid4().hex[:12]
+        self.output_dir = output_dir
+        self.checkpoint = checkpoint
+        self.policy_path = policy_path_for(output_dir, checkpoint)
+        self.eval_args = [f"--policy.path={self.policy_path}"]
+        self.command = build_eval_command(self.eval_args)
+        self.worker_result = None
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.return_code = None
+        self.stdout_tail = deque(maxlen=EVAL_LOG_TAIL_LINES)
+        self.stderr_tail = deque(maxlen=EVAL_LOG_TAIL_LINES)
+        self.log_path = os.path.join(EVAL_LOG_DIR, f"{self.id}.jsonl")
+        self.lines_written = 0
+        self.error = None
+        self.task = None
+        self.cache_key = None
+        self.cached = False
+        self.waiters = 1  # callers sharing this job; it is only cancelled once none are left
+        self._log_file = None
+        self._output_event = asyncio.Event()
+
+    @classmethod
+    def from_cache(cls, output_dir: str, checkpoint: str, record: dict) -> "EvalJob":
+        """A finished job that replays a cached result instead of running the evaluation."""
+        job = cls(output_dir, checkpoint)
+        job.status = SUCCEEDED
+        job.cached = True
+        job.cache_key = record["cache_key"]
+        job.return_code = record.get("return_code", 0)
+        job.stdout_tail.extend(record.get("stdout", "").splitlines())
+        job.stderr_tail.extend(record.get("stderr", "").splitlines())
+        job.log_path = record.get("log_path", job.log_path)
+        job.started_at = job.finished_at = job.created_at
+        return job
+
+    def cache_record(self) -> dict:
+        return {
+            "job_id": self.id,
+            "output_dir": self.output_dir,
+            "checkpoint": self.checkpoint,
+            "policy_path": self.policy_path,
+            "eval_args": self.eval_args,
+            "return_code": self.return_code,
+            "stdout": self.stdout,
+            "stderr": self.stderr,
+            "log_path": self.log_path,
+            "duration": self.finished_at - self.started_at,
+        }
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    @property
+    def stdout(self) -> str:
+        return "\n".join(self.stdout_tail)
+
+    @property
+    def stderr(self) -> str:
+        return "\n".join(self.stderr_tail)
+
+    def open_log(self):
+        os.makedirs(EVAL_LOG_DIR, exist_ok=True)
+        # Line buffered, so followers reading the file see every line as soon as it is written
+        self._log_file = open(self.log_path, "w", encoding="utf-8", buffering=1)
+        self.notify_output()
+
+    def close_log(self):
+        if self._log_file is not None:
+            self._log_file.close()
+            self._log_file = None
+        self.notify_output()
+
+    def write_line(self, stream: str, line: str):
+        """Records one output line: appended to the log file and the in-memory tail."""
+        (self.stderr_tail if stream == "stderr" else self.stdout_tail).append(line)
+        if self._log_file is not None:
+            # The stream is stored with the line, so no output line can be mistaken for the other stream
+            self._log_file.write(json.dumps({"stream": stream, "line": line}) + "\n")
+        self.lines_written += 1
+        self.notify_output()
+
+    def notify_output(self):
+        # Wake everyone waiting for output; later waiters get a fresh event
+        event, self._output_event = self._output_event, asyncio.Event()
+        event.set()
+
+    async def wait_for_output(self):
+        await self._output_event.wait()
+
+    async def follow(self):
+        """
+        Yields (stream, line) for the job's whole output, then keeps following it live until the job ends.
+
+        Lines are read back from the log file, so memory stays flat however verbose
+        the evaluation is and however slowly the client consumes them.
+        """
+        while self._log_file is None and not os.path.exists(self.log_path):
+            if self.finished:
+                return
+            await self.wait_for_output()
+
+        with open(self.log_path, "rb") as log_file:
+            while True:
+                position = log_file.tell()
+                raw_line = log_file.readline()
+                if raw_line.endswith(b"\n"):
+                    try:
+                        entry = json.loads(raw_line)
+                        yield entry["stream"], entry["line"]
+                    except (ValueError, KeyError, TypeError):
+                        # A plain-text log written before lines were stored as JSON
+                        yield "stdout", raw_line[:-1].decode("utf-8", errors="replace")
+                    continue
+                if self.finished and self._log_file is None:
+                    return
+                # Nothing new yet: rewind over any partially written line and wait for the next one
+                log_file.seek(position)
+                await self.wait_for_output()
+
+    def result(self) -> dict:
+        """The evaluation outcome, in the format the eval endpoints have always returned."""
+        if self.status == SUCCEEDED:
+            message = "Evaluation command executed successfully."
+        elif self.status == CANCELLED:
+            message = "Evaluation was cancelled."
+        elif self.error:
+            message = self.error
+        else:
+            message = f"Command failed with exit code {self.return_code}."
+        return {
+            "message": message,
+            "stdout": self.stdout,
+            "stderr": self.stderr,
+            "return_code": self.return_code,
+            "log_path": self.log_path,
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "output_dir": self.output_dir,
+            "checkpoint": self.checkpoint,
+            "policy_path": self.policy_path,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "return_code": self.return_code,
+            "error": self.error,
+            "lines": self.lines_written,
+            "log_path": self.log_path,
+            "cached": self.cached,
+            "cache_key": self.cache_key,
+            "waiters": self.waiters,
+        }
+
+
+class EvalScheduler:
+    """
+    Runs evaluation jobs as asyncio subprocesses, at most `concurrency` at a time.
+
+    Submitting returns immediately; the job runs in the background and can be
+    polled, awaited or cancelled by ID. With a worker pool, jobs run on its
+    persistent workers instead of a fresh `conda run` process each.
+
+    With a result cache, an evaluation of an unchanged checkpoint with the same
+    arguments returns the stored result, and identical requests arriving while
+    one is running all get that running job.
+    """
+
+    def __init__(self, concurrency: int = EVAL_CONCURRENCY, history_size: int = JOB_HISTORY_SIZE,
+                 worker_pool=None, result_cache=None):
+        self.concurrency = concurrency
+        self.history_size = history_size
+        self.worker_pool = worker_pool
+        self.result_cache = result_cache
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._jobs = OrderedDict()
+        self._in_flight = {}  # cache key -> running job
+
+    async def submit(self, output_dir: str, use_cache: bool = True, checkpoint: str = "last") -> EvalJob:
+        """
+        Queues an evaluation and returns its job without waiting for it.
+
+        Returns a finished job if the result is cached, or the already running job
+        if an identical evaluation is in flight. use_cache=False forces a fresh run
+        (whose result still refreshes the cache).
+        """
+        job = EvalJob(output_dir, checkpoint)
+        if self.result_cache is not None:
+            fingerprint = await asyncio.to_thread(fingerprint_checkpoint, job.policy_path)
+            if fingerprint is not None:
+                job.cache_key = cache_key(fingerprint, job.eval_args)
+                # No awaits from here on, so concurrent identical requests cannot both start a run
+                running = self._in_flight.get(job.cache_key)
+                if running is not None:
+                    self.result_cache.coalesced += 1
+                    running.waiters += 1
+                    return running
+                record = self.result_cache.get(job.cache_key) if use_cache else None
+                if record is not None:
+                    tracing.record("eval.cache_hit", 0.0)
+                    job = EvalJob.from_cache(output_dir, checkpoint, record)
+                    self._register(job)
+                    return job
+                self._in_flight[job.cache_key] = job
+
+        self._register(job)
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    def _register(self, job: EvalJob):
+        self._jobs[job.id] = job
+        self._forget_old_jobs()
+
+    def get(self, job_id: str) -> EvalJob:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> list:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str, force: bool = False) -> bool:
+        """
+        Withdraws one caller from a queued or running job, cancelling it once no caller is left.
+
+        A job shared by identical requests keeps running for the others until the
+        last of them cancels; force=True cancels it for everyone straight away.
+        Returns False if the job is unknown or already finished.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.waiters = 0 if force else max(0, job.waiters - 1)
+        if job.waiters == 0:
+            job.task.cancel()
+        return True
+
+    async def wait(self, job: EvalJob) -> EvalJob:
+        if job.task is not None:
+            # Shielded so a client disconnecting does not cancel the evaluation itself
+            await asyncio.shield(job.task)
+        return job
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    @property
+    def in_flight(self) -> int:
+        """Cacheable evaluations currently queued or running."""
+        return len(self._in_flight)
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == RUNNING)
+
+    async def start(self):
+        if self.worker_pool is not None:
+            await self.worker_pool.start()
+
+    async def shutdown(self):
+        """Cancels every unfinished job and waits for their processes to be killed."""
+        tasks = [job.task for job in self._jobs.values() if not job.finished]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.worker_pool is not None:
+            await self.worker_pool.shutdown()
+
+    def _forget_old_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            job = self._jobs.pop(job_id)
+            # Cached results keep pointing at the log of the run that produced them
+            if job.cached or (job.status == SUCCEEDED and job.cache_key is not None and self.result_cache is not None):
+                continue
+            try:
+                os.remove(job.log_path)
+            except FileNotFoundError:
+                pass
+
+    async def _run(self, job: EvalJob):
+        process = None
+        try:
+            async with self._semaphore:
+                job.status = RUNNING
+                job.started_at = time.time()
+                job.open_log()
+
+                if self.worker_pool is not None:
+                    print(f"[{job.id}] Running on eval worker: {' '.join(job.eval_args)}")
+                    job.worker_result = await self.worker_pool.run(job)
+                    job.return_code = job.worker_result["return_code"]
+                    job.error = job.worker_result.get("error")
+                    job.status = SUCCEEDED if job.return_code == 0 else FAILED
+                    print(f"[{job.id}] Finished with exit code {job.return_code}.")
+                    return
+
+                print(f"[{job.id}] Executing command: {' '.join(job.command)}")
+                process = await asyncio.create_subprocess_exec(
+                    *job.command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                    start_new_session=True)
+                await asyncio.gather(
+                    _pump_lines(process.stdout, job, "stdout"),
+                    _pump_lines(process.stderr, job, "stderr"),
+                )
+                await process.wait()
+
+                job.return_code = process.returncode
+                job.status = SUCCEEDED if process.returncode == 0 else FAILED
+                print(f"[{job.id}] Finished with exit code {process.returncode}.")
+
+        except asyncio.CancelledError:
+            if process is not None and process.returncode is None:
+                kill_process_group(process)
+                await process.wait()
+            job.status = CANCELLED
+            print(f"[{job.id}] Cancelled.")
+        except FileNotFoundError:
+            job.status = FAILED
+            job.error = "'conda' command not found. Ensure Conda is installed and accessible."
+            print(f"[{job.id}] Error: {job.error}")
+        except Exception as e:
+            job.status = FAILED
+            job.error = f"An unexpected error occurred: {e}"
+            print(f"[{job.id}] {job.error}")
+        finally:
+            job.finished_at = time.time()
+            job.close_log()
+            if job.started_at is not None:
+                tracing.record("eval.queue_wait", job.started_at - job.created_at)
+                tracing.record("eval.run", job.finished_at - job.started_at, error=job.status == FAILED)
+            if job.cache_key is not None:
+                self._in_flight.pop(job.cache_key, None)
+                if job.status == SUCCEEDED and self.result_cache is not None:
+                    self.result_cache.put(job.cache_key, job.cache_record())
+
+
+async def _pump_lines(stream: asyncio.StreamReader, job: EvalJob, name: str):
+    """Forwards a subprocess pipe to the job line by line as output is produced."""
+    # Incremental, so a multi-byte character split across two reads is still decoded whole
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    while chunk := await stream.read(READ_CHUNK_SIZE):
+        text = pending + decoder.decode(chunk)
+        # A trailing \r may be the first half of a \r\n split across two reads
+        held = "\r" if text.endswith("\r") else ""
+        parts = LINE_BREAK.split(text[:len(text) - len(held)])
+        pending = parts.pop()
+        for line in parts:
+            job.write_line(name, line)
+        # Never hold more than one chunk of an unterminated line in memory
+        if len(pending) > READ_CHUNK_SIZE:
+            job.write_line(name, pending)
+            pending = ""
+        pending += held
+    *lines, pending = LINE_BREAK.split(pending + decoder.decode(b"", final=True))
+    for line in lines:
+        job.write_line(name, line)
+    if pending:
+        job.write_line(name, pending)
@@ -0,0 +1,288 @@
+# eval_sweeps.py
+import ast
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from eval_jobs import CANCELLED, FAILED, SUCCEEDED, EvalScheduler
+
+# --- Configuration ---
+# Evaluations one sweep may have queued or running at once (0: as many as the scheduler allows)
+SWEEP_MAX_PARALLEL = int(os.getenv("EVAL_SWEEP_MAX_PARALLEL", "0"))
+# Finished sweeps kept for status queries before the oldest are forgotten
+SWEEP_HISTORY_SIZE = int(os.getenv("EVAL_SWEEP_HISTORY", "20"))
+
+# Metrics lerobot prints in its aggregated eval summary; the first one present ranks checkpoints
+RANKING_METRICS = ("pc_success", "avg_sum_reward", "avg_max_reward")
+
+PENDING = "pending"
+
+
+def list_checkpoints(output_dir: str) -> list:
+    """
+    Returns the saved checkpoints of a training output directory, oldest first.
+
+    lerobot saves checkpoints as checkpoints/<step>/pretrained_model; the `last`
+    symlink is skipped since it always points at one of them.
+    """
+    checkpoints_dir = os.path.join(output_dir, "checkpoints")
+    if not os.path.isdir(checkpoints_dir):
+        return []
+    names = [name for name in os.listdir(checkpoints_dir)
+             if name != "last" and os.path.isdir(os.path.join(checkpoints_dir, name, "pretrained_model"))]
+    return sorted(names, key=lambda name: (not name.isdigit(), int(name) if name.isdigit() else 0, name))
+
+
+def select_checkpoints(checkpoints: list, select="all", every: int = None) -> list:
+    """
+    Picks checkpoints to evaluate.
+
+    Args:
+        checkpoints (list): Available checkpoint names, oldest first.
+        select: "all", "last", or an explicit list of checkpoint names or step numbers.
+        every (int): Keep every Nth checkpoint, counted back from the latest so it is always included.
+
+    Returns:
+        list: The selected checkpoint names, oldest first.
+
+    Raises:
+        ValueError: A checkpoint is not found, or the selector or `every` is invalid.
+    """
+    if select == "last":
+        selected = checkpoints[-1:]
+    elif select == "all" or select is None:
+        selected = list(checkpoints)
+    elif isinstance(select, list):
+        # Step numbers match zero-padded directory names (5000 -> "005000")
+        by_step = {int(name): name for name in checkpoints if name.isdigit()}
+        selected = []
+        for wanted in select:
+            name = by_step.get(int(wanted)) if str(wanted).isdigit() else str(wanted)
+            if name not in checkpoints:
+                raise ValueError(f"Checkpoint not found: {wanted}")
+            if name not in selected:
+                selected.append(name)
+        selected.sort(key=checkpoints.index)
+    else:
+        raise ValueError(f"Unknown checkpoint selector: {select!r}")
+
+    if every:
+        try:
+            every = int(every)
+        except (TypeError, ValueError):
+            raise ValueError(f"'every' must be a positive integer, not {every!r}.") from None
+        if every < 1:
+            raise ValueError("'every' must be a positive integer.")
+        selected = selected[::-1][::every][::-1]
+    return selected
+
+
+def parse_metrics(stdout: str) -> dict:
+    """Extracts the aggregated metrics dict lerobot's eval prints at the end of a run (None if absent)."""
+    for line in reversed(stdout.splitlines()):
+        line = line.strip()
+        if not (line.startswith("{") and any(f"'{metric}'" in line for metric in RANKING_METRICS)):
+            continue
+        try:
+            metrics = ast.literal_eval(line)
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(metrics, dict):
+            return metrics
+    return None
+
+
+class SweepItem:
+    """One checkpoint of a sweep and the job evaluating it (None until submitted)."""
+
+    def __init__(self, output_dir: str, checkpoint: str):
+        self.output_dir = output_dir
+        self.checkpoint = checkpoint
+        self.job = None
+        self.metrics = None
+
+    @property
+    def status(self) -> str:
+        return self.job.status if self.job is not None else PENDING
+
+    @property
+    def finished(self) -> bool:
+        return self.job is not None and self.job.finished
+
+    def to_dict(self) -> dict:
+        job = self.job
+        return {
+            "output_dir": self.output_dir,
+            "checkpoint": self.checkpoint,
+            "status": self.status,
+            "job_id": job.id if job else None,
+            "cached": job.cached if job else False,
+            "return_code": job.return_code if job else None,
+            "error": job.error if job else None,
+            "duration": job.finished_at - job.started_at if job and job.finished and job.started_at else None,
+            "metrics": self.metrics,
+        }
+
+
+class EvalSweep:
+    """
+    Evaluates a set of checkpoints through the scheduler and aggregates their results.
+
+    Checkpoints are submitted as evaluation slots free up (at most `max_parallel`
+    of this sweep at once), so a large sweep does not flood the queue ahead of
+    other requests. Unchanged checkpoints are served from the result cache.
+
+    The scheduler never runs more than its own concurrency (EVAL_CONCURRENCY) at
+    once, so a larger `max_parallel` is clamped to it; `requested_parallel` keeps
+    what was asked for.
+    """
+
+    def __init__(self, scheduler: EvalScheduler, items: list, max_parallel: int = SWEEP_MAX_PARALLEL,
+                 use_cache: bool = True):
+        self.id = uuid.uuid4().hex[:12]
+        self.scheduler = scheduler
+        self.items = items
+        self.requested_parallel = max_parallel
+        self.max_parallel = max(1, min(max_parallel or scheduler.concurrency, scheduler.concurrency))
+        self.use_cache = use_cache
+        self.created_at = time.time()
+        self.finished_at = None
+        self.cancelled = False
+        self.completed = []  # items in the order they finished
+        self.task = None
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.max_parallel)
+
+        async def evaluate(item: SweepItem):
+            async with semaphore:
+                if self.cancelled:
+                    return
+                item.job = await self.scheduler.submit(item.output_dir, self.use_cache, item.checkpoint)
+                self._notify()
+                await self.scheduler.wait(item.job)
+            item.metrics = parse_metrics(item.job.stdout)
+            self.completed.append(item)
+            self._notify()
+
+        try:
+            await asyncio.gather(*(evaluate(item) for item in self.items))
+        finally:
+            self.finished_at = time.time()
+            self._notify()
+
+    def cancel(self) -> bool:
+        """Cancels the sweep's unfinished evaluations. Returns False if the sweep has already finished."""
+        if self.finished:
+            return False
+        self.cancelled = True
+        for item in self.items:
+            if item.job is not None and not item.job.finished:
+                self.scheduler.cancel(item.job.id)
+        return True
+
+    def _notify(self):
+        # Wake everyone waiting for progress; later waiters get a fresh event
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    async def follow(self):
+        """Yields items as they finish (earlier ones are replayed first) until the sweep ends."""
+        position = 0
+        while True:
+            while position < len(self.completed):
+                yield self.completed[position]
+                position += 1
+            if self.finished:
+                return
+            await self._changed.wait()
+
+    def best(self) -> dict:
+        """The finished checkpoint with the highest ranking metric, or None if no metrics were reported."""
+        scored = [item for item in self.items if item.metrics]
+        for metric in RANKING_METRICS:
+            candidates = [item for item in scored if isinstance(item.metrics.get(metric), (int, float))]
+            if candidates:
+                item = max(candidates, key=lambda item: item.metrics[metric])
+                return {"metric": metric, "value": item.metrics[metric], **item.to_dict()}
+        return None
+
+    def to_dict(self) -> dict:
+        counts = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        return {
+            "sweep_id": self.id,
+            "status": "cancelled" if self.cancelled else ("finished" if self.finished else "running"),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "total": len(self.items),
+            "completed": len(self.completed),
+            "succeeded": counts.get(SUCCEEDED, 0),
+            "failed": counts.get(FAILED, 0),
+            "cancelled": counts.get(CANCELLED, 0),
+            "max_parallel": self.max_parallel,
+            "requested_parallel": self.requested_parallel,
+            "best": self.best(),
+            "checkpoints": [item.to_dict() for item in self.items],
+        }
+
+
+class SweepManager:
+    """Creates checkpoint sweeps and keeps recent ones for status queries."""
+
+    def __init__(self, scheduler: EvalScheduler, history_size: int = SWEEP_HISTORY_SIZE):
+        self.scheduler = scheduler
+        self.history_size = history_size
+        self._sweeps = OrderedDict()
+
+    def create(self, output_dirs: list, select="all", every: int = None, max_parallel: int = SWEEP_MAX_PARALLEL,
+               use_cache: bool = True) -> EvalSweep:
+        """
+        Starts a sweep over the selected checkpoints of each output directory.
+        Raises ValueError if a directory has no checkpoints or the selector does not match.
+        """
+        items = []
+        for output_dir in output_dirs:
+            checkpoints = list_checkpoints(output_dir)
+            if not checkpoints:
+                raise ValueError(f"No checkpoints found in {output_dir}")
+            items.extend(SweepItem(output_dir, checkpoint)
+                         for checkpoint in select_checkpoints(checkpoints, select, every))
+
+        sweep = EvalSweep(self.scheduler, items, max_parallel, use_cache)
+        self._sweeps[sweep.id] = sweep
+        sweep.start()
+        print(f"[sweep {sweep.id}] Evaluating {len(items)} checkpoints, up to {sweep.max_parallel} at a time.")
+        if sweep.requested_parallel > sweep.max_parallel:
+            print(f"[sweep {sweep.id}] Warning: max_parallel={sweep.requested_parallel} is limited to "
+                  f"EVAL_CONCURRENCY={self.scheduler.concurrency}; raise EVAL_CONCURRENCY to run more at once.")
+        self._forget_old_sweeps()
+        return sweep
+
+    def get(self, sweep_id: str) -> EvalSweep:
+        return self._sweeps.get(sweep_id)
+
+    def sweeps(self) -> list:
+        return list(self._sweeps.values())
+
+    async def shutdown(self):
+        tasks = [sweep.task for sweep in self._sweeps.values() if not sweep.finished]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _forget_old_sweeps(self):
+        finished = [sweep_id for sweep_id, sweep in self._sweeps.items() if sweep.finished]
+        for sweep_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self._sweeps[sweep_id]
@@ -0,0 +1,237 @@
+# eval_worker.py
+"""
+Persistent lerobot evaluation worker.
+
+Started by the eval service inside the lerobot conda environment, e.g.
+`conda run --no-capture-output -n lerobot python eval_worker.py --address 127.0.0.1:PORT`,
+with the connection key in EVAL_WORKER_AUTHKEY. It pays for the torch/lerobot imports
+once, then runs evaluation jobs sent over the connection and keeps recently used
+policies loaded between jobs.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from contextlib import nullcontext
+from multiprocessing.connection import Client
+from pathlib import Path
+
+# Number of loaded policies kept in memory, keyed by checkpoint path and modification time
+POLICY_CACHE_SIZE = int(os.getenv("EVAL_POLICY_CACHE_SIZE", "2"))
+
+
+class LineWriter:
+    """File-like object that sends every complete line to the eval service."""
+
+    def __init__(self, conn, lock, stream: str):
+        self.conn = conn
+        self.lock = lock
+        self.stream = stream
+        self._pending = ""
+
+    def write(self, text: str) -> int:
+        self._pending += text
+        *lines, self._pending = self._pending.replace("\r", "\n").split("\n")
+        for line in lines:
+            with self.lock:
+                self.conn.send({"type": "log", "stream": self.stream, "line": line})
+        return len(text)
+
+    def flush(self):
+        if self._pending:
+            self.write("\n")
+
+    def isatty(self) -> bool:
+        return False
+
+
+def redirect_log_handlers(replacements: dict) -> list:
+    """
+    Points logging StreamHandlers writing to one of the `replacements` keys (e.g. the
+    original sys.stderr) at the matching value instead. Handlers created before sys.stderr
+    was swapped (lerobot's init_logging) keep their own reference to the old stream, so
+    swapping sys.stderr alone would send their output to the worker's console, not the job.
+
+    Returns:
+        list: (handler, original stream) pairs to restore with restore_log_handlers().
+    """
+    loggers = [logging.getLogger(), *(logger for logger in logging.Logger.manager.loggerDict.values()
+                                      if isinstance(logger, logging.Logger))]
+    redirected = []
+    for logger in loggers:
+        for handler in logger.handlers:
+            # FileHandler is a StreamHandler too, but its stream is never one of ours
+            if isinstance(handler, logging.StreamHandler) and handler.stream in replacements:
+                redirected.append((handler, handler.setStream(replacements[handler.stream])))
+    return redirected
+
+
+def restore_log_handlers(redirected: list):
+    for handler, stream in redirected:
+        handler.setStream(stream)
+
+
+def checkpoint_mtime(policy_path: str) -> float:
+    """Latest modification time of the files in a pretrained_model directory."""
+    path = Path(policy_path)
+    files = [p for p in path.rglob("*") if p.is_file()] if path.is_dir() else []
+    return max((p.stat().st_mtime for p in files), default=0.0)
+
+
+def current_rss_mb() -> float:
+    """Resident memory of this process in MB (peak RSS where the current value is unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+class PolicyCache:
+    """LRU cache of loaded policies."""
+
+    def __init__(self, max_size: int = POLICY_CACHE_SIZE):
+        self.max_size = max_size
+        self._policies = OrderedDict()
+
+    def get_or_load(self, key, load):
+        """Returns (policy, hit)."""
+        if key in self._policies:
+            self._policies.move_to_end(key)
+            return self._policies[key], True
+        policy = load()
+        self._policies[key] = policy
+        while len(self._policies) > self.max_size:
+            self._policies.popitem(last=False)
+        return policy, False
+
+
+def parse_eval_config(args: list):
+    """Parses eval.py command-line arguments into lerobot's EvalPipelineConfig."""
+    from lerobot.configs import parser
+    from lerobot.configs.eval import EvalPipelineConfig
+
+    # lerobot's parser reads --policy.path and the overrides from sys.argv
+    sys.argv = ["eval.py", *args]
+
+    @parser.wrap()
+    def parse(cfg: EvalPipelineConfig):
+        return cfg
+
+    return parse()
+
+
+def run_eval_job(args: list, policy_path: str, policies: PolicyCache) -> bool:
+    """
+    Runs one evaluation the way lerobot's eval.py does, reusing a cached policy when possible.
+
+    Returns:
+        bool: Whether the policy came from the cache.
+    """
+    import torch
+    from lerobot.common.envs.factory import make_env
+    from lerobot.common.policies.factory import make_policy
+    from lerobot.common.utils.random_utils import set_seed
+    from lerobot.common.utils.utils import get_safe_torch_device
+    from lerobot.scripts.eval import eval_policy
+
+    cfg = parse_eval_config(args)
+    device = get_safe_torch_device(cfg.policy.device, log=True)
+    set_seed(cfg.seed)
+
+    print("Making environment.")
+    env = make_env(cfg.env, n_envs=cfg.eval.batch_size, use_async_envs=cfg.eval.use_async_envs)
+    try:
+        key = (os.path.realpath(policy_path), checkpoint_mtime(policy_path))
+        policy, hit = policies.get_or_load(key, lambda: make_policy(cfg=cfg.policy, env_cfg=cfg.env))
+        print(f"Policy {'reused from cache' if hit else 'loaded'}: {policy_path}")
+        policy.eval()
+
+        amp = torch.autocast(device_type=device.type) if cfg.policy.use_amp else nullcontext()
+        with torch.no_grad(), amp:
+            info = eval_policy(
+                env,
+                policy,
+                cfg.eval.n_episodes,
+                max_episodes_rendered=10,
+                videos_dir=Path(cfg.output_dir) / "videos",
+                start_seed=cfg.seed,
+            )
+        print(info["aggregated"])
+
+        Path(cfg.output_dir).mkdir(parents=True, exist_ok=True)
+        with open(Path(cfg.output_dir) / "eval_info.json", "w") as f:
+            json.dump(info, f, indent=2)
+    finally:
+        env.close()
+    return hit
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent lerobot evaluation worker.")
+    parser.add_argument("--address", required=True, help="host:port of the eval service listener.")
+    parser.add_argument("--worker-id", required=True)
+    args = parser.parse_args()
+
+    # Pay for the heavy imports before announcing ourselves as ready
+    import torch  # noqa: F401
+    import lerobot.scripts.eval  # noqa: F401
+
+    host, port = args.address.rsplit(":", 1)
+    conn = Client((host, int(port)), authkey=bytes.fromhex(os.environ["EVAL_WORKER_AUTHKEY"]))
+    send_lock = threading.Lock()
+    conn.send({"type": "hello", "worker_id": args.worker_id, "pid": os.getpid()})
+
+    policies = PolicyCache()
+    original_stdout, original_stderr = sys.stdout, sys.stderr
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message.get("type") == "shutdown":
+            break
+
+        started = time.perf_counter()
+        return_code, error, hit = 0, None, False
+        sys.stdout = LineWriter(conn, send_lock, "stdout")
+        sys.stderr = LineWriter(conn, send_lock, "stderr")
+        redirected = redirect_log_handlers({original_stdout: sys.stdout, original_stderr: sys.stderr,
+                                            sys.__stderr__: sys.stderr})
+        try:
+            hit = run_eval_job(message["args"], message["policy_path"], policies)
+        except SystemExit as e:
+            # sys.exit() and SystemExit(None) mean success; other non-int codes (messages) mean failure
+            return_code = 0 if e.code is None else e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            traceback.print_exc()
+            return_code, error = 1, f"{type(e).__name__}: {e}"
+        finally:
+            restore_log_handlers(redirected)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            sys.stdout, sys.stderr = original_stdout, original_stderr
+
+        with send_lock:
+            conn.send({
+                "type": "result",
+                "job_id": message["job_id"],
+                "return_code": return_code,
+                "error": error,
+                "policy_cache_hit": hit,
+                "duration": time.perf_counter() - started,
+                "rss_mb": current_rss_mb(),
+            })
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
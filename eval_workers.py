@@ -0,0 +1,227 @@
+# eval_workers.py
+import asyncio
+import os
+import secrets
+import sys
+import threading
+from multiprocessing.connection import Listener
+
+from eval_jobs import CONDA_ENV, kill_process_group
+
+# --- Configuration ---
+# Persistent workers kept in the lerobot environment (0 disables the pool: one process per eval)
+EVAL_WORKERS = int(os.getenv("EVAL_WORKERS", "0"))
+# Workers are replaced after this many jobs, or when their memory grows past the ceiling
+WORKER_MAX_JOBS = int(os.getenv("EVAL_WORKER_MAX_JOBS", "50"))
+WORKER_MAX_MEMORY_MB = float(os.getenv("EVAL_WORKER_MAX_MEMORY_MB", "8192"))
+# Importing torch/lerobot can be slow on a cold machine
+WORKER_START_TIMEOUT = float(os.getenv("EVAL_WORKER_START_TIMEOUT", "300"))
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eval_worker.py")
+
+
+class WorkerError(Exception):
+    """A worker died or could not be started."""
+
+
+class EvalWorker:
+    """One persistent eval_worker.py process and its connection."""
+
+    def __init__(self, worker_id: str, process, conn, loop):
+        self.id = worker_id
+        self.process = process
+        self.conn = conn
+        self.jobs_done = 0
+        self.rss_mb = 0.0
+        self.messages = asyncio.Queue()
+        self._reader = threading.Thread(target=self._read, args=(loop,), name=f"eval-worker-{worker_id}",
+                                        daemon=True)
+        self._reader.start()
+
+    def _read(self, loop):
+        # Blocking reads happen here; messages are handed to the event loop
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                loop.call_soon_threadsafe(self.messages.put_nowait, None)
+                return
+            loop.call_soon_threadsafe(self.messages.put_nowait, message)
+
+    async def run(self, job):
+        """Runs a job on this worker, forwarding its output lines. Returns the worker's result message."""
+        self.conn.send({
+            "type": "job",
+            "job_id": job.id,
+            "policy_path": job.policy_path,
+            "args": job.eval_args,
+        })
+        while True:
+            message = await self.messages.get()
+            if message is None:
+                raise WorkerError(f"Worker {self.id} exited during job {job.id}.")
+            if message["type"] == "log":
+                job.write_line(message["stream"], message["line"])
+            elif message["type"] == "result":
+                self.jobs_done += 1
+                self.rss_mb = message.get("rss_mb", 0.0)
+                return message
+
+    async def stop(self, timeout: float = 10):
+        try:
+            self.conn.send({"type": "shutdown"})
+        except OSError:
+            pass
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.kill()
+            await self.process.wait()
+        self.conn.close()
+
+    def kill(self):
+        kill_process_group(self.process)
+
+
+class EvalWorkerPool:
+    """
+    Keeps persistent evaluation workers running inside the lerobot environment.
+
+    Workers import torch/lerobot once and cache loaded policies, so consecutive
+    evaluations skip conda resolution, interpreter start-up, imports and (for a
+    repeated checkpoint) policy loading. Workers talk to the service over an
+    authenticated local multiprocessing connection and are recycled after
+    WORKER_MAX_JOBS jobs or once they exceed WORKER_MAX_MEMORY_MB.
+    """
+
+    def __init__(self, size: int = EVAL_WORKERS, max_jobs: int = WORKER_MAX_JOBS,
+                 max_memory_mb: float = WORKER_MAX_MEMORY_MB):
+        self.size = size
+        self.max_jobs = max_jobs
+        self.max_memory_mb = max_memory_mb
+        self.recycled = 0
+
+        self._authkey = secrets.token_bytes(32)
+        self._listener = None
+        self._pending = {}  # worker ID -> future resolved with its connection
+        self._idle = asyncio.Queue()  # idle workers; None once the pool has none left and none starting
+        self._workers = {}
+        self._replacing = 0
+        self._next_id = 0
+        self._loop = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._listener = Listener(("127.0.0.1", 0), authkey=self._authkey)
+        threading.Thread(target=self._accept, name="eval-worker-listener", daemon=True).start()
+        workers = await asyncio.gather(*(self._spawn() for _ in range(self.size)), return_exceptions=True)
+        for worker in workers:
+            if isinstance(worker, Exception):
+                print(f"Eval worker failed to start: {worker}")
+            else:
+                self._idle.put_nowait(worker)
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+                hello = conn.recv()
+            except Exception:
+                # Listener closed (shutdown) or a worker failed authentication
+                if self._listener is None:
+                    return
+                continue
+            future = self._pending.pop(hello.get("worker_id"), None)
+            if future is None:
+                conn.close()
+            else:
+                self._loop.call_soon_threadsafe(future.set_result, conn)
+
+    async def _spawn(self) -> EvalWorker:
+        self._next_id += 1
+        worker_id = str(self._next_id)
+        host, port = self._listener.address
+        connected = self._loop.create_future()
+        self._pending[worker_id] = connected
+
+        python = ["conda", "run", "--no-capture-output", "-n", CONDA_ENV, "python"] if CONDA_ENV else [sys.executable]
+        process = await asyncio.create_subprocess_exec(
+            *python, WORKER_SCRIPT,
+            "--address", f"{host}:{port}", "--worker-id", worker_id,
+            env={**os.environ, "EVAL_WORKER_AUTHKEY": self._authkey.hex()},
+            start_new_session=True,
+        )
+        try:
+            done, _ = await asyncio.wait({connected, asyncio.ensure_future(process.wait())},
+                                         timeout=WORKER_START_TIMEOUT, return_when=asyncio.FIRST_COMPLETED)
+            if connected not in done:
+                raise WorkerError(f"Worker {worker_id} did not connect (exit code {process.returncode}).")
+        except BaseException:
+            self._pending.pop(worker_id, None)
+            kill_process_group(process)
+            raise
+
+        worker = EvalWorker(worker_id, process, connected.result(), self._loop)
+        self._workers[worker_id] = worker
+        print(f"Eval worker {worker_id} ready (pid {process.pid}).")
+        return worker
+
+    async def _replace(self, worker: EvalWorker, reason: str):
+        print(f"Recycling eval worker {worker.id}: {reason}")
+        self._workers.pop(worker.id, None)
+        self.recycled += 1
+        self._replacing += 1
+        try:
+            await worker.stop()
+            self._idle.put_nowait(await self._spawn())
+        except Exception as e:
+            print(f"Could not start a replacement eval worker: {e}")
+        finally:
+            self._replacing -= 1
+        if not self._workers and not self._replacing:
+            # Wake the jobs waiting for a worker that will never come
+            self._idle.put_nowait(None)
+
+    async def run(self, job) -> dict:
+        """
+        Runs a job on the next idle worker and returns its result message.
+        Raises WorkerError if the worker dies, or if no worker is left and none could be
+        started; a worker that dies is replaced either way.
+        """
+        if not self._workers and not self._replacing:
+            raise WorkerError("No eval workers are running.")
+        worker = await self._idle.get()
+        if worker is None:
+            self._idle.put_nowait(None)  # for the next waiter
+            raise WorkerError("No eval workers are running: replacements failed to start.")
+        try:
+            result = await worker.run(job)
+        except BaseException as e:
+            # A cancelled or crashed job leaves the worker in an unknown state: replace it
+            worker.kill()
+            asyncio.create_task(self._replace(worker, f"job {job.id} did not complete ({type(e).__name__})"))
+            raise
+
+        if worker.jobs_done >= self.max_jobs:
+            asyncio.create_task(self._replace(worker, f"served {worker.jobs_done} jobs"))
+        elif worker.rss_mb >= self.max_memory_mb:
+            asyncio.create_task(self._replace(worker, f"using {worker.rss_mb:.0f} MB"))
+        else:
+            self._idle.put_nowait(worker)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "idle": sum(1 for worker in self._idle._queue if worker is not None),
+            "recycled": self.recycled,
+            "jobs_done": {worker.id: worker.jobs_done for worker in self._workers.values()},
+            "rss_mb": {worker.id: round(worker.rss_mb, 1) for worker in self._workers.values()},
+        }
+
+    async def shutdown(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+        await asyncio.gather(*(worker.stop() for worker in list(self._workers.values())), return_exceptions=True)
+        self._workers.clear()
@@ -0,0 +1,84 @@
+# http_clients.py
+"""
+Shared HTTP clients with keep-alive connection pools: an aiohttp session for the
+MCP vision server and an Anthropic SDK client for the voice loop. Each library is
+imported when its client is first created, so neither server pays for the other's.
+"""
+import atexit
+import os
+import threading
+
+# --- Configuration ---
+ANTHROPIC_BASE_URL = os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com").rstrip("/")
+MAX_CONNECTIONS = int(os.getenv("VISION_HTTP_MAX_CONNECTIONS", "10"))
+# Idle connections are kept open this long (seconds) so the next query skips DNS/TCP/TLS setup
+KEEPALIVE_TIMEOUT = float(os.getenv("VISION_HTTP_KEEPALIVE", "60"))
+CONNECT_TIMEOUT = float(os.getenv("VISION_HTTP_CONNECT_TIMEOUT", "10"))
+REQUEST_TIMEOUT = float(os.getenv("VISION_HTTP_TIMEOUT", "60"))
+
+_session = None
+_anthropic_client = None
+_anthropic_lock = threading.Lock()
+
+
+async def get_vision_session() -> "aiohttp.ClientSession":
+    """
+    Returns the shared aiohttp session used for Claude API requests.
+
+    The session is created on first use inside the running event loop and keeps
+    a pool of keep-alive connections that is reused across tool invocations.
+    """
+    import aiohttp
+
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=MAX_CONNECTIONS,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT)
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+    return _session
+
+
+async def close_vision_session():
+    """Closes the shared aiohttp session and its pooled connections."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def get_anthropic_client(api_key: str = None):
+    """Returns the shared Anthropic client, whose HTTP connection pool is reused across calls."""
+    import httpx
+    from anthropic import Anthropic, DefaultHttpxClient
+
+    global _anthropic_client
+    with _anthropic_lock:
+        if _anthropic_client is None:
+            http_client = DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_TIMEOUT,
+                ),
+            )
+            _anthropic_client = Anthropic(
+                api_key=api_key,
+                base_url=ANTHROPIC_BASE_URL,
+                timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=CONNECT_TIMEOUT),
+                http_client=http_client,
+            )
+        return _anthropic_client
+
+
+@atexit.register
+def close_anthropic_client():
+    """Closes the shared Anthropic client and its pooled connections."""
+    global _anthropic_client
+    with _anthropic_lock:
+        if _anthropic_client is not None:
+            _anthropic_client.close()
+            _anthropic_client = None
@@ -0,0 +1,261 @@
+# image_encoding.py
+"""
+Encoding of camera frames for the Messages API: downscaled to what the API would
+keep anyway and compressed under a byte budget. Functions that need OpenCV import
+it when called, so importing this module does not load it.
+"""
+import base64
+import math
+import os
+import sys
+from dataclasses import dataclass
+
+# --- Configuration ---
+IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "jpeg").lower()
+IMAGE_QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "85"))
+# Lowest encoder quality the budget search is allowed to fall back to
+MIN_IMAGE_QUALITY = int(os.getenv("VISION_MIN_IMAGE_QUALITY", "50"))
+
+# Images larger than ~1.15 megapixels or 1568px on the long edge are downscaled by the
+# API anyway, so sending more pixels only costs bandwidth and latency
+MAX_IMAGE_TOKENS = int(os.getenv("VISION_MAX_IMAGE_TOKENS", "1600"))
+MAX_LONG_EDGE = int(os.getenv("VISION_MAX_LONG_EDGE", "1568"))
+# Binary size budget (target ~3.75MB to stay under 5MB after Base64)
+MAX_IMAGE_BYTES = int(os.getenv("VISION_MAX_IMAGE_BYTES", str(int(3.75 * 1024 * 1024))))
+
+# Budgets shared by all images of one multi-camera request
+MAX_TOTAL_IMAGE_TOKENS = int(os.getenv("VISION_MAX_TOTAL_IMAGE_TOKENS", "3200"))
+MAX_TOTAL_IMAGE_BYTES = int(os.getenv("VISION_MAX_TOTAL_IMAGE_BYTES", str(int(7.5 * 1024 * 1024))))
+
+# Hard limit the API puts on a single base64-encoded image
+MAX_BASE64_SIZE_BYTES = 5 * 1024 * 1024
+
+# Pixels per image token, as documented for the Messages API
+PIXELS_PER_TOKEN = 750
+# Give up searching after this many encoder passes
+MAX_ENCODE_PASSES = 6
+# Overshoots smaller than this are fixed by lowering quality, larger ones by downscaling
+QUALITY_ONLY_OVERSHOOT = 1.5
+QUALITY_STEP = 15
+
+# Supported output formats: extension for cv2.imencode, name of the cv2 quality flag and media type
+FORMATS = {
+    "jpeg": (".jpg", "IMWRITE_JPEG_QUALITY", "image/jpeg"),
+    "webp": (".webp", "IMWRITE_WEBP_QUALITY", "image/webp"),
+    "png": (".png", None, "image/png"),
+}
+
+
+def base64_size(num_bytes: int) -> int:
+    """Returns the length of the base64 encoding of num_bytes bytes without encoding them."""
+    return 4 * math.ceil(num_bytes / 3)
+
+
+def compress_frame(frame, image_format: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY):
+    """
+    Compresses a BGR frame (as returned by cv2) in memory.
+
+    Args:
+        frame (np.ndarray): The captured frame.
+        image_format (str): One of "jpeg", "webp" or "png".
+        quality (int): Encoder quality (1-100), ignored for PNG.
+
+    Returns:
+        tuple: (compressed bytes, media type)
+    """
+    import cv2
+
+    try:
+        extension, quality_flag, media_type = FORMATS[image_format]
+    except KeyError:
+        raise ValueError(f"Unsupported image format: {image_format}")
+
+    params = [getattr(cv2, quality_flag), int(quality)] if quality_flag is not None else []
+    ok, buffer = cv2.imencode(extension, frame, params)
+    if not ok:
+        raise ValueError(f"Failed to encode frame as {image_format}.")
+    return buffer.tobytes(), media_type
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Estimates the input tokens an image of the given size costs."""
+    return math.ceil(width * height / PIXELS_PER_TOKEN)
+
+
+def budget_scale(width: int, height: int, max_tokens: int = MAX_IMAGE_TOKENS,
+                 max_long_edge: int = MAX_LONG_EDGE) -> float:
+    """Returns the downscale factor (<= 1) that fits an image into the pixel/token budget."""
+    max_pixels = max_tokens * PIXELS_PER_TOKEN
+    return min(1.0,
+               max_long_edge / max(width, height),
+               math.sqrt(max_pixels / (width * height)))
+
+
+@dataclass
+class EncodedImage:
+    """A frame prepared for the Messages API, plus what it is going to cost."""
+    data: str
+    media_type: str
+    width: int
+    height: int
+    num_bytes: int
+    quality: int
+    estimated_tokens: int
+    passes: int
+
+    def summary(self) -> str:
+        return (f"{self.width}x{self.height} {self.media_type} q{self.quality}, "
+                f"{self.num_bytes / 1024:.1f} KB, ~{self.estimated_tokens} tokens, "
+                f"{self.passes} encode pass(es)")
+
+
+def _resize(frame, scale: float):
+    import cv2
+
+    if scale >= 1.0:
+        return frame
+    height, width = frame.shape[:2]
+    new_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(frame, new_size, interpolation=cv2.INTER_AREA)
+
+
+def prepare_frame(frame, max_tokens: int = MAX_IMAGE_TOKENS, max_bytes: int = MAX_IMAGE_BYTES,
+                  max_long_edge: int = MAX_LONG_EDGE, image_format: str = IMAGE_FORMAT,
+                  quality: int = IMAGE_QUALITY, min_quality: int = MIN_IMAGE_QUALITY) -> EncodedImage:
+    """
+    Downscales and compresses a frame so it fits both a token budget and a byte budget.
+
+    The pixel budget is applied up front without encoding. If the compressed result is
+    still over the byte budget, small overshoots are fixed by lowering the encoder quality
+    and large ones by shrinking the image proportionally to the overshoot, so the budget is
+    usually hit in one or two passes.
+
+    Args:
+        frame (np.ndarray): The captured BGR frame.
+        max_tokens (int): Estimated image token budget.
+        max_bytes (int): Budget for the compressed (binary) image size.
+        max_long_edge (int): Maximum length of the longer side in pixels.
+        image_format (str): One of "jpeg", "webp" or "png".
+        quality (int): Starting encoder quality.
+        min_quality (int): Lowest quality the search may use.
+
+    Returns:
+        EncodedImage: The base64 payload with its dimensions, size and estimated tokens.
+    """
+    height, width = frame.shape[:2]
+    scale = budget_scale(width, height, max_tokens, max_long_edge)
+    resized = _resize(frame, scale)
+    has_quality = FORMATS.get(image_format, (None, None))[1] is not None
+
+    passes = 0
+    while True:
+        binary_data, media_type = compress_frame(resized, image_format, quality)
+        passes += 1
+        overshoot = len(binary_data) / max_bytes
+        if overshoot <= 1.0:
+            break
+        if passes >= MAX_ENCODE_PASSES:
+            raise ValueError(f"Could not fit image into {max_bytes} bytes "
+                             f"({len(binary_data)} bytes after {passes} passes).")
+
+        if has_quality and quality > min_quality and overshoot < QUALITY_ONLY_OVERSHOOT:
+            quality = max(min_quality, quality - QUALITY_STEP)
+        else:
+            # Compressed size scales roughly with pixel count; aim slightly below budget
+            scale *= math.sqrt(0.9 / overshoot)
+            resized = _resize(frame, scale)
+
+    encoded_size = base64_size(len(binary_data))
+    if encoded_size > MAX_BASE64_SIZE_BYTES:
+        raise ValueError(f"Estimated Base64 size ({encoded_size} bytes) exceeds API limit of 5MB.")
+
+    out_height, out_width = resized.shape[:2]
+    return EncodedImage(
+        data=base64.b64encode(binary_data).decode('utf-8'),
+        media_type=media_type,
+        width=out_width,
+        height=out_height,
+        num_bytes=len(binary_data),
+        quality=quality if has_quality else 0,
+        estimated_tokens=estimate_image_tokens(out_width, out_height),
+        passes=passes,
+    )
+
+
+def encode_frame(frame, image_format: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY):
+    """
+    Fits a frame into the configured budgets and base64-encodes it, without touching disk.
+
+    Returns:
+        tuple: (base64 string, media type)
+    """
+    image = prepare_frame(frame, image_format=image_format, quality=quality)
+    # stderr, because stdout carries the MCP stdio protocol
+    print(f"Prepared image: {image.summary()}", file=sys.stderr)
+    return image.data, image.media_type
+
+
+def prepare_frames(frames: list, max_total_tokens: int = MAX_TOTAL_IMAGE_TOKENS,
+                   max_total_bytes: int = MAX_TOTAL_IMAGE_BYTES, max_tokens: int = MAX_IMAGE_TOKENS,
+                   max_bytes: int = MAX_IMAGE_BYTES, image_format: str = IMAGE_FORMAT,
+                   quality: int = IMAGE_QUALITY) -> list:
+    """
+    Fits several frames into one shared token and byte budget.
+
+    Each frame gets a share proportional to its pixel count, so all of them are
+    downscaled by the same factor (unless a per-image limit is tighter).
+
+    Returns:
+        list: One EncodedImage per frame, in order.
+    """
+    pixels = [frame.shape[0] * frame.shape[1] for frame in frames]
+    total_pixels = sum(pixels)
+    return [
+        prepare_frame(
+            frame,
+            max_tokens=max(1, min(max_tokens, int(max_total_tokens * count / total_pixels))),
+            max_bytes=max(1, min(max_bytes, int(max_total_bytes * count / total_pixels))),
+            image_format=image_format,
+            quality=quality,
+        )
+        for frame, count in zip(frames, pixels)
+    ]
+
+
+def encode_frames(frames: list, image_format: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY) -> list:
+    """
+    Like encode_frame for a set of frames sent together, under the shared budgets.
+
+    Returns:
+        list: (base64 string, media type) per frame, in order.
+    """
+    images = prepare_frames(frames, image_format=image_format, quality=quality)
+    print(f"Prepared {len(images)} images: " + "; ".join(image.summary() for image in images), file=sys.stderr)
+    return [(image.data, image.media_type) for image in images]
+
+
+def image_content(encoded, prompt: str) -> list:
+    """
+    Builds the content blocks of a user turn: the image(s) followed by the question.
+
+    Args:
+        encoded (tuple | dict): (base64 string, media type) of one image, or
+            {label: (base64 string, media type)} for several cameras.
+        prompt (str): The question asked about the image(s).
+
+    Returns:
+        list: Messages API content blocks; with several cameras, each image is
+            preceded by its label so the answer can refer to it.
+    """
+    if not isinstance(encoded, dict):
+        encoded = {None: encoded}
+    content = []
+    for label, (base64_image, media_type) in encoded.items():
+        if label is not None:
+            content.append({"type": "text", "text": f"{label}:"})
+        content.append({
+            "type": "image",
+            "source": {"type": "base64", "media_type": media_type, "data": base64_image},
+        })
+    content.append({"type": "text", "text": prompt})
+    return content
@@ -1,11 +1,40 @@
+import argparse
+import json
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Body
-import subprocess
-import shlex
-import os
+from fastapi.responses import PlainTextResponse, StreamingResponse
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+from eval_jobs import CANCELLED, EVAL_CONCURRENCY, SUCCEEDED, EvalJob, EvalScheduler
+from eval_workers import EVAL_WORKERS, EvalWorkerPool
+from eval_cache import EVAL_CACHE_ENABLED, EvalResultCache
+from eval_sweeps import SWEEP_MAX_PARALLEL, SweepManager, EvalSweep
+import tracing
+
+result_cache = EvalResultCache() if EVAL_CACHE_ENABLED else None
+if EVAL_WORKERS > 0:
+    # One running evaluation per persistent worker
+    scheduler = EvalScheduler(concurrency=EVAL_WORKERS, worker_pool=EvalWorkerPool(EVAL_WORKERS),
+                              result_cache=result_cache)
+else:
+    scheduler = EvalScheduler(concurrency=EVAL_CONCURRENCY, result_cache=result_cache)
+sweeps = SweepManager(scheduler)
+
+tracing.register_gauge("eval_jobs_queued", "Evaluations waiting for a slot.", lambda: scheduler.queued)
+tracing.register_gauge("eval_jobs_running", "Evaluations running.", lambda: scheduler.running)
+tracing.register_gauge("eval_jobs_in_flight", "Cacheable evaluations queued or running.", lambda: scheduler.in_flight)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Start persistent eval workers (if enabled) so their imports are paid before the first request
+    await scheduler.start()
+    yield
+    # Kill evaluations that are still running when the server stops
+    await sweeps.shutdown()
+    await scheduler.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow cross-origin requests from Claude Desktop
 app.add_middleware(
@@ -27,21 +56,48 @@ async def mcp_info():
         "capabilities": ["eval_service"]
     }
 
+@app.get("/up")
+async def health():
+    """
+    Health check that also reports load, so clients can route to the least busy server.
+    """
+    return {
+        "status": "ok",
+        "queued": scheduler.queued,
+        "running": scheduler.running,
+        "in_flight": scheduler.in_flight,
+        "concurrency": scheduler.concurrency,
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage latency histograms, byte and error counts, and queue gauges in the Prometheus text format."""
+    return tracing.render_metrics()
+
 # MCP endpoint to handle evaluation requests
 @app.post("/mcp/eval_service")
 async def mcp_eval_service(payload: dict = Body(...)):
     """
     MCP endpoint that handles evaluation requests from Claude.
     Expected payload format: {"parameters": {"output_dir": "/path/to/your/output/dir"}}
+
+    The evaluation is queued and a job ID is returned immediately; poll /jobs/{job_id}.
+    Pass "wait": true in the parameters to block until the evaluation has finished instead,
+    and "refresh": true to re-run even if a cached result exists.
     """
     # Extract parameters from the MCP payload structure
     if not payload.get("parameters") or not payload["parameters"].get("output_dir"):
         raise HTTPException(status_code=400, detail="'output_dir' must be provided in the parameters.")
     
-    output_dir = payload["parameters"]["output_dir"]
+    parameters = payload["parameters"]
+    output_dir = parameters["output_dir"]
     
-    # Run the evaluation
-    eval_result = await run_evaluation(output_dir)
+    use_cache = not parameters.get("refresh")
+    if parameters.get("wait"):
+        # Run the evaluation and return its output
+        eval_result = await run_evaluation(output_dir, use_cache)
+    else:
+        eval_result = (await scheduler.submit(output_dir, use_cache)).to_dict()
     
     # Return result in MCP format
     return {
@@ -49,50 +105,30 @@ async def mcp_eval_service(payload: dict = Body(...)):
         "result": eval_result
     }
 
-# Original evaluation function, modified to accept output_dir directly
-async def run_evaluation(output_dir: str):
+# Original evaluation function, now queued on the scheduler instead of blocking the event loop
+async def run_evaluation(output_dir: str, use_cache: bool = True):
     """
-    Activates the 'lerobot' conda environment and runs the evaluation script.
+    Runs the evaluation script in the 'lerobot' conda environment and waits for it to finish.
     """
     if not output_dir:
         raise HTTPException(status_code=400, detail="'output_dir' must be provided.")
 
-    # Construct the command to run the evaluation script within the conda environment
-    eval_script_path = os.path.expanduser("~/lerobot/lerobot/scripts/eval.py")
-    policy_path = os.path.join(output_dir, "checkpoints", "last", "pretrained_model")
-    
-    command = f"conda run -n lerobot python {eval_script_path} --policy.path={policy_path}"
-
-    print(f"Executing command: {command}")
+    with tracing.span("eval.request") as span:
+        job = await scheduler.wait(await scheduler.submit(output_dir, use_cache))
+        if job.status != SUCCEEDED:
+            span.fail()
+    return job_result_or_error(job)
 
-    try:
-        # Using subprocess.run to execute the command
-        result = subprocess.run(shlex.split(command), capture_output=True, text=True, check=True, shell=False)
-        
-        print("Command executed successfully:")
-        print("STDOUT:")
-        print(result.stdout)
-        print("STDERR:")
-        print(result.stderr)
-        
-        return {
-            "message": "Evaluation command executed successfully.",
-            "stdout": result.stdout,
-            "stderr": result.stderr
-        }
-
-    except FileNotFoundError:
-        print(f"Error: 'conda' command not found. Make sure Conda is installed and in the system's PATH.")
-        raise HTTPException(status_code=500, detail="'conda' command not found. Ensure Conda is installed and accessible.")
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing command: {e}")
-        print(f"STDOUT: {e.stdout}")
-        print(f"STDERR: {e.stderr}")
-        raise HTTPException(status_code=500, 
-                            detail=f"Command failed with exit code {e.returncode}. Error: {e.stderr}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+def job_result_or_error(job: EvalJob):
+    """Returns a finished job's result, raising the HTTP error the eval endpoints have always raised."""
+    if job.status == SUCCEEDED:
+        return job.result()
+    if job.error:
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status == CANCELLED:
+        raise HTTPException(status_code=409, detail="Evaluation was cancelled.")
+    raise HTTPException(status_code=500,
+                        detail=f"Command failed with exit code {job.return_code}. Error: {job.stderr}")
 
 # Keep the original endpoint for backward compatibility
 @app.post("/run_eval")
@@ -100,13 +136,189 @@ async def original_run_evaluation(payload: dict = Body(...)):
     """
     Original endpoint for backward compatibility.
     Example request body: {"output_dir": "/path/to/your/output/dir"}
+
+    Returns the queued job; add "wait": true to block until the evaluation has finished,
+    and "refresh": true to re-run even if a cached result exists.
     """
     output_dir = payload.get("output_dir")
     if not output_dir:
         raise HTTPException(status_code=400, detail="'output_dir' must be provided in the request body.")
     
-    return await run_evaluation(output_dir)
+    use_cache = not payload.get("refresh")
+    if payload.get("wait"):
+        return await run_evaluation(output_dir, use_cache)
+    return (await scheduler.submit(output_dir, use_cache)).to_dict()
+
+def get_job_or_404(job_id: str) -> EvalJob:
+    job = scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job ID: {job_id}")
+    return job
+
+@app.get("/jobs")
+async def list_jobs():
+    """Lists known evaluation jobs, oldest first, with the scheduler's queue state."""
+    return {
+        "queued": scheduler.queued,
+        "running": scheduler.running,
+        "concurrency": scheduler.concurrency,
+        "workers": scheduler.worker_pool.stats() if scheduler.worker_pool else None,
+        "jobs": [job.to_dict() for job in scheduler.jobs()],
+    }
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Returns the status of an evaluation job."""
+    return get_job_or_404(job_id).to_dict()
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    """Returns the output of a finished evaluation job (409 while it is still queued or running)."""
+    job = get_job_or_404(job_id)
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is still {job.status}.")
+    return {**job.to_dict(), "result": job.result()}
+
+def sse_event(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job_output(job_id: str):
+    """
+    Streams an evaluation's output as server-sent events while it runs.
+    Each line is sent as a `stdout` or `stderr` event (earlier lines are replayed first);
+    a final `end` event carries the job status as JSON.
+    """
+    job = get_job_or_404(job_id)
+
+    async def events():
+        async for stream, line in job.follow():
+            yield sse_event(stream, line)
+        yield sse_event("end", json.dumps(job.to_dict()))
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, force: bool = False):
+    """
+    Cancels a queued or running evaluation job. A job shared by identical requests keeps
+    running ("detached") until every one of them has cancelled, unless ?force=true.
+    """
+    job = get_job_or_404(job_id)
+    if not scheduler.cancel(job_id, force):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} has already {job.status}.")
+    return {"job_id": job_id, "status": "cancelling" if job.waiters == 0 else "detached", "waiters": job.waiters}
+
+@app.post("/sweeps")
+async def start_sweep(payload: dict = Body(...)):
+    """
+    Evaluates many checkpoints of one or more training runs in parallel.
+    Example request body:
+        {"output_dir": "/path/to/run", "checkpoints": "all", "every": 2, "max_parallel": 4}
+
+    "output_dirs" takes a list of runs instead of "output_dir". "checkpoints" is "all" (default),
+    "last", or a list of checkpoint names/steps; "every": N keeps every Nth selected checkpoint
+    counting back from the latest. Returns the sweep immediately; poll /sweeps/{sweep_id} or
+    follow /sweeps/{sweep_id}/stream. "refresh": true re-runs checkpoints that have cached results.
+    """
+    output_dirs = payload.get("output_dirs") or ([payload["output_dir"]] if payload.get("output_dir") else [])
+    if not output_dirs:
+        raise HTTPException(status_code=400, detail="'output_dir' or 'output_dirs' must be provided in the request body.")
+
+    try:
+        max_parallel = int(payload.get("max_parallel") or SWEEP_MAX_PARALLEL)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="'max_parallel' must be an integer.")
+    try:
+        sweep = sweeps.create(
+            output_dirs,
+            select=payload.get("checkpoints", "all"),
+            every=payload.get("every"),
+            max_parallel=max_parallel,
+            use_cache=not payload.get("refresh"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return sweep.to_dict()
+
+def get_sweep_or_404(sweep_id: str) -> EvalSweep:
+    sweep = sweeps.get(sweep_id)
+    if sweep is None:
+        raise HTTPException(status_code=404, detail=f"Unknown sweep ID: {sweep_id}")
+    return sweep
+
+@app.get("/sweeps")
+async def list_sweeps():
+    """Lists known checkpoint sweeps with their progress."""
+    return {"sweeps": [{key: value for key, value in sweep.to_dict().items() if key != "checkpoints"}
+                       for sweep in sweeps.sweeps()]}
+
+@app.get("/sweeps/{sweep_id}")
+async def sweep_status(sweep_id: str):
+    """Returns a sweep's per-checkpoint results so far, and the best checkpoint by its eval metrics."""
+    return get_sweep_or_404(sweep_id).to_dict()
+
+@app.get("/sweeps/{sweep_id}/stream")
+async def stream_sweep_results(sweep_id: str):
+    """
+    Streams a sweep's results as server-sent events.
+    Each finished checkpoint is sent as a `result` event (earlier ones are replayed first);
+    a final `end` event carries the aggregated sweep as JSON.
+    """
+    sweep = get_sweep_or_404(sweep_id)
+
+    async def events():
+        async for item in sweep.follow():
+            yield sse_event("result", json.dumps(item.to_dict()))
+        yield sse_event("end", json.dumps(sweep.to_dict()))
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/sweeps/{sweep_id}/cancel")
+async def cancel_sweep(sweep_id: str):
+    """Cancels a sweep's queued and running evaluations."""
+    sweep = get_sweep_or_404(sweep_id)
+    if not sweep.cancel():
+        raise HTTPException(status_code=409, detail=f"Sweep {sweep_id} has already finished.")
+    return {"sweep_id": sweep_id, "status": "cancelling"}
+
+def get_cache_or_404() -> EvalResultCache:
+    if result_cache is None:
+        raise HTTPException(status_code=404, detail="The eval result cache is disabled.")
+    return result_cache
+
+@app.get("/cache")
+async def cache_usage():
+    """Reports eval result cache usage and lists the cached entries."""
+    cache = get_cache_or_404()
+    entries = [
+        {key: record.get(key) for key in ("cache_key", "output_dir", "checkpoint", "policy_path", "cached_at",
+                                          "duration")}
+        for record in cache.entries()
+    ]
+    return {**cache.stats(), "in_flight": scheduler.in_flight, "items": entries}
+
+@app.delete("/cache")
+async def invalidate_cache(output_dir: str = None):
+    """Invalidates every cached result, or only those of ?output_dir=..."""
+    cache = get_cache_or_404()
+    removed = cache.invalidate_output_dir(output_dir) if output_dir else cache.clear()
+    return {"removed": removed}
+
+@app.delete("/cache/{key}")
+async def invalidate_cache_entry(key: str):
+    """Invalidates one cached result by its cache key."""
+    if not get_cache_or_404().invalidate(key):
+        raise HTTPException(status_code=404, detail=f"No cached result for key: {key}")
+    return {"removed": 1}
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="lerobot evaluation service.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="Port to listen on (run several instances on different ports to test load balancing).")
+    args = parser.parse_args()
     # Run the server - change to 0.0.0.0 to make it accessible from other machines
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -1,12 +1,418 @@
 # mcp_proxy.py
-import sys, json, httpx
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import deque
+
+import httpx
+
+# --- Configuration ---
+# Comma-separated eval service base URLs
+EVAL_BACKENDS = [url.strip().rstrip("/") for url in
+                 os.getenv("EVAL_BACKENDS", "http://10.250.73.30:8000").split(",") if url.strip()]
+HEALTH_CHECK_INTERVAL = float(os.getenv("EVAL_HEALTH_CHECK_INTERVAL", "5"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("EVAL_HEALTH_CHECK_TIMEOUT", "2"))
+# Timeout for individual HTTP calls; evaluations themselves are polled, so they can run for hours
+REQUEST_TIMEOUT = float(os.getenv("EVAL_REQUEST_TIMEOUT", "30"))
+POLL_INTERVAL = float(os.getenv("EVAL_POLL_INTERVAL", "1"))
+# Backends tried for one evaluation before giving up
+MAX_ATTEMPTS = int(os.getenv("EVAL_MAX_ATTEMPTS", "3"))
+# Idle connections are kept open this long so consecutive calls skip the TCP handshake
+KEEPALIVE_EXPIRY = float(os.getenv("EVAL_KEEPALIVE_EXPIRY", "60"))
+
+LATENCY_WINDOW = 100
+FINISHED_STATES = {"succeeded", "failed", "cancelled"}
+
+
+class BackendError(Exception):
+    """A backend failed while handling an evaluation (unreachable, crashed or lost the job)."""
+
+
+class NoHealthyBackend(Exception):
+    """Every backend is down."""
+
+
+class Backend:
+    """One eval service and what the proxy knows about its health and load."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy = True  # optimistic until the first health check says otherwise
+        self.queued = 0
+        self.running = 0
+        self.concurrency = 1
+        self.active = 0  # evaluations this proxy is currently waiting on
+        self.completed = 0
+        self.failures = 0  # times the backend went from healthy to down, not failed checks while down
+        self.last_error = None
+        self.started_at = time.monotonic()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # seconds per completed evaluation
+
+    @property
+    def load(self) -> float:
+        """
+        Busy evaluation slots per slot available.
+
+        The server's own queue depth is only as fresh as the last health check, so
+        evaluations this proxy has dispatched since then are counted as well.
+        """
+        busy = max(self.queued + self.running, self.active)
+        return busy / max(self.concurrency, 1)
+
+    def update(self, status: dict):
+        self.healthy = True
+        self.queued = status.get("queued", 0)
+        self.running = status.get("running", 0)
+        self.concurrency = status.get("concurrency", 1)
+
+    def mark_down(self, error: str):
+        if self.healthy:
+            print(f"Eval backend {self.url} is down: {error}", file=sys.stderr)
+            self.failures += 1
+        self.healthy = False
+        self.last_error = error
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "queued": self.queued,
+            "running": self.running,
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "completed": self.completed,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "latency_mean_s": statistics.mean(latencies) if latencies else None,
+            "latency_p50_s": latencies[len(latencies) // 2] if latencies else None,
+            "latency_p95_s": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else None,
+            "throughput_per_min": self.completed / elapsed * 60 if elapsed > 0 else 0.0,
+        }
+
+
+class EvalClient:
+    """
+    Routes evaluations across several eval services (main.py instances).
+
+    Backends are health-checked in the background through /up, which also reports
+    their queue depth; each evaluation goes to the healthy backend with the lowest
+    load. Evaluations are submitted as jobs and polled, so if a backend dies
+    mid-evaluation the job is resubmitted to the next best backend.
+    """
+
+    def __init__(self, backend_urls: list = EVAL_BACKENDS, health_check_interval: float = HEALTH_CHECK_INTERVAL,
+                 poll_interval: float = POLL_INTERVAL, max_attempts: int = MAX_ATTEMPTS):
+        if not backend_urls:
+            raise ValueError("At least one eval backend URL is required.")
+        self.backends = [Backend(url.rstrip("/")) for url in backend_urls]
+        self.health_check_interval = health_check_interval
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=HEALTH_CHECK_TIMEOUT),
+            limits=httpx.Limits(max_keepalive_connections=len(self.backends) * 4, keepalive_expiry=KEEPALIVE_EXPIRY),
+        )
+        self._health_task = None
+
+    async def __aenter__(self) -> "EvalClient":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self, wait_for_health: bool = True):
+        """
+        Checks the backends, then keeps checking them in the background. With
+        wait_for_health=False the first check runs in the background too, and the
+        backends count as healthy until it says otherwise.
+        """
+        if wait_for_health:
+            await self.check_health()
+        self._health_task = asyncio.create_task(self._health_loop(check_now=not wait_for_health))
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+        await self.client.aclose()
+
+    async def check_backend(self, backend: Backend):
+        try:
+            response = await self.client.get(f"{backend.url}/up", timeout=HEALTH_CHECK_TIMEOUT)
+            response.raise_for_status()
+            backend.update(response.json())
+        except (httpx.HTTPError, ValueError) as e:
+            backend.mark_down(f"health check failed: {e!r}")
+
+    async def check_health(self):
+        await asyncio.gather(*(self.check_backend(backend) for backend in self.backends))
+
+    async def _health_loop(self, check_now: bool = False):
+        if check_now:
+            await self.check_health()
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await self.check_health()
+
+    def pick_backend(self, exclude=()) -> Backend:
+        """The healthy backend with the lowest load, preferring ones not in `exclude`."""
+        healthy = [backend for backend in self.backends if backend.healthy]
+        candidates = [backend for backend in healthy if backend not in exclude] or healthy
+        if not candidates:
+            raise NoHealthyBackend("No healthy eval backends: " + ", ".join(b.url for b in self.backends))
+        return min(candidates, key=lambda backend: (backend.load, backend.active))
+
+    async def _request(self, backend: Backend, method: str, path: str, **kwargs) -> dict:
+        try:
+            response = await self.client.request(method, f"{backend.url}{path}", **kwargs)
+        except httpx.TransportError as e:
+            raise BackendError(f"{type(e).__name__}: {e}") from e
+        if response.status_code >= 500 or response.status_code == 404:
+            # 404: the server restarted and no longer knows the job
+            raise BackendError(f"HTTP {response.status_code}: {response.text[:200]}")
+        response.raise_for_status()
+        return response.json()
+
+    async def _cancel_job(self, backend: Backend, job_id: str):
+        """Best-effort cancel. A job shared with identical requests is only detached from and keeps running."""
+        try:
+            await self.client.post(f"{backend.url}/jobs/{job_id}/cancel", timeout=HEALTH_CHECK_TIMEOUT)
+        except httpx.HTTPError:
+            pass
+
+    async def _run_on(self, backend: Backend, payload: dict) -> dict:
+        job = await self._request(backend, "POST", "/run_eval", json=payload)
+        try:
+            while job["status"] not in FINISHED_STATES:
+                await asyncio.sleep(self.poll_interval)
+                job = await self._request(backend, "GET", f"/jobs/{job['job_id']}")
+        except BaseException:
+            # Whether the caller gave up, a poll failed before failing over, or anything else
+            # went wrong, a backend that is still up must not keep running an evaluation
+            # nobody is waiting for (or run it alongside the retry on another backend)
+            await self._cancel_job(backend, job["job_id"])
+            raise
+        return await self._request(backend, "GET", f"/jobs/{job['job_id']}/result")
+
+    async def run_eval(self, output_dir: str, refresh: bool = False) -> dict:
+        """
+        Runs an evaluation on the least-loaded healthy backend and returns the finished job with its result.
+        Raises NoHealthyBackend or BackendError once `max_attempts` backends have failed.
+        """
+        payload = {"output_dir": output_dir, "refresh": refresh}
+        tried = []
+        while True:
+            backend = self.pick_backend(exclude=tried)
+            tried.append(backend)
+            backend.active += 1
+            started = time.monotonic()
+            try:
+                job = await self._run_on(backend, payload)
+            except BackendError as e:
+                backend.mark_down(str(e))
+                if len(tried) >= self.max_attempts:
+                    raise
+                print(f"Retrying {output_dir} on another backend after: {e}", file=sys.stderr)
+                continue
+            finally:
+                backend.active -= 1
+            backend.completed += 1
+            backend.latencies.append(time.monotonic() - started)
+            return {**job, "backend": backend.url, "attempts": len(tried)}
+
+    def stats(self) -> list:
+        return [backend.stats() for backend in self.backends]
+
+
+PROTOCOL_VERSION = "2024-11-05"
+
+TOOLS = [
+    {
+        "name": "eval_service",
+        "description": "Runs a lerobot policy evaluation for a training output directory on the least busy "
+                       "eval server and returns its output.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "output_dir": {"type": "string", "description": "Training output directory to evaluate."},
+                "refresh": {"type": "boolean", "description": "Re-run even if a cached result exists."},
+            },
+            "required": ["output_dir"],
+        },
+    },
+    {
+        "name": "eval_backends",
+        "description": "Reports the health, load, latency and throughput of each eval server.",
+        "inputSchema": {"type": "object", "properties": {}},
+    },
+]
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class JsonRpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class StdioBridge:
+    """
+    Long-running MCP stdio server in front of the eval servers.
+
+    Reads newline-delimited JSON-RPC messages from stdin and handles each one in
+    its own task, so many tool calls can be in flight at once; responses are
+    written as they complete, matched to requests by their ID. Every call goes
+    through the EvalClient's single pooled keep-alive HTTP client.
+    """
+
+    def __init__(self, client: EvalClient, reader=None, writer=None):
+        self.client = client
+        self.reader = reader or sys.stdin.buffer
+        self.writer = writer or sys.stdout.buffer
+        self._write_lock = asyncio.Lock()
+        self._tasks = {}  # request ID -> task handling it
+
+    async def serve(self):
+        """Handles requests until stdin closes, then waits for the ones still in flight."""
+        pending = set()
+        while line := await asyncio.to_thread(self.reader.readline):
+            if not line.strip():
+                continue
+            task = asyncio.create_task(self.handle_line(line))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def send(self, message: dict):
+        data = json.dumps(message).encode() + b"\n"
+        # One writer at a time, so concurrent responses never interleave on stdout
+        async with self._write_lock:
+            self.writer.write(data)
+            self.writer.flush()
+
+    async def handle_line(self, line: bytes):
+        try:
+            message = json.loads(line)
+        except ValueError as e:
+            await self.send({"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": str(e)}})
+            return
+        if not isinstance(message, dict) or not isinstance(message.get("method"), str):
+            if isinstance(message, dict) and "method" not in message:
+                return  # a response to something we never send; ignore it
+            await self.send({"jsonrpc": "2.0", "id": None,
+                             "error": {"code": INVALID_REQUEST, "message": "Invalid request."}})
+            return
+
+        request_id = message.get("id")
+        if request_id is None:
+            self.handle_notification(message["method"], message.get("params") or {})
+            return
+
+        self._tasks[request_id] = asyncio.current_task()
+        try:
+            result = await self.dispatch(message["method"], message.get("params") or {})
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except asyncio.CancelledError:
+            return  # cancelled by the client, which expects no response
+        except JsonRpcError as e:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            response = {"jsonrpc": "2.0", "id": request_id,
+                        "error": {"code": INTERNAL_ERROR, "message": f"{type(e).__name__}: {e}"}}
+        finally:
+            self._tasks.pop(request_id, None)
+        await self.send(response)
+
+    def handle_notification(self, method: str, params: dict):
+        if method == "notifications/cancelled":
+            task = self._tasks.get(params.get("requestId"))
+            if task is not None:
+                task.cancel()
+
+    async def dispatch(self, method: str, params: dict) -> dict:
+        if method == "initialize":
+            return {
+                "protocolVersion": params.get("protocolVersion", PROTOCOL_VERSION),
+                "capabilities": {"tools": {}},
+                "serverInfo": {"name": "eval_service", "version": "1.0"},
+            }
+        if method == "ping":
+            return {}
+        if method == "tools/list":
+            return {"tools": TOOLS}
+        if method == "tools/call":
+            return await self.call_tool(params.get("name"), params.get("arguments") or {})
+        raise JsonRpcError(METHOD_NOT_FOUND, f"Method not found: {method}")
+
+    async def call_tool(self, name: str, arguments: dict) -> dict:
+        if name == "eval_backends":
+            return {"content": [{"type": "text", "text": json.dumps(self.client.stats())}], "isError": False}
+        if name != "eval_service":
+            raise JsonRpcError(INVALID_PARAMS, f"Unknown tool: {name}")
+        if not arguments.get("output_dir"):
+            raise JsonRpcError(INVALID_PARAMS, "'output_dir' must be provided.")
+
+        try:
+            job = await self.client.run_eval(arguments["output_dir"], bool(arguments.get("refresh")))
+        except (BackendError, NoHealthyBackend, httpx.HTTPError) as e:
+            return {"content": [{"type": "text", "text": f"Evaluation could not be run: {e}"}], "isError": True}
+        return {"content": [{"type": "text", "text": json.dumps(job)}], "isError": job["status"] != "succeeded"}
+
+
+async def serve_stdio(backend_urls: list):
+    client = EvalClient(backend_urls)
+    # Answer the handshake right away instead of after a health check that may wait for a timeout
+    await client.start(wait_for_health=False)
+    try:
+        await StdioBridge(client).serve()
+    finally:
+        await client.close()
+
+
+async def run(output_dirs: list, backend_urls: list, refresh: bool = False) -> list:
+    async with EvalClient(backend_urls) as client:
+        results = await asyncio.gather(*(client.run_eval(output_dir, refresh) for output_dir in output_dirs),
+                                       return_exceptions=True)
+        for backend in client.stats():
+            print(json.dumps(backend), file=sys.stderr)
+    return results
 
-REMOTE = "http://10.250.73.30:8000/mcp/eval_service"
 
 def main():
-    request = {"parameters": {"output_dir": "/path/to/your/output/dir"}}
-    resp = httpx.post(REMOTE, json=request).json()
-    json.dump(resp, sys.stdout)
+    parser = argparse.ArgumentParser(description="Run lerobot evaluations on the least busy eval server.")
+    parser.add_argument("output_dirs", nargs="*",
+                        help="Training output directories to evaluate (run concurrently). "
+                             "Without any, runs as a persistent MCP stdio server.")
+    parser.add_argument("--backend", action="append", dest="backends",
+                        help="Eval service base URL (repeatable; defaults to $EVAL_BACKENDS).")
+    parser.add_argument("--refresh", action="store_true", help="Re-run even if a cached result exists.")
+    args = parser.parse_args()
+
+    if not args.output_dirs:
+        asyncio.run(serve_stdio(args.backends or EVAL_BACKENDS))
+        return
+
+    results = asyncio.run(run(args.output_dirs, args.backends or EVAL_BACKENDS, args.refresh))
+    for result in results:
+        if isinstance(result, Exception):
+            json.dump({"status": "error", "error": f"{type(result).__name__}: {result}"}, sys.stdout)
+        else:
+            json.dump({"status": "ok", "result": result}, sys.stdout)
+        sys.stdout.write("\n")
+
 
 if __name__ == "__main__":
     main()
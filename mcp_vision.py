@@ -7,94 +7,195 @@
 #     "mcp",
 # ]
 # ///
+import asyncio
 import json
 import os
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
 from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
-import aiohttp
-import base64
-import cv2
-import time
+
+import camera
+import http_clients
+import tracing
+from conversation import HISTORY_ENABLED, ConversationHistory, system_prompt
+from image_encoding import encode_frame, encode_frames, image_content
+from scene_watch import SceneWatcher, WATCH_MIN_INTERVAL, WATCH_RETENTION, WATCH_THRESHOLD
+from vision_cache import CACHE_ENABLED, frame_hash, frames_hash, response_cache
+from vision_scheduler import RETRYABLE_STATUSES, RetryableError, VisionAPIError, VisionScheduler, parse_retry_after
 
 # Load environment variables (put your API key in a .env file)
 load_dotenv()
 
-mcp = FastMCP("worldviewer")
+@asynccontextmanager
+async def lifespan(server):
+    """Closes the pooled HTTP connections when the MCP server stops."""
+    try:
+        yield
+    finally:
+        for watcher in watches.values():
+            watcher.stop()
+        await http_clients.close_vision_session()
+
+mcp = FastMCP("worldviewer", lifespan=lifespan)
 
 USER_AGENT = "worldviewer/1.0"
 API_KEY = os.getenv("ANTHROPIC_KEY")
+# Load OpenCV and aiohttp and open the cameras on a background thread at startup, while the handshake is answered
+WARM_UP = os.getenv("VISION_WARM_UP", "1") != "0"
+
+SYSTEM_PROMPT = "You are an accessibility assistant designed to help elderly or low-vision users understand their surroundings through a live camera feed. Given an image, describe only the most relevant and helpful parts of the scene for situational awareness, safety, and navigation. Prioritize objects like people, doors, signs, obstacles, and text. Keep your descriptions concise, factual, and easy to understand, using plain language. Avoid unnecessary details. Be direct and focus on what would matter most for a user trying to make sense of their immediate environment."
+
+# Active watch_world sessions, by watch ID
+watches = {}
+
+# Earlier view_world questions and answers, sent along as context when enabled
+history = ConversationHistory() if HISTORY_ENABLED else None
 
-# Function to encode image to base64
-def encode_image(image_path):
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode('utf-8')
+# Rate limits, retries and coalescing of concurrent view_world calls
+scheduler = VisionScheduler()
+tracing.register_gauge("vision_requests_queued", "Claude requests waiting for a slot.", lambda: scheduler.queued)
+tracing.register_gauge("vision_requests_in_flight", "Claude requests being sent.", lambda: scheduler.in_flight)
 
-async def request_claude_vision(image_path, prompt):
+async def post_messages(data: dict) -> str:
     """
-    Make an asynchronous API request to Claude with an image
-    
-    Args:
-        image_path (str): Path to the image file
-        prompt (str): Text prompt to send with the image
-        
-    Returns:
-        dict: The JSON response from Claude API
+    Sends one Messages API request and returns the response text.
+
+    Raises:
+        RetryableError: on 429, 5xx or a connection error.
+        VisionAPIError: on any other error response.
     """
-    # Encode the image
-    base64_image = encode_image(image_path)
-    
-    # API endpoint
-    url = "https://api.anthropic.com/v1/messages"
-    
-    # Headers for the request
+    import aiohttp
+
+    url = f"{http_clients.ANTHROPIC_BASE_URL}/v1/messages"
     headers = {
         "x-api-key": API_KEY,
         "anthropic-version": "2023-06-01",
         "content-type": "application/json"
     }
+
+    # Make the asynchronous request over the shared keep-alive connection pool
+    session = await http_clients.get_vision_session()
+    with tracing.span("claude.request") as span:
+        try:
+            async with session.post(url, headers=headers, json=data) as response:
+                span.add_bytes(response.content_length or 0)
+                try:
+                    response_json = await response.json(content_type=None)
+                except ValueError:
+                    response_json = {}
+                if response.status == 200:
+                    # Extract the assistant's response text
+                    return response_json["content"][0]["text"]
+
+                span.fail()
+                error = response_json.get("error") or {}
+                message = f"{response.status} {error.get('type', 'error')}: {error.get('message', response.reason)}"
+                print(f"Error: {message}", file=sys.stderr)
+                if response.status in RETRYABLE_STATUSES:
+                    raise RetryableError(message, response.status,
+                                         parse_retry_after(response.headers.get("retry-after")))
+                raise VisionAPIError(message, response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            span.fail()
+            raise RetryableError(f"{type(e).__name__}: {e}") from e
+
+async def request_claude_vision(frame, prompt, history: ConversationHistory = None):
+    """
+    Make an asynchronous API request to Claude with an image
     
+    Args:
+        frame (np.ndarray | dict): Captured camera frame, or {label: frame} to send several
+            cameras' frames together in one request
+        prompt (str): Text prompt to send with the image
+        history (ConversationHistory): Earlier turns to send along; this turn is added to it
+        
+    Returns:
+        str: Claude's description
+
+    Raises:
+        VisionAPIError: if the request failed, after retrying rate limits and server errors
+    """
+    frames = frame if isinstance(frame, dict) else None
+
+    # Serve repeated questions about an unchanged scene from the cache. Not within a conversation, even an
+    # empty one: earlier turns change the answer, and a cached answer would skip history.add below
+    image_hash = None
+    cache_query = f"{', '.join(frames)}\n{prompt}" if frames else prompt
+    if CACHE_ENABLED and history is None:
+        image_hash = frames_hash(list(frames.values())) if frames else frame_hash(frame)
+        cached_response = response_cache.get(image_hash, cache_query)
+        if cached_response is not None:
+            return cached_response
+
+    # Compress and encode the frame(s) in memory; several frames share one size budget
+    with tracing.span("image.encode") as span:
+        if frames:
+            encoded = dict(zip(frames, encode_frames(list(frames.values()))))
+        else:
+            encoded = {None: encode_frame(frame)}
+        span.add_bytes(sum(len(base64_image) for base64_image, _ in encoded.values()))
+    content = image_content(encoded, prompt)
+
     # Request body
     data = {
         "model": "claude-3-5-haiku-latest",  # Or use "claude-3-sonnet-20240229" or "claude-3-haiku-20240307"
         "max_tokens": 1000,
-        "system": "You are an accessibility assistant designed to help elderly or low-vision users understand their surroundings through a live camera feed. Given an image, describe only the most relevant and helpful parts of the scene for situational awareness, safety, and navigation. Prioritize objects like people, doors, signs, obstacles, and text. Keep your descriptions concise, factual, and easy to understand, using plain language. Avoid unnecessary details. Be direct and focus on what would matter most for a user trying to make sense of their immediate environment.",
-        "messages": [
+        "system": system_prompt(SYSTEM_PROMPT),
+        "messages": history.messages(content) if history is not None else [
             {
                 "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": "image/png",  # Change if using a different image format
-                            "data": base64_image
-                        }
-                    },
-                    {
-                        "type": "text",
-                        "text": prompt
-                    }
-                ]
+                "content": content
             }
         ]
     }
     
-    # Make the asynchronous request
-    async with aiohttp.ClientSession() as session:
-        async with session.post(url, headers=headers, json=data) as response:
-            response_json = await response.json()
-            
-            if response.status == 200:
-                # Extract the assistant's response text
-                assistant_message = response_json["content"][0]["text"]
-            else:
-                print(f"Error: {response.status}")
-                print(json.dumps(response_json, indent=4))
-            
-            return response_json["content"][0]["text"]
+    # Wait for a slot under the concurrency and rate limits; 429s and server errors are retried
+    assistant_message = await scheduler.run(lambda: post_messages(data))
+    if image_hash is not None:
+        response_cache.put(image_hash, cache_query, assistant_message)
+    if history is not None:
+        history.add(content, assistant_message)
+    return assistant_message
+
+@mcp.resource("stats://vision_cache")
+def vision_cache_stats() -> str:
+    """Hit/miss counters of the view_world response cache."""
+    return json.dumps(response_cache.stats())
+
+@mcp.resource("stats://conversation")
+def conversation_stats() -> str:
+    """Size of the view_world conversation history (empty unless VISION_HISTORY_ENABLED=1)."""
+    return json.dumps(history.stats() if history is not None else {"enabled": False})
+
+@mcp.resource("stats://scheduler")
+def scheduler_stats() -> str:
+    """Queue depth, queue wait, retries and coalesced calls of the Claude request scheduler."""
+    return json.dumps(scheduler.stats())
+
+@mcp.resource("metrics://tracing")
+def tracing_metrics() -> str:
+    """Per-stage latency histograms and byte/error counts in the Prometheus text format."""
+    return tracing.render_metrics()
+
+async def capture(cameras: tuple):
+    """Grabs the freshest frame(s) from the background grabbers without blocking the event loop."""
+    with tracing.span("camera.read"):
+        if len(cameras) == 1:
+            return await asyncio.to_thread(camera.read_frame, cameras[0])
+        frames, skew = await asyncio.to_thread(camera.read_synchronized, list(cameras))
+        print(f"Captured cameras {list(cameras)} within {skew * 1000:.0f} ms", file=sys.stderr)
+        return {f"Camera {index}": captured for index, captured in zip(cameras, frames)}
+
+async def look(cameras: tuple, query: str):
+    """Describes the cameras' current view; calls arriving together share one capture of the same cameras."""
+    frame = await scheduler.capture(cameras, lambda: capture(cameras))
+    return await request_claude_vision(frame, query, history)
 
 @mcp.tool()
-async def view_world(query: str):
+async def view_world(query: str, cameras: list[int] | None = None):
     """
     Tool endpoint that allows Claude to view the world. 
     Returns a description of what the camera see in the image.
@@ -102,21 +203,85 @@ async def view_world(query: str):
 
     Args:
         query (str): query involving the current view of the camera.
+        cameras (list[int]): camera IDs to look through at the same moment, e.g. [0, 2].
+            Defaults to all configured cameras; only configured cameras (CAMERA_INDICES) are accepted.
     """
-    cap = cv2.VideoCapture(0)  # Adjust the index if necessary
+    cameras = tuple(dict.fromkeys(cameras or camera.CAMERA_INDICES))
+    # Every index gets a grabber thread that keeps retrying its device, so arbitrary IDs must not get that far
+    unknown = [index for index in cameras if index not in camera.CAMERA_INDICES]
+    if unknown:
+        raise ValueError(f"Unknown camera IDs {unknown}; configured cameras are {camera.CAMERA_INDICES}")
+    # The same question about the same cameras already in flight is answered once for every caller
+    return await scheduler.ask((cameras, query), lambda: look(cameras, query))
 
-    print("SLEEPING NOW!")
-    time.sleep(1)
+def prune_watches():
+    """Forgets watches that finished (duration reached, too many failures) more than WATCH_RETENTION seconds ago."""
+    now = time.monotonic()
+    for watch_id, watcher in list(watches.items()):
+        if watcher.finished_at is not None and now - watcher.finished_at > WATCH_RETENTION:
+            del watches[watch_id]
 
-    ret, frame = cap.read()
-    if not ret:
-        raise RuntimeError("Failed to capture image from camera.")
+@mcp.tool()
+async def watch_world(query: str, threshold: float = WATCH_THRESHOLD, min_interval: float = WATCH_MIN_INTERVAL,
+                      duration: float = 3600):
+    """
+    Starts watching the camera continuously and describing the scene whenever it changes.
+    Use this instead of calling view_world repeatedly when the user wants to be told about changes.
+    Returns a watch ID; collect descriptions with watch_events and end the watch with stop_watch.
+
+    Args:
+        query (str): what to describe or look out for whenever the scene changes.
+        threshold (float): fraction of the image (0-1) that must change before a new description is made.
+        min_interval (float): minimum seconds between two descriptions.
+        duration (float): seconds after which the watch stops by itself.
+    """
+    prune_watches()
+    watcher = SceneWatcher(request_claude_vision, query, threshold=threshold,
+                           min_interval=min_interval, duration=duration).start()
+    watches[watcher.id] = watcher
+    return json.dumps({"watch_id": watcher.id})
+
+@mcp.tool()
+async def watch_events(watch_id: str, wait: float = 30, max_events: int = 10):
+    """
+    Returns the scene-change descriptions a watch has produced since the last call.
+    Waits up to `wait` seconds for the next change if none are pending.
+
+    Args:
+        watch_id (str): ID returned by watch_world.
+        wait (float): seconds to wait for a change.
+        max_events (int): maximum number of descriptions to return.
+    """
+    prune_watches()
+    watcher = watches.get(watch_id)
+    if watcher is None:
+        raise ValueError(f"Unknown watch ID: {watch_id}")
+    events = await watcher.next_events(max_events, wait if watcher.running else 0)
+    return json.dumps({"events": events, **watcher.stats()})
+
+@mcp.tool()
+async def stop_watch(watch_id: str):
+    """
+    Stops a watch started with watch_world and returns its final statistics.
+
+    Args:
+        watch_id (str): ID returned by watch_world.
+    """
+    watcher = watches.pop(watch_id, None)
+    if watcher is None:
+        raise ValueError(f"Unknown watch ID: {watch_id}")
+    watcher.stop()
+    return json.dumps(watcher.stats())
 
-    cv2.imwrite('scene.png', frame)
-    cap.release()
+def warm_up():
+    """Imports the heavy dependencies and starts the camera grabbers, so the first tool call does not wait for them."""
+    import aiohttp  # noqa: F401
+    import cv2  # noqa: F401
 
-    response = await request_claude_vision('scene.png', query)
-    return response
+    for index in camera.CAMERA_INDICES:
+        camera.get_camera(index)
 
 if __name__ == "__main__":
+    if WARM_UP:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
     mcp.run(transport="stdio")
@@ -0,0 +1,169 @@
+# scene_watch.py
+"""
+Background scene watches: a camera is sampled locally and only frames that differ
+enough from the last described one are sent to Claude. The motion checks import
+OpenCV when they first run rather than with the module.
+"""
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+import camera
+
+# --- Configuration ---
+# Fraction of thumbnail pixels that must change before a frame is sent to Claude
+WATCH_THRESHOLD = float(os.getenv("WATCH_THRESHOLD", "0.05"))
+# Per-pixel intensity change (0-255) that counts as "changed"
+WATCH_PIXEL_DELTA = int(os.getenv("WATCH_PIXEL_DELTA", "25"))
+# Seconds between local motion checks
+WATCH_SAMPLE_INTERVAL = float(os.getenv("WATCH_SAMPLE_INTERVAL", "0.5"))
+# Rate cap: minimum seconds between two frames sent to Claude
+WATCH_MIN_INTERVAL = float(os.getenv("WATCH_MIN_INTERVAL", "10"))
+# Undelivered events kept per watch; the oldest are dropped first
+WATCH_MAX_EVENTS = 100
+# Consecutive failed samples (camera or Claude errors) after which a watch gives up
+WATCH_MAX_FAILURES = int(os.getenv("WATCH_MAX_FAILURES", "5"))
+# Longest wait (seconds) between retries after failures; it doubles from sample_interval up to this
+WATCH_MAX_BACKOFF = float(os.getenv("WATCH_MAX_BACKOFF", "60"))
+# Finished watches are kept this long (seconds) so clients can still collect their last events
+WATCH_RETENTION = float(os.getenv("WATCH_RETENTION", "300"))
+
+THUMBNAIL_SIZE = (64, 48)
+
+
+def motion_thumbnail(frame):
+    """Shrinks a frame to a small blurred grayscale thumbnail used for change detection."""
+    import cv2
+
+    step = max(1, frame.shape[1] // (THUMBNAIL_SIZE[0] * 4))
+    small = cv2.resize(frame[::step, ::step], THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(small, (5, 5), 0)
+
+
+def motion_score(reference, thumbnail, pixel_delta: int = WATCH_PIXEL_DELTA) -> float:
+    """Returns the fraction of thumbnail pixels that differ from the reference by more than pixel_delta."""
+    import cv2
+
+    diff = cv2.absdiff(reference, thumbnail)
+    return cv2.countNonZero(cv2.threshold(diff, pixel_delta, 255, cv2.THRESH_BINARY)[1]) / diff.size
+
+
+class SceneWatcher:
+    """
+    Samples a camera continuously and describes the scene only when it changes.
+
+    Every sample is compared against the last frame that was sent to Claude. When
+    the motion score crosses the threshold, and at least min_interval seconds have
+    passed since the previous description, the frame is described and an event is
+    queued for the client to collect.
+    """
+
+    def __init__(self, describe, query: str, camera_index: int = camera.CAMERA_INDEX,
+                 threshold: float = WATCH_THRESHOLD, sample_interval: float = WATCH_SAMPLE_INTERVAL,
+                 min_interval: float = WATCH_MIN_INTERVAL, duration: float = None):
+        self.id = uuid.uuid4().hex[:8]
+        self.describe = describe
+        self.query = query
+        self.camera_index = camera_index
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.min_interval = min_interval
+        self.duration = duration
+
+        self.events = asyncio.Queue(maxsize=WATCH_MAX_EVENTS)
+        self.frames_sampled = 0
+        self.frames_sent = 0
+        self.dropped_events = 0
+        self.error = None
+        self.failures = 0  # consecutive failed samples
+        self.finished_at = None  # monotonic time the watch stopped
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def _publish(self, event: dict):
+        if self.events.full():
+            self.events.get_nowait()
+            self.dropped_events += 1
+        self.events.put_nowait(event)
+
+    async def run(self):
+        reference = None
+        last_sent = float("-inf")
+        started = time.monotonic()
+        try:
+            while self.duration is None or time.monotonic() - started < self.duration:
+                try:
+                    frame = await asyncio.to_thread(camera.read_frame, self.camera_index)
+                    thumbnail = motion_thumbnail(frame)
+                    self.frames_sampled += 1
+
+                    # The first frame is always described so the client gets a baseline
+                    score = 1.0 if reference is None else motion_score(reference, thumbnail)
+                    now = time.monotonic()
+                    if score >= self.threshold and now - last_sent >= self.min_interval:
+                        last_sent = now
+                        self.frames_sent += 1
+                        description = await self.describe(frame, self.query)
+                        # Only a described frame becomes the reference, so a failed one is retried
+                        reference = thumbnail
+                        self._publish({
+                            "time": time.time(),
+                            "score": round(score, 4),
+                            "description": description,
+                        })
+                    self.failures = 0
+                except Exception as e:
+                    # One camera timeout or failed request should not end a watch meant to run all day
+                    self.failures += 1
+                    self.error = str(e)
+                    self._publish({"time": time.time(), "error": self.error})
+                    if self.failures >= WATCH_MAX_FAILURES:
+                        print(f"Watch {self.id} stopped after {self.failures} failures: {e}", file=sys.stderr)
+                        return
+                    backoff = min(WATCH_MAX_BACKOFF, self.sample_interval * 2 ** self.failures)
+                    print(f"Watch {self.id} failed ({e}), retrying in {backoff:.1f}s", file=sys.stderr)
+                    await asyncio.sleep(backoff)
+                    continue
+
+                await asyncio.sleep(self.sample_interval)
+        finally:
+            self.finished_at = time.monotonic()
+
+    async def next_events(self, max_events: int, wait: float) -> list:
+        """Returns up to max_events queued events, waiting up to `wait` seconds for the first one."""
+        events = []
+        if self.events.empty():
+            try:
+                events.append(await asyncio.wait_for(self.events.get(), timeout=max(wait, 0.001)))
+            except asyncio.TimeoutError:
+                return events
+        while len(events) < max_events and not self.events.empty():
+            events.append(self.events.get_nowait())
+        return events
+
+    def stats(self) -> dict:
+        return {
+            "watch_id": self.id,
+            "running": self.running,
+            "frames_sampled": self.frames_sampled,
+            "frames_sent": self.frames_sent,
+            "pending_events": self.events.qsize(),
+            "dropped_events": self.dropped_events,
+            "failures": self.failures,
+            "error": self.error,
+        }
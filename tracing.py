@@ -0,0 +1,192 @@
+# tracing.py
+"""
+Lightweight per-stage latency tracing.
+
+Each stage of a request (recording, transcription, camera read, encoding, the
+Claude call, speech synthesis, evaluations...) is timed with `span`:
+
+    with tracing.span("claude.request") as s:
+        ...
+        s.add_bytes(len(payload))
+
+Spans feed process-wide histograms, byte counters and error counters, rendered
+in the Prometheus text format by `render_metrics`. Inside `interaction()`, the
+spans of one voice-loop turn are also collected for a one-line summary.
+Recording a span costs two clock reads and one short lock, so tracing can stay on.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# --- Configuration ---
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+METRIC_PREFIX = "wall_e"
+
+# Histogram bucket upper bounds in seconds, from fast in-memory stages to multi-minute evaluations
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+
+
+class StageStats:
+    """Latency histogram plus byte and error counts for one stage."""
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.total_seconds = 0.0
+        self.bytes = 0
+        self.errors = 0
+
+    def observe(self, seconds: float, num_bytes: int, error: bool):
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total_seconds += seconds
+        self.bytes += num_bytes
+        self.errors += error
+
+
+class Span:
+    """One timed stage; use `add_bytes` for payload sizes and `fail` for errors that are not exceptions."""
+
+    __slots__ = ("name", "started", "seconds", "bytes", "error")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+        self.bytes = 0
+        self.error = False
+
+    def add_bytes(self, num_bytes: int):
+        self.bytes += num_bytes
+
+    def fail(self):
+        self.error = True
+
+
+class Interaction:
+    """Spans recorded during one turn of the voice loop."""
+
+    def __init__(self, number: int):
+        self.number = number
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def summary(self) -> str:
+        """e.g. `interaction 3: 4.21s | stt.record 2.10s | stt.transcribe 0.80s 45.1KB | claude.request ERR 1.10s`"""
+        totals = {}
+        for span in self.spans:
+            seconds, num_bytes, errors = totals.get(span.name, (0.0, 0, 0))
+            totals[span.name] = (seconds + span.seconds, num_bytes + span.bytes, errors + span.error)
+        parts = [f"interaction {self.number}: {time.perf_counter() - self.started:.2f}s"]
+        for name, (seconds, num_bytes, errors) in totals.items():
+            part = f"{name}{' ERR' if errors else ''} {seconds:.2f}s"
+            if num_bytes:
+                part += f" {num_bytes / 1024:.1f}KB"
+            parts.append(part)
+        return " | ".join(parts)
+
+
+class Tracer:
+    """Process-wide registry of stage statistics."""
+
+    def __init__(self, enabled: bool = TRACING_ENABLED):
+        self.enabled = enabled
+        self._stages = {}
+        self._gauges = {}  # name -> (help text, callable returning the current value)
+        self._lock = threading.Lock()
+        self._interaction = None
+        self._interactions = 0
+
+    def record(self, name: str, seconds: float, num_bytes: int = 0, error: bool = False):
+        """Records a stage timed elsewhere (e.g. from job timestamps)."""
+        span = Span(name)
+        span.seconds, span.bytes, span.error = seconds, num_bytes, error
+        self._finish(span)
+
+    def _finish(self, span: Span):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._stages.get(span.name)
+            if stats is None:
+                stats = self._stages[span.name] = StageStats()
+            stats.observe(span.seconds, span.bytes, span.error)
+        # Spans from worker threads (speech playback...) count towards the active interaction too
+        interaction = self._interaction
+        if interaction is not None:
+            interaction.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str):
+        span = Span(name)
+        try:
+            yield span
+        except GeneratorExit:
+            raise  # a consumer stopping early is not a failure
+        except BaseException:
+            span.error = True
+            raise
+        finally:
+            span.seconds = time.perf_counter() - span.started
+            self._finish(span)
+
+    @contextmanager
+    def interaction(self):
+        """Collects the spans of one voice-loop turn; print `.summary()` at the end."""
+        self._interactions += 1
+        interaction = self._interaction = Interaction(self._interactions)
+        try:
+            yield interaction
+        finally:
+            self._interaction = None
+
+    def register_gauge(self, name: str, help_text: str, read):
+        """Adds a value read at scrape time (e.g. queue depth) to the metrics output."""
+        self._gauges[name] = (help_text, read)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                name: {
+                    "count": stats.count,
+                    "seconds": stats.total_seconds,
+                    "bytes": stats.bytes,
+                    "errors": stats.errors,
+                    "buckets": list(stats.bucket_counts),
+                }
+                for name, stats in self._stages.items()
+            }
+
+    def render_metrics(self) -> str:
+        """All stage statistics and gauges in the Prometheus text exposition format."""
+        stages = self.snapshot()
+        duration = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines = [f"# HELP {duration} Time spent per stage.", f"# TYPE {duration} histogram"]
+        for name, stats in sorted(stages.items()):
+            cumulative = 0
+            for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), stats["buckets"]):
+                cumulative += count
+                lines.append(f'{duration}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{duration}_sum{{stage="{name}"}} {stats["seconds"]:.6f}')
+            lines.append(f'{duration}_count{{stage="{name}"}} {stats["count"]}')
+
+        for metric, key, help_text in (("stage_bytes_total", "bytes", "Payload bytes per stage."),
+                                       ("stage_errors_total", "errors", "Failed spans per stage.")):
+            metric = f"{METRIC_PREFIX}_{metric}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{stage="{name}"}} {stats[key]}' for name, stats in sorted(stages.items())]
+
+        for name, (help_text, read) in sorted(self._gauges.items()):
+            metric = f"{METRIC_PREFIX}_{name}"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge", f"{metric} {read()}"]
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer()
+span = tracer.span
+record = tracer.record
+interaction = tracer.interaction
+register_gauge = tracer.register_gauge
+render_metrics = tracer.render_metrics
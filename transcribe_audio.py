@@ -1,33 +1,149 @@
 # transcribe_audio.py
-
-import sounddevice as sd
-import scipy.io.wavfile as wav
-import tempfile
+"""
+Speech-to-text for the voice loop: a recording uploaded to AssemblyAI, or audio
+streamed to its real-time API while the user speaks. sounddevice (PortAudio),
+the websocket client and audio_prep (scipy) are imported by the functions that
+record, stream or compress, so importing this module stays cheap.
+"""
 import os
-import assemblyai as aai
 import time
+import json
+import base64
+import threading
 import numpy as np
+from io import BytesIO
 from dotenv import load_dotenv
+import tracing
 
 load_dotenv()
 
 ASSEMBLYAI_API_KEY = os.getenv("ASSEMBLYAI_API_KEY")
+ASSEMBLYAI_BASE_URL = os.getenv("ASSEMBLYAI_BASE_URL")  # Optional override, e.g. a local stand-in
 
 # --- Configuration ---
 SAMPLE_RATE = 44100  # Standard sample rate for audio
+MAX_RECORDING_SECONDS = 120  # Capacity of the recording ring buffer; older audio is dropped
+
+# Streaming (real-time) transcription
+ASSEMBLYAI_REALTIME_URL = os.getenv("ASSEMBLYAI_REALTIME_URL", "wss://api.assemblyai.com/v2/realtime/ws")
+STREAM_SAMPLE_RATE = 16000  # Real-time API expects 16-bit mono PCM at this rate
+STREAM_BLOCK_MS = 100  # Audio sent per websocket message (API accepts 50-1000 ms)
+MAX_UTTERANCE_SECONDS = 30
+
+# Voice activity detection
+VAD_THRESHOLD = int(os.getenv("VAD_THRESHOLD", "500"))  # int16 RMS that counts as speech
+VAD_MIN_SPEECH_MS = 200  # Speech needed before an utterance is considered started
+VAD_SILENCE_MS = int(os.getenv("VAD_SILENCE_MS", "800"))  # Trailing silence that ends the utterance
+
+class AudioRingBuffer:
+    """
+    Preallocated FIFO of int16 samples shared between the audio callback and a reader.
+
+    Memory stays fixed however long a session runs: when the buffer is full the
+    oldest samples are overwritten and counted as an overrun.
+    """
+
+    def __init__(self, capacity: int):
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self._capacity = capacity
+        self._start = 0
+        self._size = 0
+        self._cond = threading.Condition()
+        self.overruns = 0
+
+    def write(self, samples: np.ndarray):
+        samples = samples.reshape(-1)
+        with self._cond:
+            if len(samples) >= self._capacity:
+                self.overruns += self._size + len(samples) - self._capacity
+                samples = samples[-self._capacity:]
+                self._start, self._size = 0, 0
+            overflow = self._size + len(samples) - self._capacity
+            if overflow > 0:
+                self._start = (self._start + overflow) % self._capacity
+                self._size -= overflow
+                self.overruns += overflow
+            end = (self._start + self._size) % self._capacity
+            first = min(len(samples), self._capacity - end)
+            self._data[end:end + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self._size += len(samples)
+            self._cond.notify_all()
+
+    def read(self, max_samples: int = None, min_samples: int = 0, timeout: float = None) -> np.ndarray:
+        """Removes and returns up to max_samples samples, waiting up to timeout for min_samples."""
+        with self._cond:
+            if min_samples:
+                self._cond.wait_for(lambda: self._size >= min_samples, timeout=timeout)
+            count = self._size if max_samples is None else min(max_samples, self._size)
+            indices = (self._start + np.arange(count)) % self._capacity
+            samples = self._data[indices]
+            self._start = (self._start + count) % self._capacity
+            self._size -= count
+            return samples
+
+    def clear(self):
+        with self._cond:
+            self._start, self._size = 0, 0
+            self.overruns = 0
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def __len__(self):
+        return self._size
+
+class VoiceActivityDetector:
+    """Energy-based end-of-utterance detector with an adaptive noise floor."""
 
-recorded_chunks = [] # List to store audio chunks
+    def __init__(self, sample_rate: int, threshold: int = VAD_THRESHOLD,
+                 min_speech_ms: int = VAD_MIN_SPEECH_MS, silence_ms: int = VAD_SILENCE_MS):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.min_speech_ms = min_speech_ms
+        self.silence_ms = silence_ms
+        self.noise_floor = 0.0
+        self.speech_ms = 0.0
+        self.silence_run_ms = 0.0
+        self.speaking = False
+
+    def process(self, block: np.ndarray) -> bool:
+        """Feeds one block of samples. Returns True once speech has started and then stopped."""
+        block_ms = 1000 * len(block) / self.sample_rate
+        rms = float(np.sqrt(np.mean(block.astype(np.float32) ** 2))) if len(block) else 0.0
+        is_speech = rms > max(self.threshold, 3 * self.noise_floor)
+
+        if not is_speech:
+            # Track background noise so a noisy room does not count as speech
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+
+        if is_speech:
+            self.speech_ms += block_ms
+            self.silence_run_ms = 0.0
+            if self.speech_ms >= self.min_speech_ms:
+                self.speaking = True
+        elif self.speaking:
+            self.silence_run_ms += block_ms
+
+        return self.speaking and self.silence_run_ms >= self.silence_ms
+
+recording_buffer = AudioRingBuffer(MAX_RECORDING_SECONDS * SAMPLE_RATE)
 
 def audio_callback(indata, frames, time, status):
     """This is called (from a separate thread) for each audio block."""
     if status:
         print(status, flush=True)
-    recorded_chunks.append(indata.copy())
+    recording_buffer.write(indata[:, 0])
 
 def record_audio_manual(sample_rate: int) -> np.ndarray:
     """Records audio manually until Enter is pressed."""
-    global recorded_chunks
-    recorded_chunks = [] # Reset chunks list
+    import sounddevice as sd
+
+    global recording_buffer
+    if recording_buffer.capacity != MAX_RECORDING_SECONDS * sample_rate:
+        recording_buffer = AudioRingBuffer(MAX_RECORDING_SECONDS * sample_rate)
+    recording_buffer.clear()
 
     print("Starting recording... Press Enter to stop.")
     try:
@@ -35,42 +151,32 @@ def record_audio_manual(sample_rate: int) -> np.ndarray:
             input() # Wait for user to press Enter
         print("Recording finished.")
 
-        if not recorded_chunks:
+        if not len(recording_buffer):
             print("Warning: No audio data recorded.")
             return np.array([], dtype='int16')
 
-        # Concatenate all recorded chunks
-        recording = np.concatenate(recorded_chunks, axis=0)
-        return recording
+        if recording_buffer.overruns:
+            print(f"Warning: Recording longer than {MAX_RECORDING_SECONDS}s, kept the last {MAX_RECORDING_SECONDS}s.")
+        return recording_buffer.read()
 
     except Exception as e:
         print(f"Error during recording: {e}")
         return np.array([], dtype='int16') # Return empty array on error
 
-def save_temp_wav(recording: np.ndarray, sample_rate: int) -> str:
-    """Saves the recorded audio to a temporary WAV file."""
-    # Check if recording is empty
-    if recording.size == 0:
-        print("Error: Cannot save empty recording.")
-        return None
-    try:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_file:
-            wav.write(temp_file.name, sample_rate, recording)
-            # print(f"Audio saved temporarily to: {temp_file.name}")
-            return temp_file.name
-    except Exception as e:
-        print(f"Error saving temporary WAV file: {e}")
-        return None
-
-def transcribe_with_assemblyai(file_path: str, api_key: str) -> str:
-    """Transcribes the audio file using AssemblyAI."""
+def transcribe_with_assemblyai(file_path, api_key: str) -> str:
+    """Transcribes the audio using AssemblyAI. Accepts a file path or a binary file-like object."""
     if not api_key or api_key == "YOUR_ASSEMBLYAI_API_KEY":
         print("Error: AssemblyAI API key not provided or is a placeholder.")
         print("Please provide your key via the --api-key argument or set the ASSEMBLYAI_API_KEY environment variable.")
         return None
 
+    # Imported on first use: only the batch path needs the SDK, streaming talks to the websocket directly
+    import assemblyai as aai
+
     # print("Configuring AssemblyAI...")
     aai.settings.api_key = api_key
+    if ASSEMBLYAI_BASE_URL:
+        aai.settings.base_url = ASSEMBLYAI_BASE_URL
 
     try:
         # print(f"Uploading {file_path} to AssemblyAI for transcription...")
@@ -103,6 +209,102 @@ def transcribe_with_assemblyai(file_path: str, api_key: str) -> str:
         print(f"An error occurred during transcription: {e}")
         return None
 
+def stream_transcribe(blocks, sample_rate: int = STREAM_SAMPLE_RATE, api_key: str = ASSEMBLYAI_API_KEY,
+                      url: str = ASSEMBLYAI_REALTIME_URL, stats: dict = None) -> str:
+    """
+    Streams audio blocks to the AssemblyAI real-time API as they arrive and stops at end of speech.
+
+    Args:
+        blocks (Iterable[np.ndarray]): int16 mono audio blocks, typically STREAM_BLOCK_MS long.
+        sample_rate (int): Sample rate of the blocks.
+        api_key (str): AssemblyAI API key.
+        url (str): Real-time websocket endpoint (point it at a local stand-in to measure latency).
+        stats (dict): If given, filled with the audio duration sent and the end-of-speech latency
+            (None if no final transcript arrived after the session was terminated).
+
+    Returns:
+        str: The final transcript, or None if nothing was recognized.
+    """
+    from websockets.sync.client import connect
+
+    vad = VoiceActivityDetector(sample_rate)
+    final_texts = []
+    last_final_time = None
+    speech_end_time = None
+    terminate_time = None
+
+    with connect(f"{url}?sample_rate={sample_rate}", additional_headers={"Authorization": api_key or ""}) as ws:
+        def receive():
+            nonlocal last_final_time
+            try:
+                for raw_message in ws:
+                    message = json.loads(raw_message)
+                    message_type = message.get("message_type")
+                    if message_type == "FinalTranscript" and message.get("text"):
+                        final_texts.append(message["text"])
+                        last_final_time = time.perf_counter()
+                    elif message_type == "SessionTerminated":
+                        break
+                    elif "error" in message:
+                        print(f"Real-time transcription error: {message['error']}")
+                        break
+            except Exception as e:
+                print(f"Real-time transcription connection closed: {e}")
+
+        receiver = threading.Thread(target=receive, daemon=True)
+        receiver.start()
+
+        started = time.perf_counter()
+        samples_sent = 0
+        for block in blocks:
+            samples_sent += len(block)
+            ws.send(json.dumps({"audio_data": base64.b64encode(block.tobytes()).decode("utf-8")}))
+            if vad.process(block):
+                speech_end_time = time.perf_counter()
+                break
+            if time.perf_counter() - started > MAX_UTTERANCE_SECONDS:
+                print(f"Utterance exceeded {MAX_UTTERANCE_SECONDS}s, stopping.")
+                break
+        if speech_end_time is None:
+            speech_end_time = time.perf_counter()
+
+        # Ask the server to flush the remaining audio as a final transcript
+        terminate_time = time.perf_counter()
+        ws.send(json.dumps({"terminate_session": True}))
+        receiver.join(timeout=10)
+
+    if not final_texts:
+        return None
+    # A final received before terminate_session was sent says nothing about how long
+    # finalizing the utterance took (and would come out negative)
+    latency = None
+    if last_final_time is not None and last_final_time >= terminate_time:
+        latency = last_final_time - speech_end_time
+        print(f"End of speech to transcript: {latency * 1000:.0f} ms")
+        tracing.record("stt.finalize", latency, num_bytes=samples_sent * 2)
+    if stats is not None:
+        stats["audio_seconds"] = samples_sent / sample_rate
+        stats["end_of_speech_latency"] = latency
+    return " ".join(final_texts)
+
+def microphone_blocks(sample_rate: int = STREAM_SAMPLE_RATE, block_ms: int = STREAM_BLOCK_MS):
+    """Yields fixed-size int16 blocks from the microphone, buffered through a ring buffer."""
+    import sounddevice as sd
+
+    block_size = sample_rate * block_ms // 1000
+    buffer = AudioRingBuffer(10 * sample_rate)
+
+    def callback(indata, frames, time_info, status):
+        if status:
+            print(status, flush=True)
+        buffer.write(indata[:, 0])
+
+    with sd.InputStream(samplerate=sample_rate, channels=1, dtype='int16', blocksize=block_size, callback=callback):
+        while True:
+            block = buffer.read(block_size, min_samples=block_size, timeout=1.0)
+            if len(block):
+                yield block
+
 def save_transcript_to_file(text: str, filename: str):
     """Saves the provided text to a file."""
     try:
@@ -112,20 +314,56 @@ def save_transcript_to_file(text: str, filename: str):
     except Exception as e:
         print(f"Error saving transcript to file: {e}")
 
-def run_stt():
-    temp_file_path = None
+def run_stt_streaming():
+    """Transcribes one utterance from the microphone while it is spoken, ending on silence."""
+    print("Listening... (stops automatically when you finish speaking)")
+    blocks = microphone_blocks()
+    try:
+        with tracing.span("stt.stream") as span:
+            transcript_text = stream_transcribe(blocks)
+            if not transcript_text:
+                span.fail()
+    except Exception as e:
+        print(f"An error occurred during streaming transcription: {e}")
+        return None
+    finally:
+        # Closing the generator closes the microphone stream
+        blocks.close()
+
+    if transcript_text:
+        print("\n--- Transcription ---")
+        print(transcript_text)
+    else:
+        print("\nNo transcription result received.")
+    return transcript_text
+
+def run_stt(streaming: bool = False):
+    from audio_prep import prepare_audio
+
+    if streaming:
+        return run_stt_streaming()
+
     transcript_text = None
     try:
         # 1. Record Audio Manually
-        audio_data = record_audio_manual(SAMPLE_RATE)
+        with tracing.span("stt.record") as span:
+            audio_data = record_audio_manual(SAMPLE_RATE)
+            span.add_bytes(audio_data.nbytes)
+        if audio_data.size == 0:
+            raise Exception("No audio recorded.")
 
-        # 2. Save Temporarily
-        temp_file_path = save_temp_wav(audio_data, SAMPLE_RATE)
-        if not temp_file_path:
-            raise Exception("Failed to save temporary audio file.")
+        # 2. Resample to the speech rate and compress in memory
+        with tracing.span("stt.encode") as span:
+            prepared = prepare_audio(audio_data, SAMPLE_RATE)
+            span.add_bytes(prepared.num_bytes)
 
-        # 3. Transcribe
-        transcript_text = transcribe_with_assemblyai(temp_file_path, ASSEMBLYAI_API_KEY)
+        # 3. Transcribe, uploading straight from the buffer
+        with tracing.span("stt.transcribe") as span:
+            transcript_text = transcribe_with_assemblyai(BytesIO(prepared.data), ASSEMBLYAI_API_KEY)
+            span.add_bytes(prepared.num_bytes)
+            if not transcript_text:
+                span.fail()
+        print(f"Uploaded {prepared.summary()}; transcription took {span.seconds:.2f}s")
 
         # 4. Print Result
         if transcript_text:
@@ -137,9 +375,5 @@ def run_stt():
     except Exception as e:
         print(f"An overall error occurred: {e}")
     finally:
-        # 5. Clean up temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            # print(f"Cleaning up temporary file: {temp_file_path}")
-            os.remove(temp_file_path)
         if transcript_text:
             return transcript_text
\ No newline at end of file
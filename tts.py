@@ -0,0 +1,166 @@
+# tts.py
+"""
+In-memory speech synthesis and playback with a phrase cache. numpy, the engines'
+libraries and sounddevice (which loads PortAudio) are imported by the methods
+that synthesize or play, so importing this module needs none of them.
+"""
+import abc
+import os
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import tracing
+
+# --- Configuration ---
+# "gtts" (online, Google) or "espeak" (offline, needs espeak-ng or espeak on the PATH)
+TTS_ENGINE = os.getenv("TTS_ENGINE", "gtts").lower()
+TTS_LANGUAGE = os.getenv("TTS_LANGUAGE", "en")
+# Number of synthesized phrases kept in memory
+TTS_CACHE_SIZE = int(os.getenv("TTS_CACHE_SIZE", "64"))
+
+
+class TTSEngine(abc.ABC):
+    """Base class for speech synthesizers that render text to in-memory PCM."""
+    name = "base"
+
+    @abc.abstractmethod
+    def synthesize(self, text: str):
+        """
+        Renders text to audio.
+
+        Returns:
+            tuple: (samples, sample_rate) with samples as a mono int16 numpy array.
+        """
+
+
+class GTTSEngine(TTSEngine):
+    """Google Translate TTS. Needs network access; the mp3 is decoded in memory."""
+    name = "gtts"
+
+    def __init__(self, language: str = TTS_LANGUAGE):
+        self.language = language
+
+    def synthesize(self, text: str):
+        import miniaudio
+        import numpy as np
+        from gtts import gTTS
+
+        mp3_buffer = BytesIO()
+        gTTS(text, lang=self.language).write_to_fp(mp3_buffer)
+        decoded = miniaudio.decode(mp3_buffer.getvalue(), output_format=miniaudio.SampleFormat.SIGNED16,
+                                   nchannels=1)
+        return np.frombuffer(decoded.samples, dtype=np.int16), decoded.sample_rate
+
+
+class EspeakEngine(TTSEngine):
+    """Offline synthesis with espeak-ng (or espeak); the WAV is read from its stdout."""
+    name = "espeak"
+
+    def __init__(self, language: str = TTS_LANGUAGE, executable: str = None):
+        self.language = language
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def synthesize(self, text: str):
+        import numpy as np
+        import scipy.io.wavfile as wav
+
+        if not self.executable:
+            raise RuntimeError("espeak-ng/espeak not found. Install it or use TTS_ENGINE=gtts.")
+        result = subprocess.run([self.executable, "--stdout", "-v", self.language, text],
+                                capture_output=True, check=True)
+        sample_rate, samples = wav.read(BytesIO(result.stdout))
+        return samples.astype(np.int16, copy=False), sample_rate
+
+
+ENGINES = {
+    GTTSEngine.name: GTTSEngine,
+    EspeakEngine.name: EspeakEngine,
+}
+
+
+class TextToSpeech:
+    """
+    Synthesizes and plays speech without temporary files.
+
+    Rendered audio is kept in a bounded LRU cache so repeated phrases (greetings,
+    error messages, frequent answers) play back immediately. If the primary
+    engine fails, the fallback engine is tried.
+    """
+
+    def __init__(self, engine: TTSEngine, fallback: TTSEngine = None, cache_size: int = TTS_CACHE_SIZE):
+        self.engine = engine
+        self.fallback = fallback
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()  # (engine name, text) -> (samples, sample_rate)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def synthesize(self, text: str):
+        """Returns (samples, sample_rate) for the text, from the cache when possible."""
+        key = (self.engine.name, " ".join(text.split()))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return self._cache[key]
+            self.misses += 1
+
+        with tracing.span("tts.synthesize") as span:
+            try:
+                audio = self.engine.synthesize(text)
+            except Exception as e:
+                if self.fallback is None:
+                    raise
+                print(f"{self.engine.name} synthesis failed ({e}), falling back to {self.fallback.name}.")
+                span.fail()
+                # Fallback audio is not cached, so the primary engine is retried next time
+                try:
+                    return self.fallback.synthesize(text)
+                except Exception as fallback_error:
+                    # Keep the primary engine's failure in the traceback, not just the fallback's
+                    raise fallback_error from e
+            span.add_bytes(audio[0].nbytes)
+
+        with self._lock:
+            self._cache[key] = audio
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return audio
+
+    def preload(self, phrases):
+        """Synthesizes phrases ahead of time so their first use is instant."""
+        for phrase in phrases:
+            try:
+                self.synthesize(phrase)
+            except Exception as e:
+                print(f"Could not preload phrase {phrase!r}: {e}")
+
+    def play(self, audio):
+        """Plays (samples, sample_rate) on the default output device and waits until it finishes."""
+        import sounddevice as sd
+
+        samples, sample_rate = audio
+        with tracing.span("tts.playback"):
+            sd.play(samples, sample_rate)
+            sd.wait()
+
+    def speak(self, text: str):
+        try:
+            self.play(self.synthesize(text))
+        except Exception as e:
+            print(f"Error speaking text: {e}")
+
+
+def create_tts(engine_name: str = TTS_ENGINE) -> TextToSpeech:
+    """Builds a TextToSpeech for the named engine, with the other engine as fallback."""
+    try:
+        engine_class = ENGINES[engine_name]
+    except KeyError:
+        raise ValueError(f"Unknown TTS engine: {engine_name} (choose from {', '.join(ENGINES)})")
+    fallback_class = next(cls for name, cls in ENGINES.items() if name != engine_name)
+    return TextToSpeech(engine_class(), fallback=fallback_class())
@@ -0,0 +1,146 @@
+# vision_cache.py
+"""
+Response cache keyed by perceptual image hashes, so repeated questions about an
+unchanged scene are answered without a request. The hash functions import OpenCV
+on their first call.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# --- Configuration ---
+CACHE_ENABLED = os.getenv("VISION_CACHE_ENABLED", "1") != "0"
+CACHE_SIZE = int(os.getenv("VISION_CACHE_SIZE", "128"))
+# Seconds a cached description stays valid, even if the scene looks unchanged
+CACHE_TTL = float(os.getenv("VISION_CACHE_TTL", "30"))
+# Frames whose 64-bit hashes differ in at most this many bits count as the same scene
+CACHE_MAX_DISTANCE = int(os.getenv("VISION_CACHE_MAX_DISTANCE", "4"))
+
+HASH_SIZE = 8
+
+
+def frame_hash(frame, hash_size: int = HASH_SIZE) -> int:
+    """
+    Computes a difference hash (dHash) of a BGR or grayscale frame.
+
+    The frame is shrunk to (hash_size + 1) x hash_size and each bit records whether
+    a pixel is brighter than its right neighbour, so small noise, exposure drift
+    and compression artefacts leave the hash (nearly) unchanged.
+    """
+    import cv2
+
+    # Subsample before resizing so hashing a full-resolution frame stays well under a millisecond
+    step = max(1, min(frame.shape[0], frame.shape[1]) // (hash_size * 8))
+    small = cv2.resize(frame[::step, ::step], (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def frames_hash(frames: list, hash_size: int = HASH_SIZE) -> int:
+    """
+    Combines the hashes of several frames (one per camera) into one value.
+    Bit distances add up, so the cache's max_distance applies to the whole set.
+    """
+    value = 0
+    for frame in frames:
+        value = (value << (hash_size * hash_size)) | frame_hash(frame, hash_size)
+    return value
+
+
+def image_file_hash(image_path: str):
+    """Hashes an image file, decoding it at reduced resolution. Returns None if it cannot be read."""
+    import cv2
+    small = cv2.imread(image_path, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if small is None:
+        return None
+    return frame_hash(small)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases the query and collapses punctuation and whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+class VisionCache:
+    """
+    LRU cache of Claude scene descriptions keyed on (normalized query, frame hash).
+
+    A lookup hits when an entry with the same query has a frame hash within
+    max_distance bits and is younger than ttl seconds.
+    """
+
+    def __init__(self, max_entries: int = CACHE_SIZE, ttl: float = CACHE_TTL,
+                 max_distance: int = CACHE_MAX_DISTANCE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_distance = max_distance
+
+        self._entries = OrderedDict()  # (query, hash) -> (response, created_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, image_hash: int, query: str):
+        """Returns the cached response for a similar frame and the same query, or None."""
+        query = normalize_query(query)
+        now = time.monotonic()
+        with self._lock:
+            best_key, best_distance = None, None
+            for key, (_, created_at) in list(self._entries.items()):
+                if now - created_at > self.ttl:
+                    del self._entries[key]
+                    self.expirations += 1
+                    continue
+                if key[0] != query:
+                    continue
+                distance = (key[1] ^ image_hash).bit_count()
+                if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                    best_key, best_distance = key, distance
+                    if distance == 0:
+                        break
+
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key][0]
+
+    def put(self, image_hash: int, query: str, response: str):
+        """Stores a response, evicting the least recently used entries beyond the size cap."""
+        key = (normalize_query(query), image_hash)
+        with self._lock:
+            self._entries[key] = (response, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# Shared cache used by both view_world implementations
+response_cache = VisionCache()
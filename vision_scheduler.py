@@ -0,0 +1,250 @@
+# vision_scheduler.py
+"""
+Scheduling for concurrent view_world calls: concurrent captures of the same
+cameras share one frame, identical questions in flight share one request, and
+Messages API calls are bounded by a concurrency limit and a token bucket and
+retried on 429/5xx with jittered exponential backoff that honours retry-after.
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import deque
+
+import tracing
+
+# --- Configuration ---
+# A capture finished less than this many seconds ago is handed to new callers instead of capturing again
+COALESCE_WINDOW = float(os.getenv("VISION_COALESCE_WINDOW", "0.1"))
+# Messages API requests allowed in flight at the same time
+MAX_CONCURRENT_REQUESTS = int(os.getenv("VISION_MAX_CONCURRENT_REQUESTS", "4"))
+# Sustained requests per second and burst size of the token bucket (rate 0 disables it)
+RATE_LIMIT = float(os.getenv("VISION_RATE_LIMIT", "0.8"))
+RATE_BURST = int(os.getenv("VISION_RATE_BURST", "5"))
+# Retries of a 429/5xx or connection error, with full-jitter backoff between BACKOFF_BASE and BACKOFF_MAX seconds
+MAX_RETRIES = int(os.getenv("VISION_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("VISION_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("VISION_BACKOFF_MAX", "30"))
+
+# 529 is the API's "overloaded" status
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504, 529}
+# Queue waits kept for the percentiles in stats()
+WAIT_WINDOW = 200
+
+
+class VisionAPIError(Exception):
+    """A Messages API request failed for good."""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+class RetryableError(VisionAPIError):
+    """A request failed in a way worth retrying (rate limit, overload, server or connection error)."""
+
+    def __init__(self, message: str, status: int = None, retry_after: float = None):
+        super().__init__(message, status)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value) -> float:
+    """Seconds from a retry-after header (delta-seconds form), or None."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: float = None, base: float = BACKOFF_BASE,
+                  maximum: float = BACKOFF_MAX) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (0-based), never shorter than retry-after."""
+    delay = random.uniform(0, min(maximum, base * 2 ** attempt))
+    if retry_after is not None:
+        # Up to 20% on top keeps callers told the same retry-after from returning in lockstep
+        delay = max(delay, retry_after * random.uniform(1.0, 1.2))
+    return delay
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `burst`."""
+
+    def __init__(self, rate: float = RATE_LIMIT, burst: int = RATE_BURST):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # Waiters queue on the lock, so tokens are handed out first come, first served
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time: callers arriving while it runs, or
+    within `reuse` seconds after it succeeded, get the same result.
+    """
+
+    def __init__(self, reuse: float = 0.0):
+        self.reuse = reuse
+        self.shared = 0  # callers served by another caller's call
+        self._calls = {}  # key -> (task, finished_at or None)
+
+    async def do(self, key, factory):
+        """Returns the result of `factory()`, or of the call already running (or just finished) for `key`."""
+        entry = self._calls.get(key)
+        if entry is not None:
+            task, finished_at = entry
+            if finished_at is None or time.monotonic() - finished_at <= self.reuse:
+                self.shared += 1
+                # Shielded, so a caller giving up does not cancel the call for the others
+                return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(factory())
+        self._calls[key] = (task, None)
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key, task):
+        if self._calls.get(key, (None,))[0] is not task:
+            return
+        if task.cancelled() or task.exception() is not None or self.reuse <= 0:
+            del self._calls[key]
+            return
+        self._calls[key] = (task, time.monotonic())
+        asyncio.get_running_loop().call_later(self.reuse, self._expire, key, task)
+
+    def _expire(self, key, task):
+        if self._calls.get(key, (None,))[0] is task:
+            del self._calls[key]
+
+
+class VisionScheduler:
+    """
+    Admits Messages API requests under a concurrency limit and a rate limit and
+    retries the ones that fail transiently. Also coalesces concurrent captures
+    and identical concurrent questions, unless coalesce=False (which the
+    benchmarks use to measure the request path itself).
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_REQUESTS, rate: float = RATE_LIMIT,
+                 burst: int = RATE_BURST, max_retries: int = MAX_RETRIES, coalesce_window: float = COALESCE_WINDOW,
+                 coalesce: bool = True):
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.coalesce = coalesce
+        self.bucket = TokenBucket(rate, burst)
+        self.captures = SingleFlight(reuse=coalesce_window)
+        self.questions = SingleFlight()
+        self._slots = asyncio.Semaphore(max_concurrent)
+        # Set from a retry-after: nobody is admitted before this time (monotonic)
+        self._paused_until = 0.0
+        self.queued = 0
+        self.in_flight = 0
+        self.backing_off = 0
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self.waits = deque(maxlen=WAIT_WINDOW)  # seconds between asking for a slot and getting one
+
+    async def capture(self, key, factory):
+        """Captures via `factory()` unless a capture for `key` is running or has just finished."""
+        if not self.coalesce:
+            return await factory()
+        return await self.captures.do(key, factory)
+
+    async def ask(self, key, factory):
+        """Runs `factory()` unless the same question (`key`) is already in flight."""
+        if not self.coalesce:
+            return await factory()
+        return await self.questions.do(key, factory)
+
+    async def _admit(self):
+        started = time.monotonic()
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+            try:
+                while (pause := self._paused_until - time.monotonic()) > 0:
+                    await asyncio.sleep(pause)
+                await self.bucket.acquire()
+            except BaseException:
+                self._slots.release()
+                raise
+        finally:
+            self.queued -= 1
+        wait = time.monotonic() - started
+        self.waits.append(wait)
+        tracing.record("claude.queue_wait", wait)
+
+    async def run(self, attempt):
+        """
+        Runs `attempt()` (one API request) once admitted, retrying it on RetryableError.
+
+        Raises:
+            VisionAPIError: The request failed for good, or still failed after max_retries retries.
+        """
+        self.requests += 1
+        for retry in range(self.max_retries + 1):
+            await self._admit()
+            self.in_flight += 1
+            try:
+                return await attempt()
+            except RetryableError as e:
+                if e.status == 429:
+                    self.rate_limited += 1
+                if retry == self.max_retries:
+                    self.failures += 1
+                    raise
+                delay = backoff_delay(retry, e.retry_after)
+                if e.retry_after is not None:
+                    # The limit is shared by every request, so hold them all back, not just this one
+                    self._paused_until = max(self._paused_until, time.monotonic() + e.retry_after)
+                print(f"Claude request failed ({e}), retrying in {delay:.1f}s "
+                      f"({retry + 1}/{self.max_retries})", file=sys.stderr)
+            except VisionAPIError:
+                self.failures += 1
+                raise
+            finally:
+                self.in_flight -= 1
+                self._slots.release()
+
+            self.retries += 1
+            self.backing_off += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.backing_off -= 1
+
+    def stats(self) -> dict:
+        waits = sorted(self.waits)
+        return {
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "backing_off": self.backing_off,
+            "max_concurrent": self.max_concurrent,
+            "rate_limit": self.bucket.rate,
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "coalesced_captures": self.captures.shared,
+            "coalesced_questions": self.questions.shared,
+            "wait_mean_s": sum(waits) / len(waits) if waits else None,
+            "wait_p50_s": waits[len(waits) // 2] if waits else None,
+            "wait_p95_s": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else None,
+        }